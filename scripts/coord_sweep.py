@@ -1,7 +1,7 @@
 import argparse
 import numpy as np
-import dwfpy as dwf
 from util.measurements import get_measurements
+from util.instrument import Instrument, FORCE_PIN
 from util.append_data import append_data
 
 parser = argparse.ArgumentParser(description="Perform a coordinate sweep and log measurements.")
@@ -13,6 +13,7 @@ parser.add_argument('-r', type=float, default=0.0, help='Fixed r value (mm)')
 parser.add_argument('-t', '--theta', type=float, default=0.0, help='Fixed theta value (deg)')
 parser.add_argument('-z', type=float, default=0.0, help='Fixed z value (mm)')
 parser.add_argument('-o', '--output', type=str, required=True, help='Output CSV file to append results.')
+parser.add_argument('--simulate', action='store_true', help='Run against the simulated device instead of the ADP3450.')
 
 args = parser.parse_args()
 freq = args.freq * 1e3
@@ -22,15 +23,9 @@ theta_val = args.theta
 z_val = args.z
 output_file = args.output
 
-CH1_ATTEN = 10      # Power Supply Voltage
-CH2_ATTEN = 1/50e-3 # Current Probe 50 mV/A
-CH3_ATTEN = 500     # TX Coil Voltage
-CH4_ATTEN = 10      # RX Coil Voltage
-
 SCOPE_SAMPLE_RATE = 2e7 
 SCOPE_BUFFER_SIZE = 2000 
 
-FORCE_PIN = 2
 FORCE_FREQ = 1e3
 PIN_SAMPLE_RATE = 1e6
 NUM_PERIODS = 2
@@ -51,26 +46,11 @@ print("="*40)
 
 input('Press Enter to start the experiment...')
 
-with dwf.Device() as device:
-    print(f"--> Connected to: {device.name} {device.serial_number}\n")
-    
-    scope = device.analog_input
-    scope[0].setup(range=10.0, offset=0.0) 
-    scope[1].setup(range=10.0, offset=0.0) 
-    scope[2].setup(range=10.0, offset=0.0) 
-    scope[3].setup(range=10.0, offset=0.0) 
-
-    scope.setup_edge_trigger(channel=0, mode='auto')
-    scope.setup_edge_trigger(channel=1, mode='auto')
-    scope.setup_edge_trigger(channel=2, mode='auto')
-    scope.setup_edge_trigger(channel=3, mode='auto')
-
-    pattern = device.digital_output
-    pattern[0].setup_clock(frequency=freq, configure=True, start=True)
-    device.digital_io[1].setup(enabled=True, state=True, configure=True)
+with Instrument(simulate=args.simulate) as instrument:
+    print(f"--> Connected to: {instrument.name} {instrument.serial_number}\n")
 
-    logic = device.digital_input
-    logic.setup_edge_trigger(channel=FORCE_PIN, edge='rising')
+    instrument.set_frequency(freq)
+    instrument.enable()
 
     try:
         while True:
@@ -88,15 +68,10 @@ with dwf.Device() as device:
 
             print(f'--> Gathering data at {coordinate}={current_coords[coordinate]}...')
 
-            scope.single(sample_rate=SCOPE_SAMPLE_RATE, buffer_size=SCOPE_BUFFER_SIZE, configure=True, start=True)
-            ch1 = scope[0].get_data() * CH1_ATTEN
-            ch2 = scope[1].get_data() * CH2_ATTEN
-            ch3 = scope[2].get_data() * CH3_ATTEN
-            ch4 = scope[3].get_data() * CH4_ATTEN
+            ch1, ch2, ch3, ch4 = instrument.capture(SCOPE_SAMPLE_RATE, SCOPE_BUFFER_SIZE)
 
             if args.force:
-                logic.single(sample_rate=PIN_SAMPLE_RATE, buffer_size=PIN_BUFFER_SIZE, configure=True, start=True)
-                pin_data = logic.get_data()
+                pin_data = instrument.capture_logic(PIN_SAMPLE_RATE, PIN_BUFFER_SIZE)
             else:
                 pin_data = None
 
@@ -114,8 +89,4 @@ with dwf.Device() as device:
             
     except KeyboardInterrupt:
         print('Force quit detected. Exiting...')
-    
-    finally:
-        device.digital_io[0].output_state = False
-        device.digital_io[1].output_state = False
-        device.close()
\ No newline at end of file
+    
\ No newline at end of file
@@ -1,14 +1,15 @@
 import argparse
-import dwfpy as dwf
 import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
 from util.measurements import get_measurements
+from util.instrument import Instrument, FORCE_PIN
 
 parser = argparse.ArgumentParser(description="Run the measurement script at a specific frequency.")
 group = parser.add_mutually_exclusive_group(required=True)
 group.add_argument('-f', '--flight', action='store_true', help='Operate at flight frequency (115 kHz)')
 group.add_argument('-s', '--stable', action='store_true', help='Operate at stable frequency (119 kHz)')
+parser.add_argument('--simulate', action='store_true', help='Run against the simulated device instead of the ADP3450.')
 
 args = parser.parse_args()
 if args.flight:
@@ -18,53 +19,28 @@ elif args.stable:
     FREQ = 119e3
     print("Mode: Stable (119 kHz)")
 
-CH1_ATTEN = 10      # Power Supply Voltage
-CH2_ATTEN = 1/50e-3 # Current Probe 50 mV/A
-CH3_ATTEN = 500     # TX Coil Voltage
-CH4_ATTEN = 10      # RX Coil Voltage
-
 SCOPE_SAMPLE_RATE = 2e7 
 SCOPE_BUFFER_SIZE = 1000 
 
-FORCE_PIN = 2
 FORCE_FREQ = 1e3
 PIN_SAMPLE_RATE = 1e6
 NUM_PERIODS = 2
 PIN_BUFFER_SIZE = int(PIN_SAMPLE_RATE / FORCE_FREQ * NUM_PERIODS) 
 
-with dwf.Device() as device:
-    print(f"Device {device.name} {device.serial_number} opened successfully.")
-    
-    scope = device.analog_input
-    scope[0].setup(range=10.0, offset=0.0) 
-    scope[1].setup(range=10.0, offset=0.0) 
-    scope[2].setup(range=10.0, offset=0.0) 
-    scope[3].setup(range=10.0, offset=0.0) 
-
-    scope.setup_edge_trigger(channel=0, mode='auto')
-    scope.setup_edge_trigger(channel=1, mode='auto')
-    scope.setup_edge_trigger(channel=2, mode='auto')
-    scope.setup_edge_trigger(channel=3, mode='auto')
+with Instrument(simulate=args.simulate) as instrument:
+    print(f"Device {instrument.name} {instrument.serial_number} opened successfully.")
 
     input('Press Enter to start: ')
     
-    pattern = device.digital_output
-    pattern[0].setup_clock(frequency=FREQ, configure=True, start=True)
-    device.digital_io[1].setup(enabled=True, state=True, configure=True)
-
-    logic = device.digital_input
-    logic.setup_edge_trigger(channel=FORCE_PIN, edge='rising')
+    instrument.set_frequency(FREQ)
+    instrument.enable()
 
     # input('Press Enter to to change frequency to 116 kHz: ')
-    # pattern[0].setup_clock(frequency=116e3, configure=True, start=True)
+    # instrument.set_frequency(116e3)
 
     input('Press Enter to gather data then stop: ')
 
-    scope.single(sample_rate=SCOPE_SAMPLE_RATE, buffer_size=SCOPE_BUFFER_SIZE, configure=True, start=True)
-    ch1 = scope[0].get_data() * CH1_ATTEN
-    ch2 = scope[1].get_data() * CH2_ATTEN
-    ch3 = scope[2].get_data() * CH3_ATTEN
-    ch4 = scope[3].get_data() * CH4_ATTEN
+    ch1, ch2, ch3, ch4 = instrument.capture(SCOPE_SAMPLE_RATE, SCOPE_BUFFER_SIZE)
 
     # logic.single(sample_rate=PIN_SAMPLE_RATE, buffer_size=PIN_BUFFER_SIZE, configure=True, start=True)
     # pin_data = logic.get_data()
@@ -72,10 +48,6 @@ with dwf.Device() as device:
     # results = get_measurements(ch1, ch2, ch3, ch4, SCOPE_SAMPLE_RATE, pin_data, FORCE_PIN)
     results = get_measurements(ch1, ch2, ch3, ch4, SCOPE_SAMPLE_RATE)
 
-    device.digital_io[0].output_state = False
-    device.digital_io[1].output_state = False
-    device.close()
-
 
 print("\n--- MEASUREMENT RESULTS ---")
 df = pd.DataFrame([results]).T 
@@ -1,23 +1,18 @@
 import argparse
-import dwfpy as dwf
 import matplotlib.pyplot as plt
 import time
 from collections import defaultdict
 from util.measurements import get_measurements
+from util.instrument import Instrument, FORCE_PIN
 from util.append_data import append_data
+from util.telemetry import TelemetryStore
 
 FREQ = 117e3  # 117 kHz
 TAU = 120     # 120 second thermal time constant
 
-CH1_ATTEN = 10      # Power Supply Voltage
-CH2_ATTEN = 1/50e-3 # Current Probe 50 mV/A
-CH3_ATTEN = 500     # TX Coil Voltage
-CH4_ATTEN = 10      # RX Coil Voltage
-
 SCOPE_SAMPLE_RATE = 2e7 
 SCOPE_BUFFER_SIZE = 1000 
 
-FORCE_PIN = 2
 FORCE_FREQ = 1e3
 PIN_SAMPLE_RATE = 1e6
 NUM_PERIODS = 2
@@ -26,48 +21,32 @@ PIN_BUFFER_SIZE = int(PIN_SAMPLE_RATE / FORCE_FREQ * NUM_PERIODS)
 parser = argparse.ArgumentParser(description='Drone Measurement Script')
 parser.add_argument('-t', '--taus', type=float, default=5.0, help='Number of time constants to run the script for.')
 parser.add_argument('-o', '--output', type=str, default=None, help='Output CSV file to save results.')
+parser.add_argument('-l', '--telemetry', type=str, default=None, help='Telemetry store directory (raw + 1s/10s/1min rollups) for long runs.')
+parser.add_argument('--simulate', action='store_true', help='Run against the simulated device instead of the ADP3450.')
 
 args = parser.parse_args()
 output_file = args.output
 t_taus = args.taus
 t_sec = t_taus * TAU
 
-with dwf.Device() as device:
-    print(f"Device {device.name} {device.serial_number} opened successfully.")
-
-    scope = device.analog_input
-    scope[0].setup(range=10.0, offset=0.0) 
-    scope[1].setup(range=10.0, offset=0.0) 
-    scope[2].setup(range=10.0, offset=0.0) 
-    scope[3].setup(range=10.0, offset=0.0) 
+store = TelemetryStore(args.telemetry) if args.telemetry else None
 
-    scope.setup_edge_trigger(channel=0, mode='auto')
-    scope.setup_edge_trigger(channel=1, mode='auto')
-    scope.setup_edge_trigger(channel=2, mode='auto')
-    scope.setup_edge_trigger(channel=3, mode='auto')
+with Instrument(simulate=args.simulate) as instrument:
+    print(f"Device {instrument.name} {instrument.serial_number} opened successfully.")
 
     input('Press Enter to start the system: ')
 
-    pattern = device.digital_output
-    pattern[0].setup_clock(frequency=FREQ, configure=True, start=True)
-    device.digital_io[1].setup(enabled=True, state=True, configure=True)
-
-    logic = device.digital_input
-    logic.setup_edge_trigger(channel=FORCE_PIN, edge='rising')
+    instrument.set_frequency(FREQ)
+    instrument.enable()
 
     start_time = time.time()
     timeout = start_time + t_sec
     data = defaultdict(list)
 
     while time.time() < timeout:
-        scope.single(sample_rate=SCOPE_SAMPLE_RATE, buffer_size=SCOPE_BUFFER_SIZE, configure=True, start=True)
-        ch1 = scope[0].get_data() * CH1_ATTEN
-        ch2 = scope[1].get_data() * CH2_ATTEN
-        ch3 = scope[2].get_data() * CH3_ATTEN
-        ch4 = scope[3].get_data() * CH4_ATTEN
+        ch1, ch2, ch3, ch4 = instrument.capture(SCOPE_SAMPLE_RATE, SCOPE_BUFFER_SIZE)
 
-        logic.single(sample_rate=PIN_SAMPLE_RATE, buffer_size=PIN_BUFFER_SIZE, configure=True, start=True)
-        pin_data = logic.get_data()
+        pin_data = instrument.capture_logic(PIN_SAMPLE_RATE, PIN_BUFFER_SIZE)
 
         results = get_measurements(ch1, ch2, ch3, ch4, SCOPE_SAMPLE_RATE, pin_data, FORCE_PIN)
         elapsed = time.time() - start_time
@@ -75,6 +54,8 @@ with dwf.Device() as device:
 
         if output_file:
             append_data(output_file, results)
+        if store:
+            store.append(results)
         
         for key, value in results.items():
             data[key].append(value)
@@ -90,6 +71,9 @@ with dwf.Device() as device:
     print(f'\n--> Equilibrium state reached.')
     if output_file:
         print(f"--> Measurements saved to {output_file}")
+    if store:
+        store.flush()
+        print(f"--> Telemetry saved to {args.telemetry} (plot with plot_telemetry.py -i {args.telemetry})")
 
 
     print('Close the figure to stop the program.')
@@ -118,7 +102,3 @@ with dwf.Device() as device:
 
     plt.tight_layout()
     plt.show()
-
-    device.digital_io[0].output_state = False
-    device.digital_io[1].output_state = False
-    device.close()
\ No newline at end of file
@@ -1,10 +1,12 @@
 import argparse
-import time
 import numpy as np
-import dwfpy as dwf
 from tqdm import tqdm
 from util.measurements import get_measurements
+from util.instrument import Instrument, FORCE_PIN
 from util.append_data import append_data
+from util.captures import save_captures
+from util.adaptive_sweep import adaptive_sweep
+from util.settle import wait_for_settle
 
 parser = argparse.ArgumentParser(description="Perform a frequency sweep and log measurements.")
 parser.add_argument('-f', '--force', action='store_true', help='Include force measurement from digital pin.')
@@ -17,6 +19,17 @@ parser.add_argument('-s', '--start', type=float, default=115.0, help='Start freq
 parser.add_argument('-e', '--stop', type=float, default=120.0, help='End frequency in kHz.')
 parser.add_argument('-d', '--step', type=float, default=0.1, help='Step size in kHz.')
 parser.add_argument('-o', '--output', type=str, required=True, help='Output CSV file to append results.')
+parser.add_argument('-a', '--adaptive', action='store_true',
+                    help='Coarse sweep then parabolic refinement of the TX current peak (~7 points instead of 51 '
+                         'for the default 5 kHz range).')
+parser.add_argument('--coarse', type=float, default=1.0, help='Coarse step size in kHz for the adaptive sweep.')
+parser.add_argument('--tol', type=float, default=0.05, help='Resonance tolerance in kHz for the adaptive sweep.')
+parser.add_argument('-l', '--lockin', action='store_true',
+                    help='Add lock-in amplitudes at the drive frequency, twice it for the rectified RX '
+                         '(stable enough to use a shorter buffer, see -b).')
+parser.add_argument('-b', '--buffer', type=int, default=2000, help='Scope samples per capture (at 20 MS/s).')
+parser.add_argument('-w', '--raw', action='store_true', help='Archive raw captures next to the output CSV for offline reprocessing.')
+parser.add_argument('--simulate', action='store_true', help='Run against the simulated device instead of the ADP3450.')
 
 args = parser.parse_args()
 coordinate = args.sweep
@@ -26,21 +39,22 @@ z_val = args.z
 start_freq = args.start * 1e3
 end_freq = args.stop * 1e3
 step_size = args.step * 1e3 if args.step else 0.1e3 # default 0.1 kHz step
+coarse_step = args.coarse * 1e3
+tol = args.tol * 1e3
 output_file = args.output
-
-CH1_ATTEN = 10      # Power Supply Voltage
-CH2_ATTEN = 1/50e-3 # Current Probe 50 mV/A
-CH3_ATTEN = 500     # TX Coil Voltage
-CH4_ATTEN = 10      # RX Coil Voltage
+raw_dir = output_file.rsplit('.', 1)[0] + '_raw'
 
 SCOPE_SAMPLE_RATE = 2e7 
-SCOPE_BUFFER_SIZE = 2000 
+SCOPE_BUFFER_SIZE = args.buffer
 
-FORCE_PIN = 2
 FORCE_FREQ = 1e3
 PIN_SAMPLE_RATE = 1e6
 NUM_PERIODS = 2
 PIN_BUFFER_SIZE = int(PIN_SAMPLE_RATE / FORCE_FREQ * NUM_PERIODS) 
+FORCE_SETTLE_TIME = 1.0  # The force reading lags the tank, so keep the old 1 s minimum when it is logged
+SETTLE_TIMEOUT = 5.0     # Longer cap for the first point of each sweep (system just switched on)
+
+min_wait = FORCE_SETTLE_TIME if args.force else 0.0
 
 freq_list = np.arange(start_freq, end_freq + step_size, step_size)
 num_steps = len(freq_list) 
@@ -55,29 +69,17 @@ print("="*40)
 print(f" EXPERIMENT: Sweeping '{coordinate}' axis")
 print(f' Fixed Vars: r={r_val} mm, theta={theta_val} deg, z={z_val} mm')
 print(f" Frequency: {start_freq/1000:.1f} kHz -> {end_freq/1000:.1f} kHz")
-print(f" Steps:     {num_steps} points ({step_size/1000:.2f} kHz step)")
+if args.adaptive:
+    print(f" Adaptive:  {coarse_step/1000:.2f} kHz coarse step, {tol/1000:.3f} kHz tolerance")
+else:
+    print(f" Steps:     {num_steps} points ({step_size/1000:.2f} kHz step)")
 print(f" Saving to: {output_file}")
 print("="*40)
 
-with dwf.Device() as device:
-    print(f"--> Connected to: {device.name} {device.serial_number}\n")
-    
-    scope = device.analog_input
-    scope[0].setup(range=10.0, offset=0.0) 
-    scope[1].setup(range=10.0, offset=0.0) 
-    scope[2].setup(range=10.0, offset=0.0) 
-    scope[3].setup(range=10.0, offset=0.0) 
-
-    scope.setup_edge_trigger(channel=0, mode='auto')
-    scope.setup_edge_trigger(channel=1, mode='auto')
-    scope.setup_edge_trigger(channel=2, mode='auto')
-    scope.setup_edge_trigger(channel=3, mode='auto')
+with Instrument(simulate=args.simulate) as instrument:
+    print(f"--> Connected to: {instrument.name} {instrument.serial_number}\n")
 
-    pattern = device.digital_output
-    device.digital_io[1].setup(enabled=True, state=True, configure=True)
-
-    logic = device.digital_input
-    logic.setup_edge_trigger(channel=FORCE_PIN, edge='rising')
+    instrument.enable()
 
     try:
         while True:
@@ -95,50 +97,74 @@ with dwf.Device() as device:
 
             print(f'--> Starting frequency sweep for {coordinate} = {coord_val} mm...')
 
-            pbar = tqdm(freq_list, desc='Sweeping', unit='kHz', ncols=100)
-
-            pattern[0].setup_clock(frequency=freq_list[0], configure=True, start=True)
-            time.sleep(1)
+            raw_captures = [[], [], [], []]
+            raw_pins = []
+            raw_freqs = []
 
-            for freq in pbar:
-                pattern[0].setup_clock(frequency=freq, configure=True, start=True)
-                time.sleep(1)
+            def capture_scope():
+                return instrument.capture(SCOPE_SAMPLE_RATE, SCOPE_BUFFER_SIZE)
 
-                scope.single(sample_rate=SCOPE_SAMPLE_RATE, buffer_size=SCOPE_BUFFER_SIZE, configure=True, start=True)
-                ch1 = scope[0].get_data() * CH1_ATTEN
-                ch2 = scope[1].get_data() * CH2_ATTEN
-                ch3 = scope[2].get_data() * CH3_ATTEN
-                ch4 = scope[3].get_data() * CH4_ATTEN
+            def measure_point(freq):
+                instrument.set_frequency(freq)
+                settle_time, (ch1, ch2, ch3, ch4) = wait_for_settle(capture_scope, SCOPE_SAMPLE_RATE, min_wait=min_wait)
 
                 if args.force:
-                    logic.single(sample_rate=PIN_SAMPLE_RATE, buffer_size=PIN_BUFFER_SIZE, configure=True, start=True)
-                    pin_data = logic.get_data()
+                    pin_data = instrument.capture_logic(PIN_SAMPLE_RATE, PIN_BUFFER_SIZE)
                 else:
                     pin_data = None
 
-                results = get_measurements(ch1, ch2, ch3, ch4, SCOPE_SAMPLE_RATE, pin_data, FORCE_PIN)
+                results = get_measurements(ch1, ch2, ch3, ch4, SCOPE_SAMPLE_RATE, pin_data, FORCE_PIN,
+                                           freq if args.lockin else None)
+
+                if args.raw:
+                    for captures, ch in zip(raw_captures, [ch1, ch2, ch3, ch4]):
+                        captures.append(ch)
+                    if pin_data is not None:
+                        raw_pins.append(pin_data)
+                    raw_freqs.append(freq)
 
                 data = {
                     'r (mm)': current_coords['r'],
                     'theta (deg)': current_coords['theta'],
                     'z (mm)': current_coords['z'],
                     'Driving Frequency (Hz)': freq,
+                    'Settle Time (s)': settle_time,
                     **results
                 }
                 append_data(output_file, data)
 
-                tx_rms = results['TX Voltage RMS (V)']
-                pbar.set_postfix_str(f'Freq={freq/1e3:.1f}k | TX_RMS={tx_rms:.2f}V')
-
+                return results
+
+            instrument.set_frequency(start_freq)
+            wait_for_settle(capture_scope, SCOPE_SAMPLE_RATE, timeout=SETTLE_TIMEOUT)
+
+            if args.adaptive:
+                points = adaptive_sweep(measure_point, start_freq, end_freq, coarse_step, tol)
+                peak_freq, peak_results = max(points, key=lambda p: p[1]['TX Current RMS (A)'])
+                print(f'--> {len(points)} points measured. Resonance at {peak_freq/1e3:.3f} kHz '
+                      f'(TX current {peak_results["TX Current RMS (A)"]:.2f} A RMS)')
+            else:
+                pbar = tqdm(freq_list, desc='Sweeping', unit='kHz', ncols=100)
+                for freq in pbar:
+                    results = measure_point(freq)
+                    tx_rms = results['TX Voltage RMS (V)']
+                    pbar.set_postfix_str(f'Freq={freq/1e3:.1f}k | TX_RMS={tx_rms:.2f}V')
+
+            if args.raw:
+                raw_file = f'{raw_dir}/{coordinate}_{coord_val}.npz'
+                metadata = {
+                    'r (mm)': [current_coords['r']] * len(raw_freqs),
+                    'theta (deg)': [current_coords['theta']] * len(raw_freqs),
+                    'z (mm)': [current_coords['z']] * len(raw_freqs),
+                    'Driving Frequency (Hz)': raw_freqs
+                }
+                save_captures(raw_file, [np.array(c) for c in raw_captures], SCOPE_SAMPLE_RATE, metadata,
+                              np.array(raw_pins) if raw_pins else None, FORCE_PIN)
+                print(f'--> Raw captures archived to {raw_file}')
 
             print(f'--> Sweep complete for {coordinate} = {coord_val} mm.\n')
 
-            device.digital_io[0].output_state = False
+            instrument.stop_clock()
 
     except KeyboardInterrupt:
         print('Force quit detected. Exiting...')
-
-    finally:
-        device.digital_io[0].output_state = False
-        device.digital_io[1].output_state = False
-        device.close()
\ No newline at end of file
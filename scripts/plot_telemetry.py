@@ -0,0 +1,37 @@
+import argparse
+import os
+import pandas as pd
+import matplotlib.pyplot as plt
+from util.telemetry import TelemetryStore, plot_telemetry, RAW, MAX_POINTS
+
+parser = argparse.ArgumentParser(description='Plot long-term drift logs at a resolution matched to the visible range.')
+parser.add_argument('-i', '--input', type=str, required=True,
+                    help='Telemetry store directory, or a long-term CSV (its store is built next to it on first use).')
+parser.add_argument('-c', '--columns', nargs='+', default=['RX Force (mN)'], help='Columns to plot.')
+parser.add_argument('-n', '--max-points', type=int, default=MAX_POINTS, help='Most points drawn per line before switching to a coarser rollup.')
+
+args = parser.parse_args()
+
+if os.path.isdir(args.input):
+    store = TelemetryStore(args.input)
+else:
+    store = TelemetryStore.from_csv(args.input)
+
+header = pd.read_csv(store.file(RAW), nrows=0).columns if os.path.isfile(store.file(RAW)) else []
+missing = [col for col in args.columns if col not in header]
+if missing:
+    print(f'[!] Columns not in {store.path}: {missing}')
+    exit(1)
+
+fig, axes = plt.subplots(len(args.columns), 1, figsize=(10, 3 * len(args.columns)), sharex=True, squeeze=False)
+axes = axes[:, 0]
+plt.suptitle(f'{os.path.basename(os.path.normpath(store.path))}')
+
+plot_telemetry(store, args.columns, axes, args.max_points)
+
+for ax in axes:
+    ax.grid(True)
+axes[-1].set_xlabel('Time (s)')
+
+plt.tight_layout()
+plt.show()
@@ -0,0 +1,98 @@
+import argparse
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import pandas as pd
+from tqdm import tqdm
+from util.measurements import get_measurements_batch, ESTIMATOR_VERSION
+from util.captures import load_captures, load_waveform_csv
+from util.catalog import classify_csv
+
+def reprocess_file(in_file, out_file, atten):
+    '''
+    Recomputes every measurement column for one archived capture file (.npz from save_captures
+    or a WaveForms oscilloscope acquisition CSV) and writes them to out_file.
+    Returns the number of rows written.
+    '''
+    if in_file.endswith('.npz'):
+        channels, sample_rate, metadata, pin_data, force_pin = load_captures(in_file)
+    else:
+        if classify_csv(in_file) != 'waveform':
+            raise ValueError(f'{in_file} is not a WaveForms oscilloscope acquisition')
+        channels, sample_rate = load_waveform_csv(in_file, atten)
+        metadata, pin_data, force_pin = {}, None, None
+
+    # All captures in the file are measured in one vectorized call, with lock-in columns when the drive frequency was logged
+    drive_freq = metadata.get('Driving Frequency (Hz)')
+    results = get_measurements_batch(*channels, sample_rate, pin_data, force_pin, drive_freq)
+
+    df = pd.DataFrame({**metadata, **results})
+    os.makedirs(os.path.dirname(out_file) or '.', exist_ok=True)
+    df.to_csv(out_file, index=False)
+
+    return len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocess archived raw captures with the current measurement estimators.")
+    parser.add_argument('-i', '--input', nargs='+', required=True,
+                        help='List or glob pattern of capture archives (.npz) or WaveForms acquisition CSVs.')
+    parser.add_argument('-o', '--output', type=str, default='reprocessed', help='Output directory.')
+    parser.add_argument('-d', '--root', type=str, default='.',
+                        help='Input paths are mirrored under the output directory relative to this root.')
+    parser.add_argument('-a', '--atten', nargs=4, type=float, default=[1.0, 1.0, 1.0, 1.0],
+                        metavar=('CH1', 'CH2', 'CH3', 'CH4'),
+                        help='Extra per-channel scaling applied to WaveForms CSVs (e.g. 20 for the 50 mV/A current probe).')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='Number of worker processes (default: all cores).')
+    args = parser.parse_args()
+
+    in_files = []
+    for pattern in args.input:
+        in_files.extend(sorted(glob.glob(pattern, recursive=True)))
+
+    if not in_files:
+        print('No input files found.')
+        return
+
+    version_dir = os.path.join(args.output, f'v{ESTIMATOR_VERSION}')
+    out_files = []
+    for in_file in in_files:
+        rel_path = os.path.relpath(in_file, args.root)
+        out_files.append(os.path.join(version_dir, os.path.splitext(rel_path)[0] + '.csv'))
+
+    print("="*40)
+    print(f" REPROCESSING: {len(in_files)} files")
+    print(f" Estimators: v{ESTIMATOR_VERSION}")
+    print(f" Saving to:  {version_dir}")
+    print("="*40)
+
+    failed = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(reprocess_file, in_file, out_file, args.atten): in_file
+                   for in_file, out_file in zip(in_files, out_files)}
+
+        for future in tqdm(futures, desc='Reprocessing', unit='file', ncols=100):
+            try:
+                future.result()
+            except (ValueError, KeyError, OSError) as e:
+                failed[futures[future]] = str(e)
+
+    manifest = {
+        "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+        "estimator_version": ESTIMATOR_VERSION,
+        "atten": args.atten,
+        "inputs": [f for f in in_files if f not in failed],
+        "failed": failed
+    }
+    with open(os.path.join(version_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=4)
+
+    for in_file, error in failed.items():
+        print(f'[!] Skipped {in_file}: {error}')
+    print(f'--> {len(in_files) - len(failed)} files reprocessed into {version_dir}')
+
+
+if __name__ == "__main__":
+    main()
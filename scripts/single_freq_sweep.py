@@ -3,9 +3,9 @@ import time
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-import dwfpy as dwf
 from tqdm import tqdm
 from util.measurements import get_measurements
+from util.instrument import Instrument, FORCE_PIN
 from util.append_data import append_data
 
 parser = argparse.ArgumentParser(description="Perform a frequency sweep and log measurements.")
@@ -15,6 +15,7 @@ parser.add_argument('-s', '--start', type=float, default=115.0, help='Start freq
 parser.add_argument('-e', '--stop', type=float, default=120.0, help='End frequency in kHz.')
 parser.add_argument('-d', '--step', type=float, default=0.1, help='Step size in kHz.')
 parser.add_argument('-o', '--output', type=str, required=True, help='Output CSV file to append results.')
+parser.add_argument('--simulate', action='store_true', help='Run against the simulated device instead of the ADP3450.')
 
 args = parser.parse_args()
 start_freq = args.start * 1e3  
@@ -22,15 +23,9 @@ end_freq = args.stop * 1e3
 step_size = args.step * 1e3 if args.step else 0.1e3  
 output_file = args.output
 
-CH1_ATTEN = 10      # Power Supply Voltage
-CH2_ATTEN = 1/50e-3 # Current Probe 50 mV/A
-CH3_ATTEN = 500     # TX Coil Voltage
-CH4_ATTEN = 10      # RX Coil Voltage
-
 SCOPE_SAMPLE_RATE = 2e7 
 SCOPE_BUFFER_SIZE = 2000 
 
-FORCE_PIN = 2
 FORCE_FREQ = 1e3
 PIN_SAMPLE_RATE = 1e6
 NUM_PERIODS = 2
@@ -57,25 +52,10 @@ print(f" Steps:     {num_steps} points ({step_size/1000:.2f} kHz step)")
 print(f" Saving to: {output_file}")
 print("="*40)
 
-with dwf.Device() as device:
-    print(f"--> Connected to: {device.name} {device.serial_number}\n")
-    
-    scope = device.analog_input
-    scope[0].setup(range=10.0, offset=0.0) 
-    scope[1].setup(range=10.0, offset=0.0) 
-    scope[2].setup(range=10.0, offset=0.0) 
-    scope[3].setup(range=10.0, offset=0.0) 
-
-    scope.setup_edge_trigger(channel=0, mode='auto')
-    scope.setup_edge_trigger(channel=1, mode='auto')
-    scope.setup_edge_trigger(channel=2, mode='auto')
-    scope.setup_edge_trigger(channel=3, mode='auto')
+with Instrument(simulate=args.simulate) as instrument:
+    print(f"--> Connected to: {instrument.name} {instrument.serial_number}\n")
 
-    pattern = device.digital_output
-    device.digital_io[1].setup(enabled=True, state=True, configure=True)
-
-    logic = device.digital_input
-    logic.setup_edge_trigger(channel=FORCE_PIN, edge='rising')
+    instrument.enable()
 
     if not args.reverse:
         input(f'Press Enter to start frequency sweep from {start_freq/1e3} kHz to {end_freq/1e3} kHz: ')
@@ -84,22 +64,17 @@ with dwf.Device() as device:
 
     pbar = tqdm(freq_list, desc='Sweeping', unit='kHz', ncols=100)
 
-    pattern[0].setup_clock(frequency=freq_list[0], configure=True, start=True)
+    instrument.set_frequency(freq_list[0])
     time.sleep(1)
 
     for freq in pbar:
-        pattern[0].setup_clock(frequency=freq, configure=True, start=True)
+        instrument.set_frequency(freq)
         time.sleep(sleep_time)
 
-        scope.single(sample_rate=SCOPE_SAMPLE_RATE, buffer_size=SCOPE_BUFFER_SIZE, configure=True, start=True)
-        ch1 = scope[0].get_data() * CH1_ATTEN
-        ch2 = scope[1].get_data() * CH2_ATTEN
-        ch3 = scope[2].get_data() * CH3_ATTEN
-        ch4 = scope[3].get_data() * CH4_ATTEN
+        ch1, ch2, ch3, ch4 = instrument.capture(SCOPE_SAMPLE_RATE, SCOPE_BUFFER_SIZE)
 
         if args.force:
-            logic.single(sample_rate=PIN_SAMPLE_RATE, buffer_size=PIN_BUFFER_SIZE, configure=True, start=True)
-            pin_data = logic.get_data()
+            pin_data = instrument.capture_logic(PIN_SAMPLE_RATE, PIN_BUFFER_SIZE)
         else:
             pin_data = None
 
@@ -116,10 +91,6 @@ with dwf.Device() as device:
 
     print(f'All measurements complete and appended to {output_file}.')
 
-    device.digital_io[0].output_state = False
-    device.digital_io[1].output_state = False
-    device.close()
-
 df = pd.read_csv(output_file, comment='#')
 plt.figure(figsize=(10, 6))
 plt.suptitle("Frequency Sweep Results")
@@ -0,0 +1,91 @@
+import argparse
+import numpy as np
+import matplotlib.pyplot as plt
+import time
+from collections import defaultdict
+from util.instrument import Instrument
+from util.streaming import stream_measurements
+from util.append_data import append_rows
+
+FREQ = 117e3  # 117 kHz
+
+STREAM_SAMPLE_RATE = 2e6  # Record mode streams over USB, so this is well below the single-capture rate
+PRINT_INTERVAL = 5        # seconds between progress prints
+
+parser = argparse.ArgumentParser(description='Gapless streaming measurement for long-term / thermal drift tests')
+parser.add_argument('-t', '--time', type=float, default=10.0, help='Duration to record in minutes (0 = until Ctrl+C).')
+parser.add_argument('-w', '--window', type=float, default=10.0, help='Measurement window length in ms.')
+parser.add_argument('--hop', type=float, default=None, help='Time between window starts in ms (default: window length, no gaps or overlap).')
+parser.add_argument('-r', '--rate', type=float, default=STREAM_SAMPLE_RATE, help='Record-mode sample rate in Hz.')
+parser.add_argument('-o', '--output', type=str, required=True, help='Output CSV file to save results.')
+parser.add_argument('--simulate', action='store_true', help='Run against the simulated device instead of the ADP3450.')
+
+args = parser.parse_args()
+output_file = args.output
+t_sec = args.time * 60
+window_size = int(args.window * 1e-3 * args.rate)
+hop_size = int(args.hop * 1e-3 * args.rate) if args.hop else None
+
+data = defaultdict(list)
+last_print = 0.0
+
+def on_windows(results):
+    global last_print
+    results['Driving Frequency (Hz)'] = np.full(len(results['Time (s)']), FREQ)
+    append_rows(output_file, results)
+
+    for key in ['Time (s)', 'TX Current RMS (A)', 'TX Voltage Frequency (Hz)', 'RX Voltage RMS (V)']:
+        data[key].extend(results[key])
+
+    elapsed = results['Time (s)'][-1]
+    if elapsed - last_print >= PRINT_INTERVAL:
+        last_print = elapsed
+        timestamp = time.strftime('%H:%M:%S')
+        tx_rms = results['TX Current RMS (A)'][-1]
+        tx_freq = results['TX Voltage Frequency (Hz)'][-1]
+        lost = results['Lost Samples'][-1]
+        print(f'[{timestamp}] t={elapsed:7.1f}s | TX_RMS={tx_rms:.3f}A | Freq={tx_freq/1e3:.3f}kHz | Lost={lost}')
+
+with Instrument(simulate=args.simulate) as instrument:
+    print(f"--> Connected to: {instrument.name} {instrument.serial_number}\n")
+
+    print("="*40)
+    print(f" STREAMING: {args.rate/1e6:g} MS/s, {args.window:g} ms windows")
+    print(f" Duration:  {'until Ctrl+C' if t_sec == 0 else f'{args.time:g} min'}")
+    print(f" Saving to: {output_file}")
+    print("="*40)
+
+    input('Press Enter to start the system and data collection: ')
+
+    instrument.set_frequency(FREQ)
+    instrument.enable()
+
+    try:
+        lost = stream_measurements(instrument, args.rate, window_size, on_windows, hop_size, length=t_sec)
+        print(f'\n--> Recording complete. {len(data["Time (s)"])} windows, {lost} samples lost.')
+    except KeyboardInterrupt:
+        print('Force quit detected. Stopping...')
+
+    print(f"--> Measurements saved to {output_file}")
+
+
+if data['Time (s)']:
+    print('Close the figure to stop the program.')
+    fig, axes = plt.subplots(3, 1, figsize=(10, 8), sharex=True)
+    plt.suptitle(f"Streamed Measurements ({args.window:g} ms windows)")
+
+    axes[0].plot(data['Time (s)'], data['TX Current RMS (A)'], color='tab:purple')
+    axes[0].set_ylabel('TX Current RMS (A)')
+    axes[0].grid(True)
+
+    axes[1].plot(data['Time (s)'], np.array(data['TX Voltage Frequency (Hz)']) / 1e3, color='tab:green')
+    axes[1].set_ylabel('TX Frequency (kHz)')
+    axes[1].grid(True)
+
+    axes[2].plot(data['Time (s)'], data['RX Voltage RMS (V)'], color='tab:orange')
+    axes[2].set_ylabel('RX Voltage RMS (V)')
+    axes[2].set_xlabel('Time (s)')
+    axes[2].grid(True)
+
+    plt.tight_layout()
+    plt.show()
@@ -1,35 +1,39 @@
 import argparse
-import dwfpy as dwf
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import time
 from tqdm import tqdm
-from util.measurements import get_measurements
-from util.append_data import append_data
+from util.measurements import get_measurements, get_duty_batch, FORCE_PER_DUTY
+from util.instrument import Instrument, FORCE_PIN
+from util.append_data import append_data, append_rows
+from util.pwm import get_force_series
+from util.adaptive_sweep import adaptive_sweep
+from util.settle import wait_for_settle
 
 FREQ = 117e3  # 117 kHz
 
-CH1_ATTEN = 10      # Power Supply Voltage
-CH2_ATTEN = 1/50e-3 # Current Probe 50 mV/A
-CH3_ATTEN = 500     # TX Coil Voltage
-CH4_ATTEN = 10      # RX Coil Voltage
-
 SCOPE_SAMPLE_RATE = 2e7 
 SCOPE_BUFFER_SIZE = 1000 
 
-FORCE_PIN = 2
 FORCE_FREQ = 1e3
 PIN_SAMPLE_RATE = 1e6
 NUM_PERIODS = 2
 PIN_BUFFER_SIZE = int(PIN_SAMPLE_RATE / FORCE_FREQ * NUM_PERIODS) 
+FORCE_SERIES_PERIODS = 50  # PWM periods per logic capture in force mode (-f)
+FORCE_SERIES_BUFFER_SIZE = int(PIN_SAMPLE_RATE / FORCE_FREQ * FORCE_SERIES_PERIODS)
+
+ADAPTIVE_COARSE_STEP = 1e3    # 1 kHz
+ADAPTIVE_TOL = 50             # 50 Hz
 
 parser = argparse.ArgumentParser(description='Drone Measurement Script')
 parser.add_argument('-t', '--time', type=float, default=5.0, help='Duration to run the script in minutes.')
 parser.add_argument('-f', '--force', action='store_true', help='Include force measurement from digital pin.')
 parser.add_argument('-v', '--voltage', action='store_true', help='Include voltage measurements from scope channels.')
 parser.add_argument('-s', '--sweep', action='store_true', help='Perform frequency sweeps over the specified time interval.')
+parser.add_argument('-a', '--adaptive', action='store_true', help='Refine each sweep around the TX current peak instead of stepping linearly.')
 parser.add_argument('-o', '--output', type=str, required=True, help='Output CSV file to save results.')
+parser.add_argument('--simulate', action='store_true', help='Run against the simulated device instead of the ADP3450.')
 
 args = parser.parse_args()
 output_file = args.output
@@ -40,28 +44,13 @@ if not (args.force or args.voltage or args.sweep):
     print("No measurement type specified. Use -f, -v, or -s to select measurements.")
     exit(1)
 
-with dwf.Device() as device:
-    print(f"Device {device.name} {device.serial_number} opened successfully.")
-
-    scope = device.analog_input
-    scope[0].setup(range=10.0, offset=0.0) 
-    scope[1].setup(range=10.0, offset=0.0) 
-    scope[2].setup(range=10.0, offset=0.0) 
-    scope[3].setup(range=10.0, offset=0.0) 
-
-    scope.setup_edge_trigger(channel=0, mode='auto')
-    scope.setup_edge_trigger(channel=1, mode='auto')
-    scope.setup_edge_trigger(channel=2, mode='auto')
-    scope.setup_edge_trigger(channel=3, mode='auto')
+with Instrument(simulate=args.simulate) as instrument:
+    print(f"Device {instrument.name} {instrument.serial_number} opened successfully.")
 
     input('Press Enter to start the system and data collection: ')
 
-    pattern = device.digital_output
-    pattern[0].setup_clock(frequency=FREQ, configure=True, start=True)
-    device.digital_io[1].setup(enabled=True, state=True, configure=True)
-
-    logic = device.digital_input
-    logic.setup_edge_trigger(channel=FORCE_PIN, edge='rising')
+    instrument.set_frequency(FREQ)
+    instrument.enable()
 
     time.sleep(1) 
 
@@ -70,29 +59,26 @@ with dwf.Device() as device:
 
     while time.time() < timeout:
         if args.force:
-            logic.single(sample_rate=PIN_SAMPLE_RATE, buffer_size=PIN_BUFFER_SIZE, configure=True, start=True)
-            pin_data = logic.get_data()
-
             elapsed = time.time() - start_time
-            signal = (pin_data >> FORCE_PIN) & 1
-            duty_cycle = np.sum(signal) / len(signal)
+            pin_data = instrument.capture_logic(PIN_SAMPLE_RATE, FORCE_SERIES_BUFFER_SIZE)
+
+            # One long capture gives a force reading for every whole PWM period
+            series = get_force_series(pin_data, FORCE_PIN, PIN_SAMPLE_RATE)
+            append_rows(output_file, {
+                'Time (s)': elapsed + series['Time (s)'],
+                'RX Force (mN)': series['RX Force (mN)']
+            })
 
             data = {
                 'Time (s)': elapsed,
-                'RX Force (mN)': duty_cycle*50 * 9.81  # duty cycle * 50 = mass in grams
+                'RX Force (mN)': get_duty_batch((pin_data[np.newaxis, :] >> FORCE_PIN) & 1)[0] * FORCE_PER_DUTY
             }
-            append_data(output_file, data)
 
 
         elif args.voltage:
-            scope.single(sample_rate=SCOPE_SAMPLE_RATE, buffer_size=SCOPE_BUFFER_SIZE, configure=True, start=True)
-            ch1 = scope[0].get_data() * CH1_ATTEN
-            ch2 = scope[1].get_data() * CH2_ATTEN
-            ch3 = scope[2].get_data() * CH3_ATTEN
-            ch4 = scope[3].get_data() * CH4_ATTEN
+            ch1, ch2, ch3, ch4 = instrument.capture(SCOPE_SAMPLE_RATE, SCOPE_BUFFER_SIZE)
 
-            logic.single(sample_rate=PIN_SAMPLE_RATE, buffer_size=PIN_BUFFER_SIZE, configure=True, start=True)
-            pin_data = logic.get_data()
+            pin_data = instrument.capture_logic(PIN_SAMPLE_RATE, PIN_BUFFER_SIZE)
 
             results = get_measurements(ch1, ch2, ch3, ch4, SCOPE_SAMPLE_RATE, pin_data, FORCE_PIN)
             elapsed = time.time() - start_time
@@ -111,22 +97,17 @@ with dwf.Device() as device:
             step_freq = 0.1e3
             freq_list = np.arange(start_freq, stop_freq + step_freq, step_freq)
 
-            # pattern[0].setup_clock(frequency=freq_list[0], configure=True, start=True)
+            # instrument.set_frequency(freq_list[0])
             # time.sleep(1)
 
-            pbar = tqdm(freq_list, desc='Sweeping', unit='kHz', ncols=100)
             freq_start_delT = time.time() - start_time
 
-            for freq in pbar:
-                pattern[0].setup_clock(frequency=freq, configure=True, start=True)
-                # time.sleep(2)
-                time.sleep(0.05)
+            def capture_scope():
+                return instrument.capture(SCOPE_SAMPLE_RATE, SCOPE_BUFFER_SIZE)
 
-                scope.single(sample_rate=SCOPE_SAMPLE_RATE, buffer_size=SCOPE_BUFFER_SIZE, configure=True, start=True)
-                ch1 = scope[0].get_data() * CH1_ATTEN
-                ch2 = scope[1].get_data() * CH2_ATTEN
-                ch3 = scope[2].get_data() * CH3_ATTEN
-                ch4 = scope[3].get_data() * CH4_ATTEN
+            def measure_point(freq):
+                instrument.set_frequency(freq)
+                settle_time, (ch1, ch2, ch3, ch4) = wait_for_settle(capture_scope, SCOPE_SAMPLE_RATE)
 
                 # logic.single(sample_rate=PIN_SAMPLE_RATE, buffer_size=PIN_BUFFER_SIZE, configure=True, start=True)
                 # pin_data = logic.get_data()
@@ -136,14 +117,26 @@ with dwf.Device() as device:
                 data = {
                     'Start Time (s)': freq_start_delT,
                     'Driving Frequency (Hz)': freq,
+                    'Settle Time (s)': settle_time,
                     **results
                 }
                 append_data(output_file, data)
 
-                # force = results['RX Force (mN)']
-                # pbar.set_postfix(f'Freq={freq/1e3:.1f}kHz')
-                tx_rms = results['TX Voltage RMS (V)']
-                pbar.set_postfix_str(f'Freq={freq/1e3:.1f}k | TX_RMS={tx_rms:.2f}V')
+                return results
+
+            if args.adaptive:
+                points = adaptive_sweep(measure_point, start_freq, stop_freq, ADAPTIVE_COARSE_STEP, ADAPTIVE_TOL)
+                peak_freq, _ = max(points, key=lambda p: p[1]['TX Current RMS (A)'])
+                print(f'--> {len(points)} points measured. Resonance at {peak_freq/1e3:.3f} kHz')
+            else:
+                pbar = tqdm(freq_list, desc='Sweeping', unit='kHz', ncols=100)
+                for freq in pbar:
+                    results = measure_point(freq)
+
+                    # force = results['RX Force (mN)']
+                    # pbar.set_postfix(f'Freq={freq/1e3:.1f}kHz')
+                    tx_rms = results['TX Voltage RMS (V)']
+                    pbar.set_postfix_str(f'Freq={freq/1e3:.1f}k | TX_RMS={tx_rms:.2f}V')
 
 
         if not args.sweep:
@@ -153,16 +146,12 @@ with dwf.Device() as device:
             print(f'[{timestamp}] Force: {force_mn:6.2f} mN ({force_g:5.1f}g)')
 
         # time.sleep(15)
-        pattern[0].setup_clock(frequency=FREQ, configure=True, start=True)
+        instrument.set_frequency(FREQ)
         # time.sleep(5)
         time.sleep(30)
 
     print(f"\n--> Measurement complete. Results saved to {output_file}")
 
-    device.digital_io[0].output_state = False
-    device.digital_io[1].output_state = False
-    device.close()
-
 
 if args.force:
     df = pd.read_csv(output_file)
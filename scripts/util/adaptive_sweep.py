@@ -0,0 +1,95 @@
+import numpy as np
+
+GOLDEN_RATIO = (np.sqrt(5) - 1) / 2  # ~0.618
+MAX_PARABOLIC_STEPS = 6
+
+def adaptive_sweep(measure, start_freq, stop_freq, coarse_step, tol, metric='TX Current RMS (A)'):
+    '''
+    Finds the resonance between start_freq and stop_freq with far fewer points than a linear sweep.
+    A coarse pass steps by coarse_step, then the peak of the metric column is refined within one coarse
+    step either side until it moves by less than tol (all in Hz). The refinement is parabolic interpolation
+    on 1 / metric^2, which is quadratic in frequency near the peak of a series-resonant tank current, so it
+    usually lands within tol in two or three points; golden-section search takes over if a fit misbehaves.
+
+    measure(freq) must drive the system at freq, log the point and return its measurement dictionary.
+    Returns the list of (freq, results) for every point measured, in measurement order.
+    '''
+    points = []
+    samples = {}
+
+    def evaluate(freq):
+        results = measure(freq)
+        points.append((freq, results))
+        samples[freq] = results[metric]
+        return results[metric]
+
+    # 1. Coarse pass
+    coarse_freqs = np.arange(start_freq, stop_freq + coarse_step / 2, coarse_step)
+    for freq in coarse_freqs:
+        evaluate(freq)
+
+    # 2. Parabolic refinement around the best point so far, golden section as the fallback
+    low, high = parabolic_max(evaluate, samples, tol)
+    if high - low > tol:
+        golden_section_max(evaluate, low, high, tol)
+
+    return points
+
+
+def parabolic_max(evaluate, samples, tol, max_steps=MAX_PARABOLIC_STEPS):
+    '''
+    Successive parabolic interpolation for the peak of a resonance. samples maps freq -> value and is
+    extended by evaluate. Each step fits a parabola to 1 / value^2 through the best sample and its nearest
+    neighbours on either side, and measures at the vertex. Stops once the vertex is within tol of the best
+    sample (returns a bracket narrower than tol around it), or returns the current bracket when the fit
+    is not usable (non-convex fit, vertex outside the bracket, or out of steps).
+    '''
+    for _ in range(max_steps + 1):
+        freqs = np.array(sorted(samples))
+        values = np.array([samples[f] for f in freqs])
+        best = int(np.nanargmax(values))
+        low = freqs[max(best - 1, 0)]
+        high = freqs[min(best + 1, len(freqs) - 1)]
+        if len(freqs) < 3 or high - low <= tol:
+            return low, high
+
+        # Three consecutive samples around the best one (the outermost three when it sits at a sweep edge)
+        first = min(max(best - 1, 0), len(freqs) - 3)
+        x = freqs[first:first + 3]
+        y = 1.0 / values[first:first + 3]**2
+        curvature = (y[2] - y[1]) / (x[2] - x[1]) - (y[1] - y[0]) / (x[1] - x[0])
+        if not curvature > 0:
+            return low, high
+        vertex = x[1] - 0.5 * ((x[1] - x[0])**2 * (y[1] - y[2]) - (x[1] - x[2])**2 * (y[1] - y[0])) / \
+            ((x[1] - x[0]) * (y[1] - y[2]) - (x[1] - x[2]) * (y[1] - y[0]))
+        if not low <= vertex <= high:
+            return low, high
+        if abs(vertex - freqs[best]) < tol:
+            return freqs[best] - tol / 2, freqs[best] + tol / 2
+        evaluate(vertex)
+
+    return low, high
+
+
+def golden_section_max(evaluate, low, high, tol):
+    '''
+    Golden-section search for the maximum of a unimodal function on [low, high].
+    Each iteration reuses one interior point, so only one new evaluation is needed per step.
+    Returns the centre of the final bracket.
+    '''
+    x1 = high - GOLDEN_RATIO * (high - low)
+    x2 = low + GOLDEN_RATIO * (high - low)
+    f1 = evaluate(x1)
+    f2 = evaluate(x2)
+
+    while (high - low) > tol:
+        if f1 >= f2:
+            high, x2, f2 = x2, x1, f1
+            x1 = high - GOLDEN_RATIO * (high - low)
+            f1 = evaluate(x1)
+        else:
+            low, x1, f1 = x1, x2, f2
+            x2 = low + GOLDEN_RATIO * (high - low)
+            f2 = evaluate(x2)
+
+    return (low + high) / 2
@@ -14,4 +14,15 @@ def append_data(file_path, data):
 
     # print(f'--> Measurements appended to {file_path}')
 
-    return
\ No newline at end of file
+    return
+
+def append_rows(file_path, data):
+    '''
+    Same as append_data for a dictionary of equal-length columns, written as one row per entry.
+    '''
+    df = pd.DataFrame(data)
+
+    if not os.path.isfile(file_path):
+        df.to_csv(file_path, index=False)
+    else:
+        df.to_csv(file_path, mode='a', header=False, index=False)
@@ -0,0 +1,62 @@
+import os
+import numpy as np
+import pandas as pd
+
+CHANNEL_KEYS = ['ch1', 'ch2', 'ch3', 'ch4']
+
+def save_captures(file_path, channels, sample_rate, metadata=None, pin_data=None, force_pin=None):
+    '''
+    Archives a batch of raw scope captures to a compressed .npz file so they can be reprocessed offline.
+    channels is a list of the 4 channel arrays with shape (num_captures, num_samples), attenuation already applied.
+    metadata is a dictionary of per-capture columns (coordinates, driving frequency, time...).
+    '''
+    arrays = {key: np.asarray(ch) for key, ch in zip(CHANNEL_KEYS, channels)}
+    arrays['sample_rate'] = np.array(sample_rate)
+
+    if pin_data is not None:
+        arrays['pin_data'] = np.asarray(pin_data)
+        arrays['force_pin'] = np.array(force_pin)
+
+    # Metadata columns keep their CSV names so they can be written back out unchanged
+    for col, values in (metadata or {}).items():
+        arrays[f'meta/{col}'] = np.asarray(values)
+
+    dir_name = os.path.dirname(file_path)
+    if dir_name:
+        os.makedirs(dir_name, exist_ok=True)
+    np.savez_compressed(file_path, **arrays)
+
+
+def load_captures(file_path):
+    '''
+    Loads a capture archive written by save_captures.
+    Returns (channels, sample_rate, metadata, pin_data, force_pin).
+    '''
+    with np.load(file_path) as data:
+        channels = [data[key] for key in CHANNEL_KEYS]
+        sample_rate = float(data['sample_rate'])
+        metadata = {key[len('meta/'):]: data[key] for key in data.files if key.startswith('meta/')}
+        pin_data = data['pin_data'] if 'pin_data' in data.files else None
+        force_pin = int(data['force_pin']) if 'force_pin' in data.files else None
+
+    return channels, sample_rate, metadata, pin_data, force_pin
+
+
+def load_waveform_csv(file_path, atten=(1, 1, 1, 1)):
+    '''
+    Loads a WaveForms oscilloscope acquisition CSV as a single capture.
+    WaveForms already applies the attenuation set in the GUI; atten scales each channel further
+    (e.g. 1/50e-3 to convert the current probe voltage to amps).
+    Returns (channels, sample_rate) with each channel shaped (1, num_samples).
+    '''
+    df = pd.read_csv(file_path, comment='#')
+
+    time_s = df['Time (s)'].to_numpy()
+    sample_rate = float(np.round((len(time_s) - 1) / (time_s[-1] - time_s[0])))
+
+    channels = []
+    for i, scale in enumerate(atten):
+        ch = df[f'Channel {i + 1} (V)'].to_numpy(dtype=float) * scale
+        channels.append(ch[np.newaxis, :])
+
+    return channels, sample_rate
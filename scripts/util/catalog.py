@@ -0,0 +1,245 @@
+import argparse
+import fnmatch
+import json
+import os
+import numpy as np
+import pandas as pd
+
+COORD_COLUMNS = {
+    'r': 'r (mm)',
+    'theta': 'theta (deg)',
+    'z': 'z (mm)'
+}
+FREQ_COLUMNS = ['Driving Frequency (Hz)', 'Frequency (Hz)']
+UNIT_SCALE = {'m': 1e-3, 'u': 1e-6, 'k': 1e3, 'M': 1e6}
+
+def classify_csv(file_path):
+    '''
+    Returns the dataset type of a CSV file from its first line:
+    'waveform' (WaveForms scope acquisition), 'measurement' (WaveForms scope measurements),
+    'bode' (WaveForms network analyzer), 'merged' (merge_csv output) or 'log' (append_data output).
+    '''
+    with open(file_path, 'r', errors='replace') as f:
+        first_line = f.readline().strip()
+
+    if first_line.startswith('#Digilent WaveForms Oscilloscope Acquisition'):
+        return 'waveform'
+    if first_line.startswith('#Digilent WaveForms Oscilloscope Measurements'):
+        return 'measurement'
+    if first_line.startswith('#Digilent WaveForms Network Analyzer'):
+        return 'bode'
+    if first_line.startswith('File Name'):
+        return 'merged'
+    return 'log'
+
+
+def read_header(file_path):
+    '''
+    Returns the "#Key: value" comment header written by WaveForms as a dictionary.
+    '''
+    header = {}
+    with open(file_path, 'r', errors='replace') as f:
+        for line in f:
+            if not line.startswith('#'):
+                break
+            key, sep, value = line[1:].partition(':')
+            if sep:
+                header[key.strip()] = value.strip()
+    return header
+
+
+def parse_value(entry):
+    '''
+    Converts a WaveForms measurement string such as " 120.04 kHz" to a float in base units.
+    '''
+    parts = entry.strip().split(' ')
+    value = float(parts[0])
+    if len(parts) > 1 and len(parts[1]) > 1 and parts[1][0] in UNIT_SCALE:
+        value *= UNIT_SCALE[parts[1][0]]
+    return value
+
+
+def column_range(series):
+    values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float)
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return None
+    return [float(np.min(values)), float(np.max(values))]
+
+
+def describe_csv(file_path):
+    '''
+    Opens a CSV once and returns its catalog entry (type, columns, row count,
+    coordinate ranges, frequency range and any WaveForms header fields).
+    '''
+    kind = classify_csv(file_path)
+    entry = {'type': kind, 'columns': [], 'rows': 0, 'coords': {}, 'freq_range': None, 'header': {}}
+
+    if kind != 'log' and kind != 'merged':
+        entry['header'] = read_header(file_path)
+
+    df = pd.read_csv(file_path, comment='#')
+    entry['rows'] = len(df)
+
+    if kind == 'measurement':
+        # Measurement files are a Name/Value table, so the "columns" are the measurement names
+        names = df['Name'].astype(str).str.strip()
+        entry['columns'] = names.tolist()
+        freqs = []
+        for name, value in zip(names, df['Value']):
+            if 'Frequency' not in name:
+                continue
+            try:
+                freqs.append(parse_value(str(value)))
+            except ValueError:
+                continue
+        if freqs:
+            entry['freq_range'] = [min(freqs), max(freqs)]
+        return entry
+
+    entry['columns'] = [str(col) for col in df.columns]
+
+    for coord, col in COORD_COLUMNS.items():
+        if col in df.columns:
+            entry['coords'][coord] = column_range(df[col])
+
+    for col in FREQ_COLUMNS:
+        if col in df.columns:
+            entry['freq_range'] = column_range(df[col])
+            break
+
+    return entry
+
+
+def load_catalog(index_file):
+    if not os.path.isfile(index_file):
+        return {}
+    with open(index_file, 'r') as f:
+        return json.load(f)
+
+
+def build_catalog(root, index_file=None, verbose=False):
+    '''
+    Scans every CSV below root and writes the catalog to index_file (default: root/catalog.json).
+    Files whose mtime and size match the existing index are not reopened.
+    Returns the catalog dictionary keyed by path relative to root.
+    '''
+    if index_file is None:
+        index_file = os.path.join(root, 'catalog.json')
+
+    old_catalog = load_catalog(index_file)
+    catalog = {}
+    num_scanned = 0
+
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names[:] = sorted(d for d in dir_names if not d.startswith('.') and d != '__pycache__')
+
+        for name in sorted(file_names):
+            if not name.lower().endswith('.csv'):
+                continue
+
+            file_path = os.path.join(dir_path, name)
+            rel_path = os.path.relpath(file_path, root).replace(os.sep, '/')
+            stat = os.stat(file_path)
+
+            old_entry = old_catalog.get(rel_path)
+            if old_entry and old_entry['mtime'] == stat.st_mtime and old_entry['size'] == stat.st_size:
+                catalog[rel_path] = old_entry
+                continue
+
+            try:
+                entry = describe_csv(file_path)
+            except (pd.errors.ParserError, pd.errors.EmptyDataError, KeyError, UnicodeDecodeError) as e:
+                entry = {'type': 'unreadable', 'error': str(e)}
+
+            entry['mtime'] = stat.st_mtime
+            entry['size'] = stat.st_size
+            catalog[rel_path] = entry
+            num_scanned += 1
+
+            if verbose:
+                print(f'--> Indexed {rel_path} ({entry["type"]})')
+
+    with open(index_file, 'w') as f:
+        json.dump(catalog, f, indent=4)
+
+    if verbose:
+        print(f'--> {num_scanned} new/changed files, {len(catalog) - num_scanned} unchanged. Index saved to {index_file}')
+
+    return catalog
+
+
+def query_catalog(catalog, kind=None, path=None, columns=None, freq=None, freq_tol=500.0, sweep=None, **coords):
+    '''
+    Selects datasets from a catalog without opening them. Returns a sorted list of relative paths.
+
+    - kind: dataset type (or list of types), e.g. 'log' or ['waveform', 'measurement']
+    - path: glob pattern matched against the relative path, e.g. '03-27_spiral_tx/*'
+    - columns: column names that must all be present
+    - freq: frequency (Hz) that must lie within the file's frequency range (+/- freq_tol)
+    - sweep: coordinate ('r', 'theta' or 'z') that must vary within the file
+    - coords: fixed coordinate values, e.g. r=0.0, that must lie within the file's range
+    '''
+    if isinstance(kind, str):
+        kind = [kind]
+
+    matches = []
+    for rel_path, entry in catalog.items():
+        if kind is not None and entry['type'] not in kind:
+            continue
+        if path is not None and not fnmatch.fnmatch(rel_path, path):
+            continue
+        if columns is not None and not set(columns).issubset(entry.get('columns', [])):
+            continue
+
+        if freq is not None:
+            freq_range = entry.get('freq_range')
+            if freq_range is None or not (freq_range[0] - freq_tol <= freq <= freq_range[1] + freq_tol):
+                continue
+
+        entry_coords = entry.get('coords', {})
+        if sweep is not None:
+            sweep_range = entry_coords.get(sweep)
+            if sweep_range is None or sweep_range[0] == sweep_range[1]:
+                continue
+
+        in_range = True
+        for coord, value in coords.items():
+            coord_range = entry_coords.get(coord)
+            if coord_range is None or not (coord_range[0] <= value <= coord_range[1]):
+                in_range = False
+                break
+        if not in_range:
+            continue
+
+        matches.append(rel_path)
+
+    return sorted(matches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the dataset catalog of the experiment folders.")
+    parser.add_argument('-d', '--root', type=str, default='.', help='Root directory to scan.')
+    parser.add_argument('-i', '--index', type=str, default=None, help='Index file (default: <root>/catalog.json).')
+    parser.add_argument('-k', '--kind', type=str, nargs='+', default=None,
+                        choices=['waveform', 'measurement', 'bode', 'merged', 'log'], help='Dataset type(s) to select.')
+    parser.add_argument('-p', '--path', type=str, default=None, help='Glob pattern on the relative path.')
+    parser.add_argument('-c', '--sweep', type=str, default=None, choices=['r', 'theta', 'z'],
+                        help='Only files in which this coordinate varies.')
+    parser.add_argument('-f', '--freq', type=float, default=None, help='Frequency in kHz contained in the file.')
+    parser.add_argument('--columns', type=str, nargs='+', default=None, help='Columns that must be present.')
+    args = parser.parse_args()
+
+    catalog = build_catalog(args.root, args.index, verbose=True)
+
+    freq = args.freq * 1e3 if args.freq is not None else None
+    matches = query_catalog(catalog, kind=args.kind, path=args.path, columns=args.columns, freq=freq, sweep=args.sweep)
+
+    print(f'\n{len(matches)} matching datasets:')
+    for rel_path in matches:
+        entry = catalog[rel_path]
+        print(f'  {rel_path:<55} {entry["type"]:<12} {entry.get("rows", 0):>6} rows')
+
+
+if __name__ == "__main__":
+    main()
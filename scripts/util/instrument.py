@@ -0,0 +1,123 @@
+from contextlib import ExitStack
+import numpy as np
+
+CH1_ATTEN = 10      # Power Supply Voltage
+CH2_ATTEN = 1/50e-3 # Current Probe 50 mV/A
+CH3_ATTEN = 500     # TX Coil Voltage
+CH4_ATTEN = 10      # RX Coil Voltage
+ATTENS = np.array([CH1_ATTEN, CH2_ATTEN, CH3_ATTEN, CH4_ATTEN])
+
+SCOPE_RANGE = 10.0
+
+CLOCK_PIN = 0       # TX gate clock
+ENABLE_PIN = 1      # TX driver enable
+FORCE_PIN = 2       # ESP32 force PWM
+
+STATUS_DONE = 2     # dwfpy Status.DONE
+
+class Instrument:
+    '''
+    Thin layer over the ADP3450 shared by every acquisition script. Owns the four scope channels
+    and their attenuations, the TX clock and enable lines, and the force-pin logic capture.
+    With simulate=True a SimulatedDevice is used instead, so scripts run without the hardware.
+    '''
+    def __init__(self, simulate=False, seed=None):
+        self.simulate = simulate
+        self.seed = seed
+        self.device = None
+        self._stack = ExitStack()
+
+    def __enter__(self):
+        if self.simulate:
+            from util.simulated_device import SimulatedDevice
+            device = SimulatedDevice(ATTENS, seed=self.seed)
+        else:
+            import dwfpy as dwf
+            device = dwf.Device()
+
+        self.device = self._stack.enter_context(device)
+        self.setup()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.shutdown()
+        finally:
+            self._stack.close()
+
+    @property
+    def name(self):
+        return self.device.name
+
+    @property
+    def serial_number(self):
+        return self.device.serial_number
+
+    def setup(self):
+        scope = self.device.analog_input
+        for channel in range(4):
+            scope[channel].setup(range=SCOPE_RANGE, offset=0.0)
+        for channel in range(4):
+            scope.setup_edge_trigger(channel=channel, mode='auto')
+
+        self.device.digital_input.setup_edge_trigger(channel=FORCE_PIN, edge='rising')
+
+    def enable(self):
+        self.device.digital_io[ENABLE_PIN].setup(enabled=True, state=True, configure=True)
+
+    def set_frequency(self, freq):
+        self.device.digital_output[CLOCK_PIN].setup_clock(frequency=freq, configure=True, start=True)
+
+    def stop_clock(self):
+        self.device.digital_io[CLOCK_PIN].output_state = False
+
+    def shutdown(self):
+        self.device.digital_io[CLOCK_PIN].output_state = False
+        self.device.digital_io[ENABLE_PIN].output_state = False
+
+    def capture(self, sample_rate, buffer_size):
+        '''
+        Single scope acquisition. Returns (ch1, ch2, ch3, ch4) with the probe attenuations applied.
+        '''
+        scope = self.device.analog_input
+        scope.single(sample_rate=sample_rate, buffer_size=buffer_size, configure=True, start=True)
+        ch1 = scope[0].get_data() * CH1_ATTEN
+        ch2 = scope[1].get_data() * CH2_ATTEN
+        ch3 = scope[2].get_data() * CH3_ATTEN
+        ch4 = scope[3].get_data() * CH4_ATTEN
+        return ch1, ch2, ch3, ch4
+
+    def capture_logic(self, sample_rate, buffer_size):
+        '''
+        Single logic acquisition triggered on the force pin. Returns the raw 16-bit DIO samples.
+        '''
+        logic = self.device.digital_input
+        logic.single(sample_rate=sample_rate, buffer_size=buffer_size, configure=True, start=True)
+        return logic.get_data()
+
+    def stream(self, sample_rate, callback, length=0.0):
+        '''
+        Continuous record-mode acquisition of all four scope channels. The scope keeps sampling
+        between reads, so consecutive chunks are back to back unless the device reports lost samples.
+        callback(chunk, lost) gets each new (4, n) array of attenuated samples and the number of samples
+        lost just before it, and returns False to stop. length=0 records until the callback stops it.
+        '''
+        scope = self.device.analog_input
+        scope.setup_acquisition(mode='record', sample_rate=sample_rate, record_length=length, configure=True)
+        scope.configure(start=True)
+
+        while True:
+            status = scope.read_status(read_data=True)
+            available, lost, corrupted = scope.record_status
+
+            if available or lost:
+                chunk = np.array([scope[channel].get_data(0, available) for channel in range(4)])
+                if corrupted:  # Treat a corrupted chunk as a gap rather than measure it
+                    chunk, lost = chunk[:, :0], lost + available
+                if callback(chunk * ATTENS[:, None], lost) is False:
+                    break
+
+            if status == STATUS_DONE:
+                break
+
+        scope.configure(start=False)
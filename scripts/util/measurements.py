@@ -1,53 +1,153 @@
 import numpy as np
 
-def get_measurements(ch1, ch2, ch3, ch4, sample_rate, pin_data=None, force_pin=None):
+# Bump whenever an estimator below changes so reprocessed outputs land in a new version folder
+ESTIMATOR_VERSION = 5
+
+FORCE_PER_DUTY = 50 * 9.81  # mN at 100% duty, the ESP32 encodes duty cycle * 50 = mass in grams
+RECTIFIED_2F_GAIN = 4 / (3 * np.pi)  # 2f amplitude of |A cos(wt)| per unit A (the rectified RX has no fundamental)
+
+def get_measurements(ch1, ch2, ch3, ch4, sample_rate, pin_data=None, force_pin=None, drive_freq=None):
     '''
-    Returns a dictionary containing the measurements done on each channel. 
+    Returns a dictionary containing the measurements done on each channel.
     Assumes all unit conversion/attenuation has already been applied to the channel data.
+    If drive_freq (the TX clock frequency) is given, lock-in amplitudes and the TX phase are added
+    (RX is rectified, so it is demodulated at twice the drive frequency).
+    '''
+    if pin_data is not None:
+        pin_data = pin_data[np.newaxis, :]
+
+    batch = get_measurements_batch(ch1[np.newaxis, :], ch2[np.newaxis, :], ch3[np.newaxis, :], ch4[np.newaxis, :],
+                                   sample_rate, pin_data, force_pin, drive_freq)
+
+    return {key: values[0] for key, values in batch.items()}
+
+
+def get_measurements_batch(ch1, ch2, ch3, ch4, sample_rate, pin_data=None, force_pin=None, drive_freq=None):
+    '''
+    Vectorized version of get_measurements over a batch of captures.
+    Each channel is a 2D array of shape (num_captures, num_samples) and every entry
+    of the returned dictionary is a 1D array with one value per capture.
+    drive_freq is a single frequency or one per capture.
     '''
     meas = {}
-    
-    # Channel 1 - Power Supply Voltage (V) 
-    meas.update({'Power Supply Average (V)': np.mean(ch1)})     # Average
-    meas.update({'Power Supply Min (V)': np.min(ch1)})          # Min
-    meas.update({'Power Supply Max (V)': np.max(ch1)})          # Max
+
+    # Channel 1 - Power Supply Voltage (V)
+    meas.update({'Power Supply Average (V)': np.mean(ch1, axis=1)})     # Average
+    meas.update({'Power Supply Min (V)': np.min(ch1, axis=1)})          # Min
+    meas.update({'Power Supply Max (V)': np.max(ch1, axis=1)})          # Max
 
     # Channel 2 - TX Current (A)
-    meas.update({'TX Current RMS (A)': np.std(ch2)})                             # RMS
-    meas.update({'TX Current Peak-to-Peak (A)': 2 * np.sqrt(2) * np.std(ch2)})   # Peak-to-Peak
-    meas.update({'TX Current Average (A)': np.mean(ch2)})                        # Average
-    meas.update({'TX Current Frequency (Hz)': get_freq(ch2, sample_rate)})       # Frequency
+    meas.update({'TX Current RMS (A)': np.std(ch2, axis=1)})                     # RMS (AC coupled)
+    meas.update({'TX Current Peak-to-Peak (A)': np.ptp(ch2, axis=1)})            # Peak-to-Peak
+    meas.update({'TX Current Average (A)': np.mean(ch2, axis=1)})                # Average
+    meas.update({'TX Current Frequency (Hz)': get_freq_batch(ch2, sample_rate)}) # Frequency
 
     # Channel 3 - TX Voltage (V)
-    meas.update({'TX Voltage RMS (V)': np.std(ch3)})                             # RMS
-    meas.update({'TX Voltage Peak-to-Peak (V)': 2 * np.sqrt(2) * np.std(ch3)})   # Peak-to-Peak
-    meas.update({'TX Voltage Average (V)': np.mean(ch3)})                        # Average
-    meas.update({'TX Voltage Frequency (Hz)': get_freq(ch3, sample_rate)})       # Frequency
+    meas.update({'TX Voltage RMS (V)': np.std(ch3, axis=1)})                     # RMS (AC coupled)
+    meas.update({'TX Voltage Peak-to-Peak (V)': np.ptp(ch3, axis=1)})            # Peak-to-Peak
+    meas.update({'TX Voltage Average (V)': np.mean(ch3, axis=1)})                # Average
+    meas.update({'TX Voltage Frequency (Hz)': get_freq_batch(ch3, sample_rate)}) # Frequency
 
     # Channel 4 - RX Voltage (V)
-    meas.update({'RX Voltage Average (V)': np.mean(ch4)})           # Average
-    meas.update({'RX Voltage RMS (V)': np.sqrt(np.mean(ch4)**2)})   # RMS
-    meas.update({'RX Coil Min (V)': np.min(ch4)})                   # Min
-    meas.update({'RX Coil Max (V)': np.max(ch4)})                   # Max
-    
-    # Digital I/O - Force Measurement 
+    meas.update({'RX Voltage Average (V)': np.mean(ch4, axis=1)})           # Average
+    meas.update({'RX Voltage RMS (V)': np.sqrt(np.mean(ch4**2, axis=1))})   # RMS (DC coupled)
+    meas.update({'RX Coil Min (V)': np.min(ch4, axis=1)})                   # Min
+    meas.update({'RX Coil Max (V)': np.max(ch4, axis=1)})                   # Max
+
+    # Lock-in at the drive frequency for TX current and voltage. The RX channel is full-wave rectified,
+    # so its line is at twice the drive frequency; scale it back to the RMS of the coil voltage
+    if drive_freq is not None:
+        phasors = get_lockin_batch(np.stack([ch2, ch3]), sample_rate, drive_freq)
+        current, voltage = np.abs(phasors) / np.sqrt(2)  # Peak -> RMS of the fundamental
+        rx_phasor = get_lockin_batch(ch4, sample_rate, 2 * np.asarray(drive_freq, dtype=float))
+        meas.update({'TX Current Lock-in RMS (A)': current})
+        meas.update({'TX Voltage Lock-in RMS (V)': voltage})
+        meas.update({'RX Voltage Lock-in RMS (V)': np.abs(rx_phasor) / RECTIFIED_2F_GAIN / np.sqrt(2)})
+        meas.update({'TX V-I Phase (deg)': np.degrees(np.angle(phasors[1] / phasors[0]))})
+
+    # Digital I/O - Force Measurement
     if pin_data is not None:
         signal = (pin_data >> force_pin) & 1
-        duty_cycle = np.sum(signal) / len(signal)
-        # print(f'Duty Cycle: {duty_cycle*100:.2f}%')
-        meas.update({'RX Force (mN)': duty_cycle*50 * 9.81})  # duty cyle * 50 = mass in grams
+        duty_cycle = get_duty_batch(signal)
+        meas.update({'RX Force (mN)': duty_cycle * FORCE_PER_DUTY})
 
     return meas
 
 
+def get_lockin_batch(data, sample_rate, ref_freq):
+    '''
+    Digital lock-in: correlates each capture with a complex reference at ref_freq (the TX clock)
+    to get its in-phase (real) and quadrature (imaginary) components.
+    data has shape (..., num_captures, num_samples), e.g. several channels stacked on the first axis,
+    and ref_freq is a single frequency or one per capture.
+    Returns the complex peak-amplitude phasor of every capture, with phase relative to its first sample.
+    A Hann window keeps the DC level and a partial last cycle from leaking into the result.
+    '''
+    num_samples = data.shape[-1]
+    t = np.arange(num_samples) / sample_rate
+    window = np.hanning(num_samples)
+
+    ref_freq = np.asarray(ref_freq, dtype=float)
+    reference = np.exp(-2j * np.pi * ref_freq[..., np.newaxis] * t) * window  # (num_captures or 1, num_samples)
+
+    centred = data - np.mean(data, axis=-1, keepdims=True)
+    return 2 * np.einsum('...n,...n->...', centred, reference) / np.sum(window)
+
+
 def get_freq(data, sample_rate):
-    centred = data - np.mean(data)
-    crossings = np.where(np.diff(np.sign(centred)) > 0)[0]
+    return get_freq_batch(data[np.newaxis, :], sample_rate)[0]
+
+
+def get_freq_batch(data, sample_rate):
+    '''
+    Estimates the frequency of each row of data from its rising zero crossings.
+    Rows with fewer than two crossings return NaN.
+    '''
+    centred = data - np.mean(data, axis=1, keepdims=True)
+    crossings = np.diff(np.sign(centred), axis=1) > 0
+
+    num_crossings = np.sum(crossings, axis=1)
+    first = np.argmax(crossings, axis=1)
+    last = crossings.shape[1] - 1 - np.argmax(crossings[:, ::-1], axis=1)
+
+    freq = np.full(len(data), np.nan)
+    valid = num_crossings >= 2  # Not enough crossings to determine frequency otherwise
+
+    points_per_cycle = (last[valid] - first[valid]) / (num_crossings[valid] - 1)
+    freq[valid] = sample_rate / points_per_cycle
+
+    return freq
+
+
+def get_duty_batch(signal):
+    '''
+    Duty cycle of each row of a 0/1 PWM signal, measured over whole periods only so a partial
+    period at either end of the capture does not bias it. The span between the first and last rising
+    edges or between the first and last falling edges is used, whichever is longer.
+    Rows without two edges of the same kind (constant, or less than a period) fall back to the plain mean.
+    '''
+    signal = signal.astype(np.int8)
+    num_captures, num_samples = signal.shape
+
+    # Rows are flattened so every row's high count comes out of a single np.add.reduceat call
+    flat = np.append(signal.ravel(), 0)
+    offset = np.arange(num_captures) * num_samples
+
+    duty = np.mean(signal, axis=1)
+    best_span = np.zeros(num_captures, dtype=int)
+
+    steps = np.diff(signal, axis=1)
+    for edges in (steps > 0, steps < 0):
+        num_edges = np.sum(edges, axis=1)
+        first = np.argmax(edges, axis=1) + 1
+        last = num_samples - 1 - np.argmax(edges[:, ::-1], axis=1)
+        span = np.where(num_edges >= 2, last - first, 0)
 
-    if len(crossings) < 2:
-        return float('nan')  # Not enough crossings to determine frequency
+        bounds = np.stack([offset + first, offset + last], axis=1).ravel()
+        high = np.add.reduceat(flat, bounds, dtype=np.int32)[::2]  # Odd entries are the gaps between rows
 
-    points_per_cycle = (crossings[-1] - crossings[0]) / (len(crossings) - 1)
-    freq = sample_rate / points_per_cycle
+        better = span > best_span
+        duty[better] = high[better] / span[better]
+        best_span = np.maximum(best_span, span)
 
-    return freq
\ No newline at end of file
+    return duty
@@ -0,0 +1,103 @@
+import numpy as np
+from util.measurements import FORCE_PER_DUTY, get_duty_batch
+
+NUM_PINS = 16  # DIO lines in a digital_input sample
+
+def find_edges(signal):
+    '''
+    Sample indices of the rising and falling edges of a 0/1 signal (index of the first sample after the edge).
+    '''
+    steps = np.diff(signal.astype(np.int8))
+    rising = np.flatnonzero(steps > 0) + 1
+    falling = np.flatnonzero(steps < 0) + 1
+    return rising, falling
+
+
+def decode_pwm(signal, sample_rate):
+    '''
+    Splits a 0/1 PWM capture into its whole periods (rising edge to rising edge) and measures each one.
+    Returns a dictionary of 1D arrays, one entry per complete period:
+    'Time (s)' of the rising edge from the start of the capture, 'Period (s)', 'Frequency (Hz)' and 'Duty Cycle'.
+    '''
+    rising, falling = find_edges(signal)
+
+    if len(rising) < 2:
+        empty = np.zeros(0)
+        return {'Time (s)': empty, 'Period (s)': empty, 'Frequency (Hz)': empty, 'Duty Cycle': empty}
+
+    starts, stops = rising[:-1], rising[1:]
+    period = stops - starts
+
+    # First falling edge after each rising edge; a period with none is high throughout
+    fall_idx = np.searchsorted(falling, starts)
+    fall = np.append(falling, stops[-1])[fall_idx]
+    high = np.minimum(fall, stops) - starts
+
+    return {
+        'Time (s)': starts / sample_rate,
+        'Period (s)': period / sample_rate,
+        'Frequency (Hz)': sample_rate / period,
+        'Duty Cycle': high / period
+    }
+
+
+def get_force_series(pin_data, force_pin, sample_rate):
+    '''
+    Per-period force readings from one long logic capture of the ESP32 force pin.
+    Returns the decode_pwm dictionary with an added 'RX Force (mN)' entry.
+    '''
+    series = decode_pwm((pin_data >> force_pin) & 1, sample_rate)
+    series['RX Force (mN)'] = series['Duty Cycle'] * FORCE_PER_DUTY
+    return series
+
+
+def unpack_pins(pin_data):
+    '''
+    Splits a 16-bit logic capture into one 0/1 row per DIO line in a single np.unpackbits pass.
+    Returns a uint8 array of shape (NUM_PINS, num_samples) where row i is DIO i.
+    '''
+    # Low byte then high byte of every sample, laid out as 2 rows so the 16 unpacked rows come out contiguous
+    as_bytes = np.ascontiguousarray(np.asarray(pin_data, dtype='<u2').view(np.uint8).reshape(-1, 2).T)
+    return np.unpackbits(as_bytes, axis=0, bitorder='little')
+
+
+def decode_pins(pin_data, sample_rate):
+    '''
+    Duty cycle, frequency and edge counts for all 16 DIO lines of a logic capture at once.
+    Duty and frequency are taken over whole periods like get_duty_batch; frequency is NaN for lines
+    without two edges of the same kind. Returns a dictionary of arrays indexed by pin number.
+    '''
+    bits = unpack_pins(pin_data)
+    steps = np.diff(bits.astype(np.int8), axis=1)
+    rising = steps > 0
+    falling = steps < 0
+    num_rising = np.sum(rising, axis=1)
+    num_falling = np.sum(falling, axis=1)
+
+    # Whole periods between edges of the same kind; falling edges cover captures with a single rising edge
+    freq = np.full(NUM_PINS, np.nan)
+    for edges, num_edges in ((rising, num_rising), (falling, num_falling)):
+        first = np.argmax(edges, axis=1)
+        last = edges.shape[1] - 1 - np.argmax(edges[:, ::-1], axis=1)
+        valid = np.isnan(freq) & (num_edges >= 2)
+        freq[valid] = sample_rate * (num_edges[valid] - 1) / (last[valid] - first[valid])
+
+    return {
+        'Duty Cycle': get_duty_batch(bits),
+        'Frequency (Hz)': freq,
+        'Rising Edges': num_rising,
+        'Falling Edges': num_falling
+    }
+
+
+def get_pin_measurements(pin_data, sample_rate, pins):
+    '''
+    Flattens decode_pins for the given DIO lines into columns for append_data, e.g. 'DIO3 Duty Cycle'.
+    '''
+    decoded = decode_pins(pin_data, sample_rate)
+
+    meas = {}
+    for pin in pins:
+        for key, values in decoded.items():
+            meas[f'DIO{pin} {key}'] = values[pin]
+    return meas
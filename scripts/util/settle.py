@@ -0,0 +1,41 @@
+import time
+import numpy as np
+from util.measurements import get_freq
+
+def wait_for_settle(capture, sample_rate, amp_rate_tol=0.5, freq_tol=150.0, num_stable=3, timeout=2.0, min_wait=0.0):
+    '''
+    Replaces a fixed sleep after a frequency change. Takes back-to-back scope captures until the
+    TX voltage amplitude drifts by less than amp_rate_tol (relative change per second) and the TX
+    frequency moves by less than freq_tol (Hz) for num_stable consecutive captures, or until timeout seconds.
+    The amplitude check is a rate so it does not depend on how quickly the scope re-arms.
+
+    capture() must return the 4 attenuated channel arrays (ch1, ch2, ch3, ch4).
+    Returns (settle_time, channels) where channels is the last capture, ready to be measured.
+    '''
+    start = time.time()
+    if min_wait > 0:
+        time.sleep(min_wait)
+
+    channels = capture()
+    prev_time = time.time()
+    prev_amp = np.std(channels[2])
+    prev_freq = get_freq(channels[2], sample_rate)
+    stable_count = 0
+
+    while prev_time - start < timeout:
+        channels = capture()
+        now = time.time()
+        amp = np.std(channels[2])
+        freq = get_freq(channels[2], sample_rate)
+
+        amp_rate = abs(amp - prev_amp) / max(abs(prev_amp), 1e-12) / max(now - prev_time, 1e-6)
+        amp_ok = amp_rate <= amp_rate_tol
+        freq_ok = abs(freq - prev_freq) <= freq_tol  # NaN (no crossings) never counts as settled
+
+        stable_count = stable_count + 1 if (amp_ok and freq_ok) else 0
+        if stable_count >= num_stable:
+            break
+
+        prev_time, prev_amp, prev_freq = now, amp, freq
+
+    return time.time() - start, channels
@@ -0,0 +1,261 @@
+import time
+import numpy as np
+
+# Tank model fitted to the 01-16 / 01-19 sweeps (~9 A RMS peak near 118 kHz, ~3.6 A RMS at 115 kHz)
+RESONANT_FREQ = 118e3   # Hz
+QUALITY_FACTOR = 45
+PEAK_CURRENT = 13.0     # A amplitude at resonance
+COIL_REACTANCE = 56.0   # V/A, TX coil voltage per amp of current (wL)
+SUPPLY_VOLTAGE = 9.6    # V
+SUPPLY_RIPPLE = 0.6     # V amplitude at twice the drive frequency
+RX_GAIN = 0.35          # V of rectified RX voltage per amp of TX current
+FORCE_GAIN = 2.4        # mN per A^2 (RMS) of TX current
+SETTLE_TAU = 0.02       # s, envelope time constant after a frequency change
+SCOPE_OVERHEAD = 5e-3   # s, USB/configure time of a real scope.single call
+RECORD_POLL = 1e-3      # s, minimum time between record-mode status reads
+RECORD_BUFFER = 2**20   # samples held on the device in record mode before they are lost
+
+SCOPE_NOISE = 0.6e-3    # V RMS at the scope input (~1 LSB of the 14-bit ADC on the 10 V range)
+
+
+class TankModel:
+    '''
+    Driven series-resonant TX tank. Keeps track of the drive frequency and lets the
+    current envelope relax exponentially towards its new steady state after every change.
+    '''
+    def __init__(self, attens):
+        self.attens = attens
+        self.freq = RESONANT_FREQ
+        self.running = False
+        self.rx_coupling = 1.0
+        self._change_time = time.time()
+        self._start_amplitude = 0.0
+
+    def steady_amplitude(self, freq):
+        detuning = freq / RESONANT_FREQ - RESONANT_FREQ / freq
+        return PEAK_CURRENT / np.sqrt(1 + (QUALITY_FACTOR * detuning)**2)
+
+    def amplitude(self, now):
+        target = self.steady_amplitude(self.freq) if self.running else 0.0
+        decay = np.exp(-(now - self._change_time) / SETTLE_TAU)
+        return target + (self._start_amplitude - target) * decay
+
+    def set_drive(self, freq, running):
+        now = time.time()
+        self._start_amplitude = self.amplitude(now)
+        self._change_time = now
+        self.freq = freq
+        self.running = running
+
+    def scope_channels(self, sample_rate, buffer_size, rng):
+        '''Returns the 4 raw (pre-attenuation) scope channels, as dwfpy would.'''
+        # Auto trigger, so the capture starts at an arbitrary point in the cycle
+        t = (np.arange(buffer_size) + rng.uniform(0, sample_rate / self.freq)) / sample_rate
+        return self.waveforms(t, self.amplitude(time.time()), rng)
+
+    def waveforms(self, t, amp, rng):
+        '''Raw scope channels at sample times t (s) for a current amplitude amp.'''
+        w = 2 * np.pi * self.freq
+
+        current = amp * np.sin(w * t)
+        tx_voltage = amp * COIL_REACTANCE * np.cos(w * t)
+        supply = SUPPLY_VOLTAGE - 0.005 * amp**2 + SUPPLY_RIPPLE * (amp / PEAK_CURRENT) * np.sin(2 * w * t)
+        rx = np.abs(RX_GAIN * self.rx_coupling * amp * np.cos(w * t))
+
+        channels = []
+        for signal, atten in zip([supply, current, tx_voltage, rx], self.attens):
+            channels.append(signal / atten + rng.normal(0, SCOPE_NOISE, len(t)))
+        return channels
+
+    def force(self):
+        i_rms = self.amplitude(time.time()) / np.sqrt(2)
+        return FORCE_GAIN * self.rx_coupling * i_rms**2
+
+
+class SimulatedAnalogChannel:
+    def __init__(self):
+        self.range = 10.0
+        self.offset = 0.0
+        self._data = np.zeros(0)
+
+    def setup(self, range=10.0, offset=0.0, **kwargs):
+        self.range = range
+        self.offset = offset
+
+    def get_data(self, first_sample=0, sample_count=-1):
+        if sample_count < 0:
+            return self._data[first_sample:]
+        return self._data[first_sample:first_sample + sample_count]
+
+
+class SimulatedAnalogInput:
+    def __init__(self, tank, rng):
+        self._tank = tank
+        self._rng = rng
+        self._channels = [SimulatedAnalogChannel() for _ in range(4)]
+
+        self._mode = 'single'
+        self._sample_rate = 1e6
+        self._record_length = 0.0
+        self._record_start = None
+        self._record_index = 0
+        self._record_status = (0, 0, 0)
+
+    def __getitem__(self, idx):
+        return self._channels[idx]
+
+    def setup_edge_trigger(self, channel=0, mode='auto', **kwargs):
+        pass
+
+    def single(self, sample_rate, buffer_size, configure=True, start=True):
+        self._mode = 'single'
+        time.sleep(SCOPE_OVERHEAD + buffer_size / sample_rate)
+        raw = self._tank.scope_channels(sample_rate, buffer_size, self._rng)
+        self._store(raw)
+
+    def setup_acquisition(self, mode=None, sample_rate=None, buffer_size=None, record_length=None, configure=False, start=False):
+        self._mode = mode or self._mode
+        self._sample_rate = sample_rate or self._sample_rate
+        self._record_length = record_length if record_length is not None else self._record_length
+        if start:
+            self.configure(start=True)
+
+    def configure(self, reconfigure=False, start=False):
+        if self._mode == 'record' and start:
+            time.sleep(SCOPE_OVERHEAD)
+            self._record_start = time.time()
+            self._record_index = 0
+        else:
+            self._record_start = None
+
+    def read_status(self, read_data=False):
+        '''
+        In record mode, makes every sample due since the last read available, continuous with the
+        previous chunk. Samples that overflowed the device buffer are reported as lost.
+        '''
+        if self._mode != 'record' or self._record_start is None:
+            return 2  # DONE
+
+        time.sleep(RECORD_POLL)
+        due = int((time.time() - self._record_start) * self._sample_rate)
+        done = False
+        if self._record_length > 0:
+            total = int(self._record_length * self._sample_rate)
+            done = due >= total
+            due = min(due, total)
+
+        available = due - self._record_index
+        lost = max(available - RECORD_BUFFER, 0)
+        available -= lost
+        self._record_index += lost
+
+        t = (self._record_index + np.arange(available)) / self._sample_rate
+        self._store(self._tank.waveforms(t, self._tank.amplitude(time.time()), self._rng))
+        self._record_index += available
+        self._record_status = (available, lost, 0)
+
+        return 2 if done else 3  # DONE / RUNNING
+
+    @property
+    def record_status(self):
+        return self._record_status
+
+    def _store(self, raw):
+        for channel, data in zip(self._channels, raw):
+            half_range = channel.range / 2
+            channel._data = np.clip(data, channel.offset - half_range, channel.offset + half_range)
+
+
+class SimulatedClock:
+    def __init__(self, tank):
+        self._tank = tank
+
+    def setup_clock(self, frequency, configure=True, start=True):
+        self._tank.set_drive(frequency, start)
+
+
+class SimulatedDigitalOutput:
+    def __init__(self, tank):
+        self._clocks = [SimulatedClock(tank)]
+
+    def __getitem__(self, idx):
+        return self._clocks[idx]
+
+
+class SimulatedDigitalIO:
+    def __init__(self, tank, idx):
+        self._tank = tank
+        self._idx = idx
+        self._state = False
+
+    def setup(self, enabled=True, state=False, configure=True):
+        self.output_state = state
+
+    @property
+    def output_state(self):
+        return self._state
+
+    @output_state.setter
+    def output_state(self, state):
+        self._state = state
+        # DIO 0 carries the TX clock, so pulling it low stops the drive
+        if self._idx == 0 and not state:
+            self._tank.set_drive(self._tank.freq, False)
+
+
+class SimulatedDigitalInput:
+    '''
+    Logic analyser producing the ESP32 force PWM (duty = force / (50 g * 9.81)) on the trigger pin.
+    '''
+    def __init__(self, tank, dio, pwm_freq=1e3):
+        self._tank = tank
+        self._dio = dio
+        self._pwm_freq = pwm_freq
+        self._force_pin = 2
+        self._data = np.zeros(0, dtype=np.uint16)
+
+    def setup_edge_trigger(self, channel=2, edge='rising', **kwargs):
+        self._force_pin = channel
+
+    def single(self, sample_rate, buffer_size, configure=True, start=True):
+        time.sleep(SCOPE_OVERHEAD + buffer_size / sample_rate)
+        duty = np.clip(self._tank.force() / (50 * 9.81), 0.0, 1.0)
+
+        # Rising-edge trigger: the capture starts at the beginning of a PWM period
+        cycle = (np.arange(buffer_size) / sample_rate * self._pwm_freq) % 1.0
+        data = (cycle < duty).astype(np.uint16) << self._force_pin
+
+        for idx, dio in enumerate(self._dio):
+            if dio.output_state:
+                data |= np.uint16(1 << idx)
+        self._data = data
+
+    def get_data(self):
+        return self._data
+
+
+class SimulatedDevice:
+    '''
+    Drop-in stand-in for dwfpy.Device covering the calls made by the acquisition scripts.
+    Synthesizes TX/RX waveforms from a resonant tank model and a PWM force pin.
+    attens are the probe attenuations, used to return raw scope volts like the real device.
+    '''
+    def __init__(self, attens, seed=None):
+        self.name = 'SimulatedADP3450'
+        self.serial_number = 'SN:SIMULATED'
+
+        rng = np.random.default_rng(seed)
+        self.tank = TankModel(attens)
+        self.analog_input = SimulatedAnalogInput(self.tank, rng)
+        self.digital_output = SimulatedDigitalOutput(self.tank)
+        self.digital_io = [SimulatedDigitalIO(self.tank, idx) for idx in range(16)]
+        self.digital_input = SimulatedDigitalInput(self.tank, self.digital_io)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.tank.set_drive(self.tank.freq, False)
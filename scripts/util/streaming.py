@@ -0,0 +1,77 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from util.measurements import get_measurements_batch
+
+class SlidingWindow:
+    '''
+    Buffers a continuous multi-channel sample stream and hands back every complete window.
+    Windows are window_size samples long and start every hop_size samples (hop_size = window_size
+    gives back-to-back windows with no gaps). Leftover samples are kept for the next push.
+    '''
+    def __init__(self, window_size, hop_size=None, num_channels=4):
+        self.window_size = int(window_size)
+        self.hop_size = int(hop_size) if hop_size else self.window_size
+        self.buffer = np.zeros((num_channels, 0))
+        self.start_index = 0  # Stream index of buffer[:, 0]
+
+    def push(self, chunk):
+        '''
+        Adds a (num_channels, n) chunk of new samples.
+        Returns (windows, starts): windows has shape (num_channels, num_windows, window_size)
+        and starts holds the stream index of the first sample of each window.
+        '''
+        self.buffer = np.concatenate([self.buffer, chunk], axis=1)
+
+        num_samples = self.buffer.shape[1]
+        if num_samples < self.window_size:
+            return np.zeros((len(self.buffer), 0, self.window_size)), np.zeros(0, dtype=int)
+
+        num_windows = (num_samples - self.window_size) // self.hop_size + 1
+        view = sliding_window_view(self.buffer, self.window_size, axis=1)
+        windows = view[:, ::self.hop_size][:, :num_windows].copy()
+        starts = self.start_index + np.arange(num_windows) * self.hop_size
+
+        consumed = num_windows * self.hop_size
+        self.buffer = self.buffer[:, consumed:]
+        self.start_index += consumed
+
+        return windows, starts
+
+    def skip(self, num_samples):
+        '''
+        Drops the buffered samples after a gap in the stream (lost samples), so no window straddles it.
+        '''
+        self.start_index += self.buffer.shape[1] + num_samples
+        self.buffer = self.buffer[:, :0]
+
+
+def stream_measurements(instrument, sample_rate, window_size, on_windows, hop_size=None, length=0.0):
+    '''
+    Gapless measurement time series from a record-mode acquisition.
+    Every complete window of the stream is measured with get_measurements_batch and on_windows(results)
+    is called with a dictionary of 1D arrays, one entry per window, plus 'Time (s)' (window centre
+    from the start of the recording) and 'Lost Samples' (samples dropped by the device so far).
+    on_windows returns False to stop the recording; length > 0 stops it after that many seconds.
+    Returns the total number of lost samples.
+    '''
+    window = SlidingWindow(window_size, hop_size)
+    lost_total = 0
+
+    def on_chunk(chunk, lost):
+        nonlocal lost_total
+        if lost:
+            lost_total += lost
+            window.skip(lost)
+
+        windows, starts = window.push(chunk)
+        if len(starts) == 0:
+            return True
+
+        results = get_measurements_batch(*windows, sample_rate)
+        results['Time (s)'] = (starts + window.window_size / 2) / sample_rate
+        results['Lost Samples'] = np.full(len(starts), lost_total)
+
+        return on_windows(results) is not False
+
+    instrument.stream(sample_rate, on_chunk, length)
+    return lost_total
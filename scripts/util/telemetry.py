@@ -0,0 +1,223 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from util.append_data import append_data
+
+TIME_COL = 'Time (s)'
+RAW = 'raw'
+RESOLUTIONS = {'1s': 1, '10s': 10, '1min': 60}  # Rollup level name -> bucket width in seconds
+MAX_POINTS = 2000  # Most points drawn per line before a coarser level is used
+
+
+def rollup(df, resolution, time_col=TIME_COL):
+    '''
+    Buckets a raw log into resolution-second bins.
+    Returns one row per bin with the bin start time, the number of raw rows and '<col> Min/Max/Mean'
+    for every numeric column.
+    '''
+    numeric = df.select_dtypes(include='number').drop(columns=time_col)
+    bins = np.floor(df[time_col] / resolution) * resolution
+    grouped = numeric.groupby(bins.rename(time_col))
+
+    out = {'Count': grouped.size()}
+    for col in numeric.columns:
+        out[f'{col} Min'] = grouped[col].min()
+        out[f'{col} Max'] = grouped[col].max()
+        out[f'{col} Mean'] = grouped[col].mean()
+
+    return pd.DataFrame(out).reset_index()
+
+
+def combine_rollups(df, time_col=TIME_COL):
+    '''
+    Merges rows that share a bin start (a bucket flushed in pieces, e.g. across a restart) into one,
+    weighting the means by Count.
+    '''
+    if not df[time_col].duplicated().any():
+        return df
+
+    columns = [col[:-len(' Mean')] for col in df.columns if col.endswith(' Mean')]
+    weighted = df.copy()
+    for col in columns:
+        weighted[f'{col} Mean'] = df[f'{col} Mean'] * df['Count']
+
+    grouped = weighted.groupby(time_col)
+    out = {'Count': grouped['Count'].sum()}
+    for col in columns:
+        out[f'{col} Min'] = grouped[f'{col} Min'].min()
+        out[f'{col} Max'] = grouped[f'{col} Max'].max()
+        out[f'{col} Mean'] = grouped[f'{col} Mean'].sum() / out['Count']
+
+    return pd.DataFrame(out).reset_index()
+
+
+class TelemetryStore:
+    '''
+    Long-term log kept at several resolutions: the raw rows plus 1 s, 10 s and 1 min rollups with
+    min/max/mean per column, each in its own CSV inside the store directory.
+    append() updates every level as rows arrive, so plotting hours of data only reads the coarse files.
+    '''
+    def __init__(self, path, time_col=TIME_COL):
+        self.path = path
+        self.time_col = time_col
+        os.makedirs(path, exist_ok=True)
+
+        self._buckets = {name: None for name in RESOLUTIONS}
+        self._cache = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    @classmethod
+    def from_csv(cls, csv_file, path=None, time_col=TIME_COL):
+        '''
+        Builds (or rebuilds, if csv_file is newer) the store for an existing log such as
+        02-09_long_term/mass5g.csv. The default store path is '<csv stem>_telemetry'.
+        '''
+        path = path or os.path.splitext(csv_file)[0] + '_telemetry'
+        store = cls(path, time_col)
+
+        raw_file = store.file(RAW)
+        if os.path.isfile(raw_file) and os.path.getmtime(raw_file) >= os.path.getmtime(csv_file):
+            return store
+
+        shutil.copyfile(csv_file, raw_file)
+        df = pd.read_csv(raw_file)
+        for name, resolution in RESOLUTIONS.items():
+            rollup(df, resolution, time_col).to_csv(store.file(name), index=False)
+
+        return store
+
+    def file(self, level):
+        return os.path.join(self.path, f'{level}.csv')
+
+    def append(self, data):
+        '''
+        Logs one row (a dictionary like the ones passed to append_data) at every level.
+        A rollup row is written once its bucket is complete.
+        '''
+        append_data(self.file(RAW), data)
+
+        t = data[self.time_col]
+        values = {col: float(value) for col, value in data.items()
+                  if col != self.time_col and isinstance(value, (int, float, np.number)) and not isinstance(value, bool)}
+
+        for name, resolution in RESOLUTIONS.items():
+            start = np.floor(t / resolution) * resolution
+            bucket = self._buckets[name]
+
+            if bucket is not None and bucket['start'] != start:
+                self._write_bucket(name)
+                bucket = None
+
+            if bucket is None:
+                bucket = self._buckets[name] = {'start': start, 'count': 0, 'min': {}, 'max': {}, 'sum': {}}
+
+            bucket['count'] += 1
+            for col, value in values.items():
+                bucket['min'][col] = min(bucket['min'].get(col, value), value)
+                bucket['max'][col] = max(bucket['max'].get(col, value), value)
+                bucket['sum'][col] = bucket['sum'].get(col, 0.0) + value
+
+    def flush(self):
+        '''
+        Writes the partially filled buckets. load() merges them with any later rows for the same bucket.
+        '''
+        for name in RESOLUTIONS:
+            if self._buckets[name] is not None:
+                self._write_bucket(name)
+
+    def _write_bucket(self, name):
+        bucket = self._buckets[name]
+        row = {self.time_col: bucket['start'], 'Count': bucket['count']}
+        for col in bucket['sum']:
+            row[f'{col} Min'] = bucket['min'][col]
+            row[f'{col} Max'] = bucket['max'][col]
+            row[f'{col} Mean'] = bucket['sum'][col] / bucket['count']
+
+        append_data(self.file(name), row)
+        self._buckets[name] = None
+
+    def load(self, level=RAW, t_start=None, t_stop=None):
+        '''
+        Reads one level, optionally limited to [t_start, t_stop]. Files are cached until they change.
+        '''
+        file_path = self.file(level)
+        if not os.path.isfile(file_path):
+            return pd.DataFrame()
+
+        mtime = os.path.getmtime(file_path)
+        cached = self._cache.get(level)
+        if cached is None or cached[0] != mtime:
+            df = pd.read_csv(file_path)
+            if level != RAW:
+                df = combine_rollups(df, self.time_col)
+            self._cache[level] = (mtime, df)
+        df = self._cache[level][1]
+
+        if t_start is not None:
+            df = df[df[self.time_col] >= t_start - RESOLUTIONS.get(level, 0)]
+        if t_stop is not None:
+            df = df[df[self.time_col] <= t_stop]
+        return df
+
+    def pick_level(self, t_start, t_stop, max_points=MAX_POINTS):
+        '''
+        Finest level that draws at most max_points over [t_start, t_stop].
+        The raw row count in the range is taken from the 1 s rollup counts, so the raw file is never read to decide.
+        '''
+        finest = next(iter(RESOLUTIONS))
+        counts = self.load(finest, t_start, t_stop)
+        if counts.empty or counts['Count'].sum() <= max_points:
+            return RAW
+
+        for name, resolution in RESOLUTIONS.items():
+            if (t_stop - t_start) / resolution <= max_points:
+                return name
+        return name
+
+
+def plot_telemetry(store, columns, axes, max_points=MAX_POINTS):
+    '''
+    Draws each column on its axis (axes share x) as the mean line with a min/max band, and swaps to the
+    level matching the visible range whenever the x limits change (zoom/pan).
+    '''
+    def draw(t_start=None, t_stop=None):
+        if t_start is None:
+            coarse = store.load(list(RESOLUTIONS)[-1])
+            t_start, t_stop = coarse[store.time_col].min(), coarse[store.time_col].max() + list(RESOLUTIONS.values())[-1]
+
+        level = store.pick_level(t_start, t_stop, max_points)
+        df = store.load(level, t_start, t_stop)
+        t = df[store.time_col]
+
+        for ax, col in zip(axes, columns):
+            for artist in list(ax.lines) + list(ax.collections):
+                artist.remove()
+
+            if level == RAW:
+                ax.plot(t, df[col], color='tab:blue')
+            else:
+                t_mid = t + RESOLUTIONS[level] / 2
+                ax.fill_between(t_mid, df[f'{col} Min'], df[f'{col} Max'], color='tab:blue', alpha=0.25, linewidth=0)
+                ax.plot(t_mid, df[f'{col} Mean'], color='tab:blue')
+
+            ax.set_title(f'{col} ({level})', fontsize=10)
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+
+        return t_start, t_stop
+
+    def on_xlim_changed(ax):
+        draw(*ax.get_xlim())
+        ax.figure.canvas.draw_idle()
+
+    t_start, t_stop = draw()
+    axes[0].set_xlim(t_start, t_stop)
+    for ax in axes:
+        ax.set_autoscalex_on(False)
+    axes[0].callbacks.connect('xlim_changed', on_xlim_changed)
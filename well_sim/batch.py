@@ -0,0 +1,185 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from optimizer import run_optimization, build_slot_grid
+from physics import estimate_inductance, build_or_load_physics_matrix
+from payload import build_payload
+
+# Same defaults as the main.py command line
+HARDWARE_DEFAULTS = {
+    "r_min_cm": 3.0,
+    "r_max_cm": 30.0,
+    "wire_diameter_cm": 0.3,
+    "max_turns": 5,
+    "eval_limit_cm": 20.0,
+    "bucking_buffer_cm": 1.0,
+    "rx_diameter_cm": 0.0
+}
+HARDWARE_KEYS = ["z_height_cm", "angle_deg", "r_min_cm", "r_max_cm", "wire_diameter_cm",
+                 "max_turns", "eval_limit_cm", "bucking_buffer_cm", "rx_diameter_cm"]
+TARGET_KEYS = ["V_min", "x_hover", "w_wall", "n_shape"]
+
+def expand_grid(spec):
+    """
+    Turns a job spec into a list of dictionaries.
+    A dictionary whose values are scalars or lists becomes the full grid of every combination;
+    a list of dictionaries is used as-is.
+    """
+    if isinstance(spec, list):
+        return [dict(entry) for entry in spec]
+
+    keys = list(spec.keys())
+    values = [v if isinstance(v, list) else [v] for v in spec.values()]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+def load_jobs(job_file):
+    """
+    Reads a batch file of the form
+        {"hardware": {"z_height_cm": [3.0, 5.0], "angle_deg": 20.0, ...},
+         "targets":  {"V_min": [0.6, 0.85], "x_hover": 2.0, "w_wall": [5.0, 7.0], "n_shape": 2.0}}
+    where either section may also be a list of explicit entries (targets may be [V_min, x_hover, w_wall, n] lists).
+    Returns the list of (hardware_params, target_params) pairs to optimize.
+    """
+    with open(job_file, 'r') as f:
+        spec = json.load(f)
+
+    hardware_list = []
+    for hw in expand_grid(spec["hardware"]):
+        missing = {"z_height_cm", "angle_deg"} - hw.keys()
+        if missing:
+            raise ValueError(f"Hardware entry {hw} is missing {sorted(missing)}")
+        hardware_list.append({key: hw.get(key, HARDWARE_DEFAULTS.get(key)) for key in HARDWARE_KEYS})
+
+    targets = spec["targets"]
+    if isinstance(targets, list) and targets and isinstance(targets[0], list):
+        target_list = [tuple(t) for t in targets]
+    else:
+        target_list = [tuple(t[key] for key in TARGET_KEYS) for t in expand_grid(targets)]
+
+    return [(hw, target) for hw in hardware_list for target in target_list]
+
+def matrix_key(hardware_params):
+    """
+    Hardware fields that the cached physics matrix depends on. The angle is applied afterwards,
+    except for finite receivers whose averaged rows are built per angle.
+    """
+    keys = ["z_height_cm", "r_min_cm", "r_max_cm", "wire_diameter_cm", "max_turns"]
+    if hardware_params.get("rx_diameter_cm", 0.0) > 0:
+        keys += ["rx_diameter_cm", "angle_deg"]
+    return tuple(hardware_params[key] for key in keys)
+
+def init_worker():
+    """Idle workers ignore Ctrl+C; run_optimization installs its own graceful handler while a job runs."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def run_job(job_id, hardware_params, target_params, out_dir, resume=False):
+    """
+    Worker: optimizes one (hardware, target) pair, writes its JSON payload and returns a summary row.
+    """
+    start_time = time.time()
+    results = run_optimization(hardware_params, target_params, verbose=False, resume=resume)
+    estimated_L_uH = estimate_inductance(results["radii"], results["best_turns"], hardware_params["wire_diameter_cm"])
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    payload = build_payload(hardware_params, target_params, results, estimated_L_uH, timestamp, results["optimizer"])
+    filename = os.path.join(out_dir, f"well_design_{job_id:03d}.json")
+    with open(filename, 'w') as f:
+        json.dump(payload, f, indent=4)
+
+    return {
+        "job": job_id,
+        **hardware_params,
+        **dict(zip(TARGET_KEYS, target_params)),
+        "final_cost": float(results["final_cost"]),
+        "inductance_uH": round(estimated_L_uH, 2),
+        "active_slots": int((results["best_turns"] != 0).sum()),
+        "total_turns": int(abs(results["best_turns"]).sum()),
+        "runtime_s": round(time.time() - start_time, 1),
+        "file": os.path.basename(filename)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimize a grid of target wells and hardware variants in parallel.")
+    parser.add_argument('jobs', type=str, help='JSON batch file with "hardware" and "targets" sections (see load_jobs).')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='Number of worker processes (default: all cores).')
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help='Output directory (default: output/batch_<timestamp>).')
+    parser.add_argument('--resume', action='store_true', help='Continue each job from its population checkpoint, if any.')
+    args = parser.parse_args()
+
+    jobs = load_jobs(args.jobs)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    out_dir = args.output or os.path.join("output", f"batch_{timestamp}")
+    os.makedirs(out_dir, exist_ok=True)
+
+    print("=" * 50)
+    print(f" BATCH: {len(jobs)} optimizations")
+    print(f" Hardware configs: {len({tuple(hw.values()) for hw, _ in jobs})}")
+    print(f" Saving to: {out_dir}")
+    print("=" * 50)
+
+    # Build each distinct physics matrix once up front so the workers only ever load it from the cache
+    prepared = set()
+    for hw, _ in jobs:
+        if matrix_key(hw) not in prepared:
+            x_array, radii = build_slot_grid(hw)
+            build_or_load_physics_matrix(x_array, radii, hw)
+            prepared.add(matrix_key(hw))
+
+    rows = []
+    failed = {}
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        futures = {pool.submit(run_job, job_id, hw, target, out_dir, args.resume): job_id for job_id, (hw, target) in enumerate(jobs)}
+
+        # Ctrl+C reaches the workers too: running jobs stop after their current generation and still save,
+        # queued jobs are cancelled
+        def handle_sigint(sig, frame):
+            print("\n[!] Ctrl+C detected! Cancelling queued jobs, running ones will save their best design...")
+            for future in futures:
+                future.cancel()
+
+        original_sigint = signal.signal(signal.SIGINT, handle_sigint)
+        try:
+            for future in as_completed(futures):
+                job_id = futures[future]
+                if future.cancelled():
+                    continue
+                try:
+                    row = future.result()
+                except Exception as e:
+                    failed[job_id] = str(e)
+                    print(f"[!] Job {job_id} failed: {e}")
+                    continue
+                rows.append(row)
+                print(f"--> Job {job_id:03d} done in {row['runtime_s']:.0f}s | cost={row['final_cost']:.5f} | "
+                      f"L={row['inductance_uH']:.1f} uH ({len(rows)}/{len(jobs)})")
+        finally:
+            signal.signal(signal.SIGINT, original_sigint)
+
+    rows.sort(key=lambda row: row["job"])
+    if rows:
+        summary_file = os.path.join(out_dir, "summary.csv")
+        with open(summary_file, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+
+        print(f"\n{'Job':<5} {'z (cm)':<8} {'Angle':<7} {'V_min':<7} {'x_hover':<8} {'w_wall':<7} {'n':<5} {'Cost':<10} {'L (uH)':<9}")
+        print("-" * 70)
+        for row in sorted(rows, key=lambda row: row["final_cost"]):
+            print(f"{row['job']:<5} {row['z_height_cm']:<8} {row['angle_deg']:<7} {row['V_min']:<7} {row['x_hover']:<8} "
+                  f"{row['w_wall']:<7} {row['n_shape']:<5} {row['final_cost']:<10.5f} {row['inductance_uH']:<9.1f}")
+        print(f"\nSummary table saved to: {summary_file}")
+
+    for job_id, error in failed.items():
+        print(f"[!] Job {job_id} skipped: {error}")
+
+if __name__ == "__main__":
+    main()
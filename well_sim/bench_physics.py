@@ -0,0 +1,88 @@
+import argparse
+import time
+import numpy as np
+from scipy.special import ellipk, ellipe
+
+from physics import get_B_components, get_B_on_grid, build_stack_fields
+from optimizer import build_slot_grid
+from batch import HARDWARE_DEFAULTS
+
+def ellipke_agm(m, tol):
+    """
+    K(m) and E(m) together from the arithmetic-geometric mean, for 0 <= m < 1.
+    The number of AGM steps is fixed up front from the worst m in the array, so every element does the same work.
+    """
+    # Probe the slowest-converging element to find how many steps reach the tolerance
+    a, b = 1.0, np.sqrt(1.0 - np.max(m))
+    steps = 0
+    while abs(a - b) > tol * a and steps < 20:
+        a, b = (a + b) / 2, np.sqrt(a * b)
+        steps += 1
+
+    a = np.ones_like(m)
+    b = np.sqrt(1.0 - m)
+    total = m / 2
+    weight = 0.5
+    for _ in range(steps):
+        c = (a - b) / 2
+        a, b = (a + b) / 2, np.sqrt(a * b)
+        weight *= 2
+        total += weight * c**2
+
+    K = np.pi / (2 * a)
+    return K, K * (1 - total)
+
+def best_time(func, *args, repeats=5):
+    """Fastest of several runs in seconds, plus the result of the last one."""
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark of the field kernel and elliptic integral options.")
+    parser.add_argument('-n', '--points', type=int, default=1_000_000, help='Number of field points (default: 10^6).')
+    parser.add_argument('-z', '--z_height', type=float, default=3.0, help='Loop height above the points (cm).')
+    parser.add_argument('-r', '--radius', type=float, default=10.0, help='Loop radius (cm).')
+    args = parser.parse_args()
+
+    z, R = args.z_height, args.radius
+    x_array = np.linspace(-4 * R, 4 * R, args.points)
+    m = 4 * R * np.abs(x_array) / ((R + np.abs(x_array))**2 + z**2)
+
+    print("=" * 60)
+    print(f" FIELD KERNEL BENCHMARK: {args.points:,} points, R = {R:g} cm, z = {z:g} cm")
+    print("=" * 60)
+
+    # 1. Elliptic integrals: SciPy reference against the AGM at a few tolerances
+    t_scipy, (K_ref, E_ref) = best_time(lambda m: (ellipk(m), ellipe(m)), m)
+    print(f"\n{'Elliptic K + E':<28} {'Time (ms)':>10} {'Speedup':>8} {'Max rel. error':>15}")
+    print("-" * 64)
+    print(f"{'SciPy ellipk + ellipe':<28} {t_scipy * 1e3:>10.1f} {1.0:>8.2f} {'reference':>15}")
+    for tol in [1e-4, 1e-8, 1e-12]:
+        t_agm, (K, E) = best_time(ellipke_agm, m, tol)
+        error = max(np.max(np.abs(K / K_ref - 1)), np.max(np.abs(E / E_ref - 1)))
+        print(f"{f'AGM, tol = {tol:g}':<28} {t_agm * 1e3:>10.1f} {t_scipy / t_agm:>8.2f} {error:>15.2e}")
+
+    # 2. The kernel itself: every point evaluated against the mirrored half of a symmetric grid
+    t_full, (Bx_ref, Bz_ref) = best_time(get_B_components, x_array, z, R)
+    t_grid, (Bx, Bz) = best_time(get_B_on_grid, x_array, z, R)
+    scale = max(np.max(np.abs(Bx_ref)), np.max(np.abs(Bz_ref)))
+    error = max(np.max(np.abs(Bx - Bx_ref)), np.max(np.abs(Bz - Bz_ref))) / scale
+    print(f"\n{'Field kernel':<28} {'Time (ms)':>10} {'Speedup':>8} {'Max rel. error':>15}")
+    print("-" * 64)
+    print(f"{'get_B_components':<28} {t_full * 1e3:>10.1f} {1.0:>8.2f} {'reference':>15}")
+    print(f"{'get_B_on_grid (mirrored)':<28} {t_grid * 1e3:>10.1f} {t_full / t_grid:>8.2f} {error:>15.2e}")
+
+    # 3. A full physics matrix for the default main.py hardware
+    hardware_params = {"z_height_cm": z, "angle_deg": 0.0, **HARDWARE_DEFAULTS}
+    slot_x, radii = build_slot_grid(hardware_params)
+    t_matrix, _ = best_time(build_stack_fields, slot_x, radii, z, hardware_params['max_turns'],
+                            hardware_params['wire_diameter_cm'], repeats=3)
+    print(f"\nPhysics matrix for the default hardware ({len(radii)} slots x {2 * hardware_params['max_turns'] + 1} "
+          f"turn counts x {len(slot_x)} points): {t_matrix * 1e3:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,12 @@ import argparse
 import json
 import os
 from datetime import datetime
-import numpy as np
 
 # Import our custom modules
 import gui
 from optimizer import run_optimization
 from physics import estimate_inductance
+from payload import build_payload
 
 def main():
     # 1. Setup Argparse
@@ -27,6 +27,33 @@ def main():
     parser.add_argument('--eval_limit', type=float, default=20.0, help='Max distance for shape evaluation (cm).')
     parser.add_argument('--bucking_buffer', type=float, default=1.0, 
                         help='Distance inside x_hover where bucking coils must stop (cm).')
+    parser.add_argument('--rx_diameter', type=float, default=0.0,
+                        help='Diameter of the drone receiver coils (cm). 0 samples the field at the coil centre.')
+    parser.add_argument('--z_offsets', type=float, nargs='+', default=[0.0],
+                        help='Robust design: height offsets (cm) around --z_height the drone bobs through.')
+    parser.add_argument('--rolls', type=float, nargs='+', default=[0.0],
+                        help='Robust design: drone roll angles (degrees) added to both coil angles.')
+    parser.add_argument('--worst_case', action='store_true',
+                        help='Score the worst (z, roll) scenario instead of the mean.')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Refine the evaluation grid near the windings (accurate wells at low z).')
+    
+    # Warm starts
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue from the population checkpoint of a previous run with identical parameters.')
+    parser.add_argument('--init-from', type=str, default=None,
+                        help='Seed the population from an existing well_design_*.json or tuned_coil_*.json.')
+    parser.add_argument('--no-refine', action='store_true',
+                        help='Skip the integer local search that polishes the differential evolution result.')
+    
+    # Alternative backends (at most one)
+    backend = parser.add_mutually_exclusive_group()
+    backend.add_argument('--gradient', action='store_true',
+                         help='Replace differential evolution with L-BFGS-B on a continuous relaxation plus integer repair.')
+    backend.add_argument('--milp', action='store_true',
+                         help='Replace differential evolution with an iteratively re-linearized MILP (SciPy / HiGHS).')
+    backend.add_argument('--local-only', action='store_true',
+                         help='Skip differential evolution and only refine the --init-from / --resume design (quick redesigns).')
     
     # Optional bypass for the GUI
     parser.add_argument('--well_params', nargs=4, type=float, metavar=('V_MIN', 'X_HOVER', 'W_WALL', 'N'),
@@ -42,7 +69,11 @@ def main():
         "wire_diameter_cm": args.wire_diameter,
         "max_turns": args.max_turns,
         "eval_limit_cm": args.eval_limit,
-        "bucking_buffer_cm": args.bucking_buffer
+        "bucking_buffer_cm": args.bucking_buffer,
+        "rx_diameter_cm": args.rx_diameter,
+        "z_offsets_cm": args.z_offsets,
+        "rolls_deg": args.rolls,
+        "worst_case": args.worst_case
     }
     
     # 2. Determine Target Parameters (GUI vs CLI Bypass)
@@ -62,7 +93,10 @@ def main():
         print(f"{k}: {v}")
     print(f"\nTarget Parameters [V_min, x_hover, w_wall, n]: {target_params}")
     
-    results = run_optimization(hardware_params, target_params)
+    results = run_optimization(hardware_params, target_params, resume=args.resume, init_from=args.init_from,
+                               refine=not args.no_refine, local_only=args.local_only,
+                               adaptive_grid=args.adaptive, gradient=args.gradient,
+                               use_milp=args.milp)
 
     print("\nCalculating physical coil inductance (this takes a second)...")
     estimated_L_uH = estimate_inductance(
@@ -79,27 +113,7 @@ def main():
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"output/well_design_{timestamp}.json"
     
-    payload = {
-        "metadata": {
-            "timestamp": timestamp,
-            "final_cost_score": float(results["final_cost"]),
-            "optimizer": "differential_evolution"
-        },
-        "hardware": hardware_params,
-        "target_well": {
-            "V_min": target_params[0],
-            "x_hover": target_params[1],
-            "w_wall": target_params[2],
-            "n_shape": target_params[3]
-        },
-        "electrical_properties": {
-            "estimated_inductance_uH": round(estimated_L_uH, 2)
-        },
-        "optimized_coil": {
-            "radii_cm": np.round(results["radii"], 3).tolist(),
-            "turns": results["best_turns"].tolist()
-        }
-    }
+    payload = build_payload(hardware_params, target_params, results, estimated_L_uH, timestamp, results["optimizer"])
     
     with open(filename, 'w') as f:
         json.dump(payload, f, indent=4)
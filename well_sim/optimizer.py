@@ -1,66 +1,37 @@
 import os
+import json
 import time
 import signal
 import hashlib
+import itertools
 import numpy as np
-from scipy.optimize import differential_evolution
-from physics import calculate_simulated_well, get_B_components
+from scipy.optimize import differential_evolution, minimize, milp, LinearConstraint, Bounds
+from physics import calculate_simulated_well, build_or_load_physics_matrix, build_or_load_scenario_matrices, refine_grid, grid_weights
 from target import generate_target_well
 
-def build_or_load_physics_matrix(x_array, radii, hardware_params):
-    """
-    Checks the disk for a pre-computed magnetic field matrix based on the hardware limits.
-    If it doesn't exist, it calculates it once and saves it for future runs.
-    """
-    # Create a unique hash based on the physical hardware limits
-    hash_str = f"{hardware_params['z_height_cm']}_{hardware_params['r_min_cm']}_{hardware_params['r_max_cm']}_{hardware_params['wire_diameter_cm']}_{hardware_params['max_turns']}_{len(x_array)}_{x_array[0]}_{x_array[-1]}"
-    hash_id = hashlib.md5(hash_str.encode()).hexdigest()[:8]
-    
-    cache_dir = "physics_cache"
-    os.makedirs(cache_dir, exist_ok=True)
-    cache_file = os.path.join(cache_dir, f"matrix_{hash_id}.npz")
-    
-    max_turns = hardware_params['max_turns']
-    num_slots = len(radii)
-    
-    # Check if we already did the math
-    if os.path.exists(cache_file):
-        print(f"Loading pre-computed physics matrix from cache ({hash_id})...")
-        data = np.load(cache_file)
-        return data['Bx'], data['Bz']
-        
-    print("Pre-computing Biot-Savart physics matrix. This will take a few seconds...")
-    
-    # 3D Arrays: [Slot_Index, Turn_Value_Index, X_Spatial_Index]
-    Bx_matrix = np.zeros((num_slots, 2 * max_turns + 1, len(x_array)))
-    Bz_matrix = np.zeros((num_slots, 2 * max_turns + 1, len(x_array)))
-    
-    for slot_idx, R in enumerate(radii):
-        # We map turns from [-max_turns to +max_turns] into array indices [0 to 2*max_turns]
-        for turn_idx, N in enumerate(range(-max_turns, max_turns + 1)):
-            if N == 0:
-                continue
-                
-            direction = np.sign(N)
-            num_turns_abs = int(abs(N))
-            
-            # Stack the wires downward accurately
-            for i in range(num_turns_abs):
-                z_i = hardware_params['z_height_cm'] + (i * hardware_params['wire_diameter_cm'])
-                Bx, Bz = get_B_components(x_array, z_i, R)
-                Bx_matrix[slot_idx, turn_idx, :] += direction * Bx
-                Bz_matrix[slot_idx, turn_idx, :] += direction * Bz
-                
-    # Save to disk
-    np.savez_compressed(cache_file, Bx=Bx_matrix, Bz=Bz_matrix)
-    print("Physics matrix cached successfully!")
-    
-    return Bx_matrix, Bz_matrix
+POPSIZE = 5             # Differential evolution population multiplier (population = POPSIZE * num_slots)
+CHECKPOINT_DIR = "checkpoints"
+CHECKPOINT_EVERY = 25   # Generations between population checkpoints
+JUMP_PENALTY = 0.001    # Cost per turn of difference between neighbouring slots
+MAX_REFINE_MOVES = 10000
+GRADIENT_STARTS = 8     # L-BFGS-B starting points for the continuous relaxation
+SMOOTH_JUMP = 1e-2      # Turns scale below which the relaxed jump penalty is quadratic instead of |diff|
+MILP_ROUNDS = 8         # MILP solves, re-linearized around each improvement or with a grown trust region
+MILP_TIME_LIMIT = 60.0  # Seconds per MILP solve
+MILP_GAP = 1e-3         # Relative optimality gap at which HiGHS stops
+MILP_RADIUS = 1         # Trust region: each MILP may move a slot at most this many turns from the current design
+MILP_MAX_CHANGES = 5    # ... and change at most this many slots (local branching)
+MILP_PEAK_BAND = 0.02   # The frozen peak point must stay within this fraction of the peak value
+# Residuals at which the squared shape error is replaced by its tangent (a convex piecewise-linear lower bound)
+MILP_TANGENTS = np.array([-0.7, -0.4, -0.2, -0.1, -0.05, -0.02, 0.0, 0.02, 0.05, 0.1, 0.2, 0.4, 0.7])
 
-def cost_function(turns_continuous, Bx_matrix_eval, Bz_matrix_eval, max_turns, angle_deg, V_target_eval):
+def cost_function(turns_continuous, Bx_matrix_eval, Bz_matrix_eval, max_turns, angle_deg, V_target_eval, weights_eval=None,
+                  rolls_deg=None, worst_case=False):
     """
     Evaluates the coil winding profile using lightning-fast NumPy matrix lookups
     instead of recalculating the physical Biot-Savart integrals.
+    weights_eval (from grid_weights) makes the shape error an integral over x on a non-uniform grid.
+    With rolls_deg the matrices are scenario stacks (see build_or_load_scenario_matrices), scored as in score_candidates.
     """
     turns_array = np.round(turns_continuous).astype(int)
     num_slots = len(turns_array)
@@ -71,72 +42,613 @@ def cost_function(turns_continuous, Bx_matrix_eval, Bz_matrix_eval, max_turns, a
     # --- The Matrix Magic ---
     # We use advanced indexing to pull the exact pre-calculated magnetic curve 
     # for each slot, then instantly sum them all up vertically.
-    Btot_x = np.sum(Bx_matrix_eval[np.arange(num_slots), indices, :], axis=0)
-    Btot_z = np.sum(Bz_matrix_eval[np.arange(num_slots), indices, :], axis=0)
+    Btot_x = np.sum(Bx_matrix_eval[np.arange(num_slots), indices], axis=0)
+    Btot_z = np.sum(Bz_matrix_eval[np.arange(num_slots), indices], axis=0)
+    
+    return float(score_candidates(Btot_x, Btot_z, turns_array, angle_deg, V_target_eval, weights_eval, rolls_deg, worst_case))
+
+def shape_error(Btot_x, Btot_z, angle_deg, V_target_eval, weights_eval=None, rolls_deg=None, worst_case=False):
+    """
+    The shape part of score_candidates: mean squared error of the normalized well against the target
+    for summed fields of shape (..., x), or 1e6 where a candidate has no flux at all.
+    """
+    roll = 0.0 if rolls_deg is None else np.asarray(rolls_deg)[:, np.newaxis]
+    theta_right = np.radians(angle_deg + roll)
+    theta_left = np.radians(-angle_deg + roll)
+    Flux_right = Btot_x * np.sin(theta_right) + Btot_z * np.cos(theta_right)
+    Flux_left = Btot_x * np.sin(theta_left) + Btot_z * np.cos(theta_left)
+    V_sim_eval = np.maximum(np.abs(Flux_left), np.abs(Flux_right))
+    
+    peak_val = np.max(V_sim_eval, axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mse_shape = np.average((V_sim_eval / peak_val - V_target_eval)**2, axis=-1, weights=weights_eval)
+    mse_shape = np.where(peak_val[..., 0] > 0, mse_shape, 1e6)
+    if rolls_deg is not None:
+        mse_shape = np.max(mse_shape, axis=-1) if worst_case else np.mean(mse_shape, axis=-1)
+    return mse_shape
+
+def score_candidates(Btot_x, Btot_z, turns, angle_deg, V_target_eval, weights_eval=None, rolls_deg=None, worst_case=False):
+    """
+    cost_function for a stack of candidates at once: Btot_x/Btot_z are (..., x) summed fields
+    and turns the matching (..., slots) integer profiles.
+    For robust scoring the fields carry a scenario axis, (..., scenarios, x), and rolls_deg holds each scenario's
+    drone roll (added to both coil angles). The shape errors are then averaged over the scenarios,
+    or the worst one is taken with worst_case=True, before the jump penalty is added.
+    """
+    mse_shape = shape_error(Btot_x, Btot_z, angle_deg, V_target_eval, weights_eval, rolls_deg, worst_case)
+    penalty = JUMP_PENALTY * np.sum(np.abs(np.diff(turns, axis=-1)), axis=-1)
+    
+    return np.where(mse_shape < 1e6, mse_shape + penalty, 1e6)
+
+def refine_turns(turns, bounds, Bx_matrix_eval, Bz_matrix_eval, max_turns, angle_deg, V_target_eval,
+                 weights_eval=None, rolls_deg=None, worst_case=False, max_moves=MAX_REFINE_MOVES, verbose=True):
+    """
+    Exact integer local search, used to polish the rounded DE result (or a seed design on its own).
+    Two kinds of move are scored every step: setting any one slot to any turn count within its bounds,
+    and shifting one turn between neighbouring slots. The total field is a sum of one matrix row per slot,
+    so a move only adds the difference of the affected rows to the running total: O(x) per move instead
+    of re-summing every slot. The best improving move is applied until none is left (a local optimum).
+    Scenario stacks (rolls_deg, worst_case) are scored robustly, as in score_candidates.
+    Returns the refined integer turns and their cost (same scale as cost_function).
+    """
+    turns = np.array(turns, dtype=int)
+    num_slots = len(turns)
+    slots = np.arange(num_slots)
+    lower = np.array([b[0] for b in bounds])
+    upper = np.array([b[1] for b in bounds])
+    turns = np.clip(turns, lower, upper)
+    
+    # Every possible turn count of every slot, as matrix indices
+    values = np.arange(-max_turns, max_turns + 1)
+    allowed = (values >= lower[:, np.newaxis]) & (values <= upper[:, np.newaxis])
+    pairs = slots[:-1]
+    
+    Btot_x = np.sum(Bx_matrix_eval[slots, turns + max_turns, :], axis=0)
+    Btot_z = np.sum(Bz_matrix_eval[slots, turns + max_turns, :], axis=0)
+    scoring = (angle_deg, V_target_eval, weights_eval, rolls_deg, worst_case)
+    cost = score_candidates(Btot_x, Btot_z, turns, *scoring)
+    start_cost = cost
+    
+    moves = 0
+    while moves < max_moves:
+        current_x = Bx_matrix_eval[slots, turns + max_turns, :]
+        current_z = Bz_matrix_eval[slots, turns + max_turns, :]
+        
+        # Single-slot moves: (slots, values, x) field totals and (slots, values, slots) profiles
+        single_x = Btot_x + Bx_matrix_eval - current_x[:, np.newaxis, :]
+        single_z = Btot_z + Bz_matrix_eval - current_z[:, np.newaxis, :]
+        single_turns = np.repeat(np.broadcast_to(turns, (num_slots, num_slots))[:, np.newaxis, :], len(values), axis=1)
+        single_turns[slots, :, slots] = values
+        single_cost = score_candidates(single_x, single_z, single_turns, *scoring)
+        single_cost[~allowed | (values == turns[:, np.newaxis])] = np.inf
+        
+        # Neighbour shifts: one turn moves from slot i+1 to i (step=+1) or from i to i+1 (step=-1)
+        shift_costs = []
+        for step in (1, -1):
+            new_left = turns[pairs] + step
+            new_right = turns[pairs + 1] - step
+            valid = ((new_left >= lower[pairs]) & (new_left <= upper[pairs]) &
+                     (new_right >= lower[pairs + 1]) & (new_right <= upper[pairs + 1]))
+            left_idx = np.clip(new_left, -max_turns, max_turns) + max_turns
+            right_idx = np.clip(new_right, -max_turns, max_turns) + max_turns
+            shift_x = (Btot_x + Bx_matrix_eval[pairs, left_idx, :] - current_x[pairs]
+                       + Bx_matrix_eval[pairs + 1, right_idx, :] - current_x[pairs + 1])
+            shift_z = (Btot_z + Bz_matrix_eval[pairs, left_idx, :] - current_z[pairs]
+                       + Bz_matrix_eval[pairs + 1, right_idx, :] - current_z[pairs + 1])
+            shift_turns = np.repeat(turns[np.newaxis, :], len(pairs), axis=0)
+            shift_turns[pairs, pairs] = new_left
+            shift_turns[pairs, pairs + 1] = new_right
+            shift_cost = score_candidates(shift_x, shift_z, shift_turns, *scoring)
+            shift_cost[~valid] = np.inf
+            shift_costs.append(shift_cost)
+        shift_costs = np.array(shift_costs)
+        
+        best_single = np.unravel_index(np.argmin(single_cost), single_cost.shape)
+        best_shift = np.unravel_index(np.argmin(shift_costs), shift_costs.shape)
+        if min(single_cost[best_single], shift_costs[best_shift]) >= cost - 1e-12:
+            break
+        
+        if single_cost[best_single] <= shift_costs[best_shift]:
+            slot, value_idx = best_single
+            changes = {slot: values[value_idx]}
+        else:
+            step, slot = (1, -1)[best_shift[0]], best_shift[1]
+            changes = {slot: turns[slot] + step, slot + 1: turns[slot + 1] - step}
+        
+        for slot, new_turns in changes.items():
+            Btot_x += Bx_matrix_eval[slot, new_turns + max_turns] - Bx_matrix_eval[slot, turns[slot] + max_turns]
+            Btot_z += Bz_matrix_eval[slot, new_turns + max_turns] - Bz_matrix_eval[slot, turns[slot] + max_turns]
+            turns[slot] = new_turns
+        cost = min(single_cost[best_single], shift_costs[best_shift])
+        moves += 1
+    
+    # Rescore from scratch so round-off in the running totals never leaks into the reported cost
+    cost = cost_function(turns, Bx_matrix_eval, Bz_matrix_eval, max_turns, *scoring)
+    if verbose:
+        print(f"Integer refinement: {moves} moves, cost {start_cost:.6f} -> {cost:.6f}")
+    
+    return turns, cost
+
+def relaxed_cost(turns_continuous, Bx_matrix_eval, Bz_matrix_eval, max_turns, angle_deg, V_target_eval, weights_eval=None):
+    """
+    cost_function for real-valued turns, with its analytic gradient. A fractional turn count interpolates
+    linearly between the neighbouring matrix rows (integer turns give exactly the stacked fields), so the
+    summed field is linear in each slot's turns and the gradient over all slots is one matrix product of the
+    per-slot layer rows with dcost/dB. The jump penalty uses a smoothed |diff|. Returns (cost, gradient).
+    """
+    num_slots = len(turns_continuous)
+    slots = np.arange(num_slots)
+    
+    # Row below each turn count and the layer row (the step to the next count) that the fraction scales
+    lower_idx = np.clip(np.floor(turns_continuous), -max_turns, max_turns - 1).astype(int) + max_turns
+    frac = turns_continuous + max_turns - lower_idx
+    layer_x = Bx_matrix_eval[slots, lower_idx + 1] - Bx_matrix_eval[slots, lower_idx]
+    layer_z = Bz_matrix_eval[slots, lower_idx + 1] - Bz_matrix_eval[slots, lower_idx]
+    Btot_x = np.sum(Bx_matrix_eval[slots, lower_idx], axis=0) + frac @ layer_x
+    Btot_z = np.sum(Bz_matrix_eval[slots, lower_idx], axis=0) + frac @ layer_z
     
-    # Recreate the flux magnitude profile
     theta = np.radians(angle_deg)
     Flux_right = Btot_x * np.sin(theta) + Btot_z * np.cos(theta)
     Flux_left = Btot_x * np.sin(-theta) + Btot_z * np.cos(-theta)
+    use_right = np.abs(Flux_right) >= np.abs(Flux_left)
+    flux = np.where(use_right, Flux_right, Flux_left)
+    V_sim_eval = np.abs(flux)
     
-    V_sim_eval = np.maximum(np.abs(Flux_left), np.abs(Flux_right))
+    peak_idx = np.argmax(V_sim_eval)
+    peak_val = V_sim_eval[peak_idx]
+    if peak_val <= 0:
+        return 1e6, np.zeros(num_slots)
     
-    peak_val = np.max(V_sim_eval)
-    if peak_val > 0:
-        V_sim_eval = V_sim_eval / peak_val
-    else:
-        return 1e6 
-        
-    mse_shape = np.mean((V_sim_eval - V_target_eval)**2)
-    turn_jumps = np.abs(np.diff(turns_array))
-    penalty = 0.001 * np.sum(turn_jumps)
-        
-    return mse_shape + penalty
+    weights = np.full(len(V_sim_eval), 1.0 / len(V_sim_eval)) if weights_eval is None else weights_eval / np.sum(weights_eval)
+    residual = V_sim_eval / peak_val - V_target_eval
+    mse_shape = np.sum(weights * residual**2)
+    
+    # dcost/dV: the direct term, plus the peak's share through the normalization
+    grad_V = 2 * weights * residual / peak_val
+    grad_V[peak_idx] -= np.sum(grad_V * V_sim_eval) / peak_val
+    grad_flux = grad_V * np.sign(flux)
+    grad_Bx = grad_flux * np.where(use_right, np.sin(theta), np.sin(-theta))
+    grad_Bz = grad_flux * np.cos(theta)
+    grad = layer_x @ grad_Bx + layer_z @ grad_Bz
+    
+    jumps = np.diff(turns_continuous)
+    smooth_abs = np.sqrt(jumps**2 + SMOOTH_JUMP**2)
+    penalty = JUMP_PENALTY * np.sum(smooth_abs - SMOOTH_JUMP)
+    grad_jumps = JUMP_PENALTY * jumps / smooth_abs
+    grad[:-1] -= grad_jumps
+    grad[1:] += grad_jumps
+    
+    return mse_shape + penalty, grad
 
-def run_optimization(hardware_params, target_params):
+def relax_turns(seed_turns, bounds, Bx_matrix_eval, Bz_matrix_eval, max_turns, angle_deg, V_target_eval,
+                weights_eval=None, starts=GRADIENT_STARTS, rng=None, verbose=True):
     """
-    Sets up the search space and executes the Differential Evolution algorithm.
+    Gradient-based alternative to differential evolution. L-BFGS-B minimizes relaxed_cost over real-valued
+    turns within the slot bounds from several starts (the seed design, the middle of the bounds and random
+    points), then each solution is rounded and repaired with refine_turns. Returns the best integer turns,
+    their cost and the total number of cost evaluations.
+    """
+    rng = rng if rng is not None else np.random.default_rng(42)
+    lower = np.array([b[0] for b in bounds], dtype=float)
+    upper = np.array([b[1] for b in bounds], dtype=float)
+    args = (Bx_matrix_eval, Bz_matrix_eval, max_turns, angle_deg, V_target_eval, weights_eval)
+    
+    start_points = [(lower + upper) / 2] + [rng.uniform(lower, upper) for _ in range(starts - 1)]
+    if np.any(seed_turns):
+        start_points[-1] = np.clip(seed_turns, lower, upper).astype(float)
+    
+    best_turns, best_cost = None, np.inf
+    evaluations = 0
+    for start in start_points:
+        result = minimize(relaxed_cost, start, args=args, jac=True, method='L-BFGS-B', bounds=bounds)
+        turns, cost = refine_turns(np.round(result.x).astype(int), bounds, *args, verbose=False)
+        evaluations += result.nfev
+        if verbose:
+            print(f"L-BFGS-B start: relaxed cost {result.fun:.6f} in {result.nfev} evaluations, integer cost {cost:.6f}")
+        if cost < best_cost:
+            best_turns, best_cost = turns, cost
+    
+    return best_turns, best_cost, evaluations
+
+def linearized_milp(turns, bounds, Bx_matrix_eval, Bz_matrix_eval, max_turns, angle_deg, V_target_eval, weights_eval=None,
+                    radius=MILP_RADIUS, max_changes=MILP_MAX_CHANGES):
+    """
+    One MILP around an integer design. The fields are linear in binary one-hot choices y[slot, turns],
+    so only the abs(), the max over the two coils and the peak normalization are nonlinear. They are frozen
+    at the current design: each point keeps its dominant coil and flux sign, and the peak value and position.
+    Constraints keep the solution consistent with that choice (sign held, dominant coil stays dominant, nothing
+    above the peak, the peak point within MILP_PEAK_BAND of it), so within them the normalized well is linear
+    in y up to that band. The squared error is bounded
+    from below by tangent cuts, and the jump penalty is modelled exactly with one auxiliary variable per pair.
+    At most max_changes slots may move, each by at most `radius` turns: the frozen choices are only trustworthy
+    near the current design, and the small neighbourhood keeps HiGHS fast.
+    Returns the new integer turns and the scipy milp result (its mip_gap bounds the subproblem's optimality).
+    """
+    num_slots, num_values, num_points = Bx_matrix_eval.shape
+    slots = np.arange(num_slots)
+    values = np.arange(-max_turns, max_turns + 1)
+    lower = np.array([b[0] for b in bounds])
+    upper = np.array([b[1] for b in bounds])
+    allowed = ((values >= lower[:, np.newaxis]) & (values <= upper[:, np.newaxis]) &
+               (np.abs(values - turns[:, np.newaxis]) <= radius)).ravel()
+    
+    theta = np.radians(angle_deg)
+    Flux_right = (Bx_matrix_eval * np.sin(theta) + Bz_matrix_eval * np.cos(theta)).reshape(-1, num_points)
+    Flux_left = (Bx_matrix_eval * np.sin(-theta) + Bz_matrix_eval * np.cos(-theta)).reshape(-1, num_points)
+    
+    # Freeze the nonlinear parts at the current design
+    current = np.zeros((num_slots, num_values))
+    current[slots, turns + max_turns] = 1
+    current_right = current.ravel() @ Flux_right
+    current_left = current.ravel() @ Flux_left
+    use_right = np.abs(current_right) >= np.abs(current_left)
+    sign = np.where(use_right, np.sign(current_right), np.sign(current_left))
+    sign[sign == 0] = 1
+    V_current = np.maximum(np.abs(current_right), np.abs(current_left))
+    peak_idx = np.argmax(V_current)
+    peak_val = V_current[peak_idx]
+    
+    # Normalized flux of the dominant (u) and the other (u_other) coil, per one-hot variable
+    u = (np.where(use_right, Flux_right, Flux_left) * sign / peak_val).T
+    u_other = np.where(use_right, Flux_left, Flux_right).T / peak_val
+    
+    # Variables: y (slots * values), then per point the normalized well u and the other coil w, the shape
+    # error e, and the jump d per neighbour pair. Only the rows defining u and w are dense in y.
+    num_y = num_slots * num_values
+    points = np.arange(num_points)
+    u_cols = num_y + points
+    w_cols = num_y + num_points + points
+    e_cols = num_y + 2 * num_points + points
+    d_cols = num_y + 3 * num_points + np.arange(num_slots - 1)
+    num_vars = num_y + 3 * num_points + num_slots - 1
+    
+    weights = np.full(num_points, 1.0 / num_points) if weights_eval is None else weights_eval / np.sum(weights_eval)
+    objective = np.zeros(num_vars)
+    objective[e_cols] = weights
+    objective[d_cols] = JUMP_PENALTY
+    
+    constraints = []
+    
+    # Exactly one turn count per slot, and at least num_slots - max_changes of them unchanged
+    one_hot = np.zeros((num_slots, num_vars))
+    one_hot[np.repeat(slots, num_values), np.arange(num_y)] = 1
+    constraints.append(LinearConstraint(one_hot, 1, 1))
+    unchanged = np.zeros((1, num_vars))
+    unchanged[0, :num_y] = current.ravel()
+    constraints.append(LinearConstraint(unchanged, num_slots - max_changes, num_slots))
+    
+    # u and w as linear functions of y
+    for cols, coefficients in ((u_cols, u), (w_cols, u_other)):
+        rows = np.zeros((num_points, num_vars))
+        rows[:, :num_y] = -coefficients
+        rows[points, cols] = 1
+        constraints.append(LinearConstraint(rows, 0, 0))
+    
+    # The other coil stays within +-u, so u really is the larger of the two
+    for direction in (1, -1):
+        rows = np.zeros((num_points, num_vars))
+        rows[points, u_cols] = 1
+        rows[points, w_cols] = direction
+        constraints.append(LinearConstraint(rows, 0, np.inf))
+    
+    # e >= r0^2 + 2 r0 (u - target - r0) for every tangent residual r0
+    for r0 in MILP_TANGENTS:
+        rows = np.zeros((num_points, num_vars))
+        rows[points, u_cols] = -2 * r0
+        rows[points, e_cols] = 1
+        constraints.append(LinearConstraint(rows, -r0**2 - 2 * r0 * V_target_eval, np.inf))
+    
+    # d >= |t_s - t_s+1|, with t_s the turn count selected by slot s's one-hot variables
+    turn_rows = np.zeros((num_slots, num_y))
+    turn_rows[np.repeat(slots, num_values), np.arange(num_y)] = np.tile(values, num_slots)
+    for direction in (1, -1):
+        rows = np.zeros((num_slots - 1, num_vars))
+        rows[:, :num_y] = direction * (turn_rows[:-1] - turn_rows[1:])
+        rows[np.arange(num_slots - 1), d_cols] = 1
+        constraints.append(LinearConstraint(rows, 0, np.inf))
+    
+    # 0 <= u <= 1 everywhere (nothing above the frozen peak) and u ~ 1 at the peak itself: an exact pin
+    # would leave only the current design feasible
+    lower_bounds = np.zeros(num_vars)
+    upper_bounds = np.full(num_vars, np.inf)
+    upper_bounds[:num_y] = allowed
+    upper_bounds[u_cols] = 1
+    lower_bounds[u_cols[peak_idx]] = 1 - MILP_PEAK_BAND
+    lower_bounds[w_cols] = -np.inf
+    integrality = np.zeros(num_vars)
+    integrality[:num_y] = 1
+    
+    result = milp(objective, constraints=constraints, integrality=integrality, bounds=Bounds(lower_bounds, upper_bounds),
+                  options={"time_limit": MILP_TIME_LIMIT, "mip_rel_gap": MILP_GAP})
+    if result.x is None:
+        return turns, result
+    
+    choice = np.round(result.x[:num_y]).reshape(num_slots, num_values)
+    return values[np.argmax(choice, axis=1)], result
+
+def milp_turns(seed_turns, bounds, Bx_matrix_eval, Bz_matrix_eval, max_turns, angle_deg, V_target_eval,
+               weights_eval=None, rounds=MILP_ROUNDS, verbose=True):
+    """
+    Mixed-integer backend: solves linearized_milp around the current design and re-linearizes around the answer.
+    When a round brings no improvement, its trust region grows (twice the radius and twice the slots that
+    may change) until it spans the whole box; at most `rounds` solves. The current design always satisfies its
+    own linearization, so every round is feasible. An empty seed is replaced by the relax_turns design, since
+    the all-zero coil has no flux signs to freeze.
+    A last solve over the whole box, linearized at the final design, gives a lower bound on the cost of every
+    design sharing its frozen flux signs, dominant coils and peak (up to MILP_PEAK_BAND). Designs outside that
+    structure, including the refine_turns polish that follows, are not covered, so the result is never certified.
+    Returns the integer turns, their cost and a dict with the bound, the incumbent it bounds and the last local gap.
+    """
+    args = (Bx_matrix_eval, Bz_matrix_eval, max_turns, angle_deg, V_target_eval, weights_eval)
+    num_slots = len(bounds)
+    lower = np.array([b[0] for b in bounds])
+    upper = np.array([b[1] for b in bounds])
+    turns = np.clip(seed_turns, lower, upper).astype(int)
+    if not np.any(turns):
+        turns, _, _ = relax_turns(turns, bounds, *args, verbose=False)
+    cost = cost_function(turns, *args)
+    
+    radius, max_changes = MILP_RADIUS, MILP_MAX_CHANGES
+    full_radius = 2 * max_turns
+    local_gap = np.nan
+    full_result = None
+    for milp_round in range(rounds):
+        new_turns, result = linearized_milp(turns, bounds, *args, radius=radius, max_changes=max_changes)
+        new_cost = cost_function(new_turns, *args)
+        local_gap = result.mip_gap if getattr(result, "mip_gap", None) is not None else np.nan
+        if verbose:
+            print(f"MILP round {milp_round + 1} (radius {radius}, {max_changes} changes): {result.message.strip()} | "
+                  f"local-subproblem gap {local_gap:.2e} | cost {cost:.6f} -> {new_cost:.6f}")
+        if new_cost < cost - 1e-12:
+            turns, cost = new_turns, new_cost
+        elif radius >= full_radius and max_changes >= num_slots:
+            full_result = result
+            break
+        else:
+            radius, max_changes = min(2 * radius, full_radius), min(2 * max_changes, num_slots)
+    
+    # Bound over the whole box for the linearization at the final design (a stalled whole-box round already is one)
+    if full_result is None:
+        new_turns, full_result = linearized_milp(turns, bounds, *args, radius=full_radius, max_changes=num_slots)
+        new_cost = cost_function(new_turns, *args)
+        if new_cost < cost - 1e-12:
+            turns, cost = new_turns, new_cost
+    bound = full_result.mip_dual_bound if getattr(full_result, "mip_dual_bound", None) is not None else np.nan
+    if verbose:
+        print(f"Linearized bound over the whole box: {full_result.message.strip()} | bound {bound:.6f} | "
+              f"incumbent {cost:.6f} (valid only for the frozen signs, coils and peak; not certified)")
+    
+    milp_cost = cost
+    turns, cost = refine_turns(turns, bounds, *args, verbose=verbose)
+    certificate = {
+        "certified": False,
+        "linearized_lower_bound": float(bound),
+        "milp_incumbent_cost": float(milp_cost),
+        "last_local_gap": float(local_gap),
+        "bound_scope": "tangent-cut linearization at the MILP incumbent (frozen flux signs, dominant coils and "
+                       "peak); refine_turns may leave that structure, and designs outside it are not bounded"
+    }
+    return turns, cost, certificate
+
+def build_slot_grid(hardware_params, adaptive=False):
+    """
+    Returns the spatial evaluation grid and the radial winding slots for a hardware config.
+    These fully determine the cached physics matrix, so every caller must build them the same way.
+    adaptive=True refines the 400-point grid where the windings' fields are sharp (see refine_grid).
     """
-    z_height = hardware_params['z_height_cm']
-    angle_deg = hardware_params['angle_deg']
     R_min = hardware_params['r_min_cm']
     R_max = hardware_params['r_max_cm']
     wire_dia = hardware_params['wire_diameter_cm']
-    max_turns = hardware_params['max_turns']
-    eval_limit = hardware_params['eval_limit_cm']
-    bucking_buffer = hardware_params['bucking_buffer_cm']
-    
-    V_min, x_hover, w_wall, n_shape = target_params
-    eval_window = [-eval_limit, eval_limit]
     
     x_bound = R_max + 10.0
     x_array = np.linspace(-x_bound, x_bound, 400)
     
     num_slots = int(np.floor((R_max - R_min) / wire_dia))
     radii = np.linspace(R_min, R_min + (num_slots - 1) * wire_dia, num_slots)
-    V_target = generate_target_well(x_array, V_min, x_hover, w_wall, n_shape)
     
-    # 1. Initialize the Caching System
-    Bx_matrix, Bz_matrix = build_or_load_physics_matrix(x_array, radii, hardware_params)
+    if adaptive:
+        x_array = refine_grid(x_array, radii, hardware_params['z_height_cm'], wire_dia)
     
-    # 2. Slice the matrices strictly to the evaluation window to save even more time
-    eval_mask = (x_array >= eval_window[0]) & (x_array <= eval_window[1])
-    Bx_matrix_eval = Bx_matrix[:, :, eval_mask]
-    Bz_matrix_eval = Bz_matrix[:, :, eval_mask]
-    V_target_eval = V_target[eval_mask]
-    
-    transition_radius = max(R_min, x_hover - bucking_buffer)
+    return x_array, radii
+
+def slot_bounds(radii, hardware_params, x_hover):
+    """
+    Allowed turn range of every slot: bucking (negative) turns inside x_hover minus the bucking buffer,
+    main (positive) turns outside it.
+    """
+    max_turns = hardware_params['max_turns']
+    transition_radius = max(hardware_params['r_min_cm'], x_hover - hardware_params['bucking_buffer_cm'])
     bounds = []
     for R in radii:
         if R <= transition_radius:
             bounds.append((-max_turns, 0))
         else:
             bounds.append((0, max_turns))
-            
+    return bounds
+
+def get_checkpoint_file(hardware_params, target_params):
+    """
+    Checkpoint path for one (hardware, target) problem, hashed the same way as the physics cache
+    so a rerun with identical parameters finds the population it left behind.
+    """
+    hash_str = json.dumps([hardware_params, [float(p) for p in target_params]], sort_keys=True)
+    hash_id = hashlib.md5(hash_str.encode()).hexdigest()[:8]
+    return os.path.join(CHECKPOINT_DIR, f"de_{hash_id}.npz")
+
+def save_checkpoint(checkpoint_file, population, energies, generation):
+    """
+    Stores the full DE population (in turn units) and its cost values.
+    Written to a temporary file first so a Ctrl+C mid-write never corrupts the last good checkpoint.
+    """
+    os.makedirs(os.path.dirname(checkpoint_file), exist_ok=True)
+    tmp_file = checkpoint_file + ".tmp.npz"
+    np.savez(tmp_file, population=population, energies=energies, generation=generation)
+    os.replace(tmp_file, checkpoint_file)
+
+def load_seed_turns(json_file, radii):
+    """
+    Reads the winding profile of a well_design_*.json or tuned_coil_*.json and maps it onto the given slots.
+    Each slot takes the turns of the nearest saved radius within half a slot pitch, otherwise 0.
+    """
+    with open(json_file, 'r') as f:
+        data = json.load(f)
+
+    saved_radii = np.array(data["optimized_coil"]["radii_cm"])
+    saved_turns = np.array(data["optimized_coil"]["turns"])
+
+    pitch = radii[1] - radii[0] if len(radii) > 1 else 1.0
+    nearest = np.abs(radii[:, np.newaxis] - saved_radii[np.newaxis, :]).argmin(axis=1)
+    matched = np.abs(saved_radii[nearest] - radii) <= pitch / 2
+
+    return np.where(matched, saved_turns[nearest], 0)
+
+def seed_population(seed_turns, bounds, pop_size, rng, mutation_rate=0.1):
+    """
+    Initial DE population around a known design: the design itself, then copies with roughly
+    mutation_rate of their slots nudged by +-1 turn, and a random quarter for diversity.
+    Everything is clipped to the slot bounds, so a seed from different hardware still lands in the search space.
+    """
+    lower = np.array([b[0] for b in bounds])
+    upper = np.array([b[1] for b in bounds])
+    seed_turns = np.clip(seed_turns, lower, upper)
+
+    num_random = pop_size // 4
+    num_mutants = pop_size - num_random - 1
+
+    steps = rng.integers(-1, 2, size=(num_mutants, len(bounds))) * (rng.random((num_mutants, len(bounds))) < mutation_rate)
+    mutants = np.clip(seed_turns + steps, lower, upper)
+    randoms = rng.integers(lower, upper + 1, size=(num_random, len(bounds)))
+
+    return np.vstack([seed_turns, mutants, randoms]).astype(float)
+
+def run_optimization(hardware_params, target_params, verbose=True, resume=False, init_from=None,
+                     refine=True, local_only=False, adaptive_grid=False, gradient=False, use_milp=False):
+    """
+    Sets up the search space and executes the Differential Evolution algorithm.
+    verbose=False silences the per-generation output (used when many runs share a terminal).
+    The population is checkpointed every CHECKPOINT_EVERY generations and when the run ends or is halted.
+    resume=True continues from the checkpoint of an identical problem; init_from seeds the population
+    from an existing well_design_*.json / tuned_coil_*.json instead of a random start.
+    refine=True polishes the rounded DE result with refine_turns. local_only=True skips DE entirely and
+    only refines the seed design (or the checkpoint's best member), for quick redesigns.
+    adaptive_grid=True evaluates on a grid refined near the windings, for accurate wells at low z.
+    gradient=True replaces DE with relax_turns (L-BFGS-B on the continuous relaxation, then integer repair).
+    use_milp=True replaces DE with milp_turns (iteratively re-linearized MILP solved by HiGHS).
+    At most one of local_only, gradient and use_milp may be set.
+    Robust designs: the optional hardware keys z_offsets_cm and rolls_deg span a grid of (z_height + dz, roll)
+    flight scenarios that are all scored at once (mean shape error, or the worst with worst_case=True).
+    DE and refine_turns support them; the gradient and MILP backends are single-scenario.
+    """
+    z_height = hardware_params['z_height_cm']
+    angle_deg = hardware_params['angle_deg']
+    wire_dia = hardware_params['wire_diameter_cm']
+    max_turns = hardware_params['max_turns']
+    eval_limit = hardware_params['eval_limit_cm']
+    z_offsets = hardware_params.get('z_offsets_cm', [0.0])
+    rolls = hardware_params.get('rolls_deg', [0.0])
+    worst_case = hardware_params.get('worst_case', False)
+    robust = len(z_offsets) * len(rolls) > 1 or any(z_offsets) or any(rolls)
+    
+    if sum([local_only, gradient, use_milp]) > 1:
+        raise ValueError("local_only, gradient and use_milp select different backends; pass at most one.")
+    if robust and (gradient or use_milp):
+        raise ValueError("The gradient and MILP backends score a single (z, angle); drop them or the robust scenarios.")
+    if robust and any(rolls) and hardware_params.get('rx_diameter_cm', 0.0) > 0:
+        raise ValueError("Finite receiver matrices are built for the nominal angle and cannot be rolled.")
+    
+    V_min, x_hover, w_wall, n_shape = target_params
+    eval_window = [-eval_limit, eval_limit]
+    
+    x_array, radii = build_slot_grid(hardware_params, adaptive=adaptive_grid)
+    num_slots = len(radii)
+    V_target = generate_target_well(x_array, V_min, x_hover, w_wall, n_shape)
+    
+    # 1. Initialize the Caching System (one stacked matrix over every scenario for robust designs)
+    rolls_deg = None
+    if robust:
+        scenarios = list(itertools.product(z_offsets, rolls))
+        Bx_matrix, Bz_matrix = build_or_load_scenario_matrices(x_array, radii, hardware_params,
+                                                               [z_height + dz for dz, _ in scenarios])
+        rolls_deg = np.array([roll for _, roll in scenarios], dtype=float)
+        if verbose:
+            print(f"Robust objective over {len(scenarios)} (z, roll) scenarios ({'worst case' if worst_case else 'mean'})")
+    else:
+        Bx_matrix, Bz_matrix = build_or_load_physics_matrix(x_array, radii, hardware_params)
+    
+    # 2. Slice the matrices strictly to the evaluation window to save even more time
+    eval_mask = (x_array >= eval_window[0]) & (x_array <= eval_window[1])
+    Bx_matrix_eval = Bx_matrix[..., eval_mask]
+    Bz_matrix_eval = Bz_matrix[..., eval_mask]
+    V_target_eval = V_target[eval_mask]
+    weights_eval = grid_weights(x_array[eval_mask]) if adaptive_grid else None
+    if adaptive_grid and verbose:
+        print(f"Adaptive grid: {len(x_array)} points ({eval_mask.sum()} in the evaluation window)")
+    
+    bounds = slot_bounds(radii, hardware_params, x_hover)
     integrality = np.ones(num_slots, dtype=bool) 
     
-    print(f"\nStarting evolutionary optimization across {num_slots} physical slots...")
-    print("Running on a single core with Disk Caching. Press Ctrl+C AT ANY TIME to halt and save progress!\n")
+    # Starting population: checkpoint > seed design > scipy's default latin hypercube
+    checkpoint_file = get_checkpoint_file(hardware_params, target_params)
+    init = 'latinhypercube'
+    start_generation = 0
+    if resume and os.path.exists(checkpoint_file):
+        checkpoint = np.load(checkpoint_file)
+        if checkpoint['population'].shape[1] == num_slots:
+            init = checkpoint['population']
+            start_generation = int(checkpoint['generation'])
+            print(f"Resuming from {checkpoint_file} (generation {start_generation}, best cost {checkpoint['energies'].min():.6f})")
+        else:
+            print(f"[!] Checkpoint {checkpoint_file} has a different slot count. Starting fresh.")
+    elif resume:
+        print(f"[!] No checkpoint found at {checkpoint_file}. Starting fresh.")
+    
+    seed_turns = np.zeros(num_slots, dtype=int)
+    if start_generation > 0:
+        seed_turns = np.round(init[np.argmin(checkpoint['energies'])]).astype(int)
+    elif init_from is not None:
+        seed_turns = load_seed_turns(init_from, radii)
+        init = seed_population(seed_turns, bounds, POPSIZE * num_slots, np.random.default_rng(42))
+        print(f"Seeding population from {init_from} ({np.count_nonzero(seed_turns)} active slots mapped)")
+    
+    refine_args = (bounds, Bx_matrix_eval, Bz_matrix_eval, max_turns, angle_deg, V_target_eval, weights_eval)
+    if local_only:
+        if verbose:
+            print(f"\nSkipping differential evolution. Refining the starting design across {num_slots} physical slots...")
+        start_time = time.time()
+        best_turns, final_cost = refine_turns(seed_turns, *refine_args, rolls_deg=rolls_deg, worst_case=worst_case,
+                                              verbose=verbose)
+        if verbose:
+            print(f"Refinement finished in {time.time() - start_time:.1f} seconds.")
+        return finish_results(x_array, radii, best_turns, V_target, eval_mask, eval_window,
+                              hardware_params, final_cost, "local_search")
+    
+    if gradient:
+        if verbose:
+            print(f"\nStarting gradient-based optimization across {num_slots} physical slots...")
+        start_time = time.time()
+        best_turns, final_cost, evaluations = relax_turns(seed_turns, *refine_args, verbose=verbose)
+        if verbose:
+            print(f"Optimization finished in {time.time() - start_time:.1f} seconds "
+                  f"({evaluations} gradient evaluations, best cost {final_cost:.6f}).")
+        return finish_results(x_array, radii, best_turns, V_target, eval_mask, eval_window,
+                              hardware_params, final_cost, "lbfgsb+local_search")
+    
+    if use_milp:
+        if verbose:
+            print(f"\nStarting mixed-integer optimization across {num_slots} physical slots...")
+        start_time = time.time()
+        best_turns, final_cost, certificate = milp_turns(seed_turns, *refine_args, verbose=verbose)
+        if verbose:
+            print(f"Optimization finished in {time.time() - start_time:.1f} seconds "
+                  f"(cost {final_cost:.6f}, linearized bound {certificate['linearized_lower_bound']:.6f}, not certified).")
+        results = finish_results(x_array, radii, best_turns, V_target, eval_mask, eval_window,
+                                 hardware_params, final_cost, "milp+local_search")
+        results["milp_certificate"] = certificate
+        return results
+    
+    if verbose:
+        print(f"\nStarting evolutionary optimization across {num_slots} physical slots...")
+        print("Running on a single core with Disk Caching. Press Ctrl+C AT ANY TIME to halt and save progress!\n")
     
     stop_flag = [False]
 
@@ -154,7 +666,13 @@ def run_optimization(hardware_params, target_params):
     
     start_time = time.time()
     
-    def early_stopping_callback(xk, convergence):
+    generation = [start_generation]
+    
+    def early_stopping_callback(intermediate_result):
+        generation[0] += 1
+        if generation[0] % CHECKPOINT_EVERY == 0:
+            save_checkpoint(checkpoint_file, intermediate_result.population,
+                            intermediate_result.population_energies, generation[0])
         if stop_flag[0]:
             return True 
             
@@ -162,28 +680,46 @@ def run_optimization(hardware_params, target_params):
         result = differential_evolution(
             cost_function,
             bounds,
-            args=(Bx_matrix_eval, Bz_matrix_eval, max_turns, angle_deg, V_target_eval),
+            args=(Bx_matrix_eval, Bz_matrix_eval, max_turns, angle_deg, V_target_eval, weights_eval, rolls_deg, worst_case),
             integrality=integrality,
             strategy='best1bin',
             maxiter=10000,      
-            popsize=5,         
+            popsize=POPSIZE,   
             mutation=(0.5, 1.0),
             recombination=0.7,
             seed=42,
-            disp=True,         
+            init=init,
+            disp=verbose,      
             workers=1,         
             callback=early_stopping_callback 
         )
     finally:
         signal.signal(signal.SIGINT, original_sigint)
     
-    print(f"\nOptimization finished (or halted) in {time.time() - start_time:.1f} seconds.")
+    save_checkpoint(checkpoint_file, result.population, result.population_energies, generation[0])
+    
+    if verbose:
+        print(f"\nOptimization finished (or halted) in {time.time() - start_time:.1f} seconds.")
+        print(f"Population checkpoint saved to {checkpoint_file} (rerun with --resume to continue).")
     
     best_turns = np.round(result.x).astype(int)
+    final_cost = result.fun
+    optimizer = "differential_evolution"
+    if refine:
+        best_turns, final_cost = refine_turns(best_turns, *refine_args, rolls_deg=rolls_deg, worst_case=worst_case,
+                                              verbose=verbose)
+        optimizer = "differential_evolution+local_search"
     
-    # We call the real physics engine exactly once at the very end to get the full curves for the JSON
+    return finish_results(x_array, radii, best_turns, V_target, eval_mask, eval_window,
+                          hardware_params, final_cost, optimizer)
+
+def finish_results(x_array, radii, best_turns, V_target, eval_mask, eval_window, hardware_params, final_cost, optimizer):
+    """
+    Runs the full physics once for the final design and packs the result dictionary used by the GUI and the payload.
+    """
     V_sim, V_left, V_right = calculate_simulated_well(
-        x_array, radii, best_turns, z_height, angle_deg, wire_dia
+        x_array, radii, best_turns, hardware_params['z_height_cm'], hardware_params['angle_deg'],
+        hardware_params['wire_diameter_cm'], hardware_params.get('rx_diameter_cm', 0.0) / 2
     )
     
     peak_val = np.max(V_sim[eval_mask])
@@ -201,5 +737,6 @@ def run_optimization(hardware_params, target_params):
         "V_left": V_left,
         "V_right": V_right,
         "eval_window": eval_window, 
-        "final_cost": result.fun
-    }
\ No newline at end of file
+        "final_cost": final_cost,
+        "optimizer": optimizer
+    }
@@ -0,0 +1,263 @@
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import datetime
+import numpy as np
+
+from optimizer import build_slot_grid, slot_bounds, shape_error, relax_turns, load_seed_turns, JUMP_PENALTY
+from physics import build_or_load_physics_matrix, build_inductance_matrix, loop_vector, estimate_inductance
+from target import generate_target_well
+from payload import build_payload
+
+PARETO_ITERATIONS = 200   # Archive members whose neighbourhoods are explored
+PARETO_MSE_FACTOR = 5.0   # Default shape error limit, relative to the best seed design
+MAX_DESIGNS = 50          # Front members written as JSON designs
+RESONANT_BAND_KHZ = (115.0, 123.0)  # Drive range of the TX tank (flight 115 kHz, stable 119 kHz)
+OBJECTIVES = ["shape_mse", "inductance_uH", "wire_length_m", "total_turns"]
+
+def setup_problem(hardware_params, target_params):
+    """
+    Everything the search needs for one (hardware, target) pair: the eval-window physics matrices,
+    the target, the slot bounds, the loop-pair inductance matrix and the wire length of one turn per slot.
+    """
+    max_turns = hardware_params['max_turns']
+    eval_limit = hardware_params['eval_limit_cm']
+    x_array, radii = build_slot_grid(hardware_params)
+    V_target = generate_target_well(x_array, *target_params)
+    Bx_matrix, Bz_matrix = build_or_load_physics_matrix(x_array, radii, hardware_params)
+
+    eval_mask = (x_array >= -eval_limit) & (x_array <= eval_limit)
+    bounds = slot_bounds(radii, hardware_params, target_params[1])
+    values = np.arange(-max_turns, max_turns + 1)
+    lower = np.array([b[0] for b in bounds])
+    upper = np.array([b[1] for b in bounds])
+
+    M = build_inductance_matrix(radii, max_turns, hardware_params['wire_diameter_cm'])
+    slots = np.arange(len(radii))
+    M_blocks = M.reshape(len(radii), max_turns, len(radii), max_turns)
+
+    return {
+        "radii": radii,
+        "bounds": bounds,
+        "max_turns": max_turns,
+        "angle_deg": hardware_params['angle_deg'],
+        "Bx_eval": Bx_matrix[..., eval_mask],
+        "Bz_eval": Bz_matrix[..., eval_mask],
+        "V_target_eval": V_target[eval_mask],
+        "values": values,
+        "allowed": (values >= lower[:, np.newaxis]) & (values <= upper[:, np.newaxis]),
+        "M": M,
+        "M_self": M_blocks[slots, :, slots, :],
+        "value_loops": loop_vector(values[:, np.newaxis], max_turns),
+        "turn_length_m": 2 * np.pi * radii * 0.01
+    }
+
+def design_objectives(problem, turns):
+    """Shape MSE, inductance (µH), wire length (m) and turn count of one integer design."""
+    slots = np.arange(len(turns))
+    idx = turns + problem["max_turns"]
+    Btot_x = np.sum(problem["Bx_eval"][slots, idx], axis=0)
+    Btot_z = np.sum(problem["Bz_eval"][slots, idx], axis=0)
+    loops = loop_vector(turns, problem["max_turns"])
+
+    return np.array([
+        shape_error(Btot_x, Btot_z, problem["angle_deg"], problem["V_target_eval"]),
+        loops @ problem["M"] @ loops,
+        np.abs(turns) @ problem["turn_length_m"],
+        np.sum(np.abs(turns))
+    ])
+
+def neighbourhood(problem, turns, objectives):
+    """
+    Every design that sets one slot of `turns` to another allowed turn count, with its objectives.
+    The fields follow from the difference of one matrix row, as in refine_turns. The inductance follows
+    from the quadratic form: with a the loop vector and d the change of slot s's loops,
+    L' = L + 2 d . (M a)_s + d . M_ss . d, so no candidate needs the full product.
+    Returns the candidate turns (n, slots) and objectives (n, 4).
+    """
+    max_turns = problem["max_turns"]
+    values = problem["values"]
+    slots = np.arange(len(turns))
+
+    current_x = problem["Bx_eval"][slots, turns + max_turns]
+    current_z = problem["Bz_eval"][slots, turns + max_turns]
+    single_x = np.sum(current_x, axis=0) + problem["Bx_eval"] - current_x[:, np.newaxis, :]
+    single_z = np.sum(current_z, axis=0) + problem["Bz_eval"] - current_z[:, np.newaxis, :]
+    mse = shape_error(single_x, single_z, problem["angle_deg"], problem["V_target_eval"])
+
+    loops = loop_vector(turns, max_turns)
+    M_loops = (problem["M"] @ loops).reshape(len(turns), max_turns)
+    d = problem["value_loops"][np.newaxis, :, :] - loops.reshape(len(turns), 1, max_turns)
+    inductance = (objectives[1] + 2 * np.einsum('svt,st->sv', d, M_loops)
+                  + np.einsum('svt,stu,svu->sv', d, problem["M_self"], d))
+
+    turn_change = np.abs(values)[np.newaxis, :] - np.abs(turns)[:, np.newaxis]
+    wire = objectives[2] + turn_change * problem["turn_length_m"][:, np.newaxis]
+    total = objectives[3] + turn_change
+
+    valid = problem["allowed"] & (values[np.newaxis, :] != turns[:, np.newaxis])
+    candidates = np.repeat(np.broadcast_to(turns, (len(turns), len(turns)))[:, np.newaxis, :], len(values), axis=1)
+    candidates[slots, :, slots] = values
+
+    return candidates[valid], np.stack([mse[valid], inductance[valid], wire[valid], total[valid]], axis=-1)
+
+def pareto_mask(objectives, chunk=1000):
+    """True for every row of (n, objectives) that no other row dominates (all <= and one <), all minimized."""
+    nondominated = np.ones(len(objectives), dtype=bool)
+    for start in range(0, len(objectives), chunk):
+        rows = objectives[start:start + chunk, np.newaxis, :]
+        dominated = np.any(np.all(objectives <= rows, axis=-1) & np.any(objectives < rows, axis=-1), axis=1)
+        nondominated[start:start + chunk] = ~dominated
+    return nondominated
+
+def pareto_search(problem, seeds, iterations=PARETO_ITERATIONS, max_mse=None, rng=None, verbose=True):
+    """
+    Pareto local search. The archive starts as the non-dominated seeds; each iteration takes an unexplored
+    archive member, scores its whole single-slot neighbourhood in one batch and merges the candidates
+    that are not dominated. Designs with a shape error above max_mse are never admitted.
+    Returns the archive turns (n, slots) and objectives (n, 4).
+    """
+    rng = rng if rng is not None else np.random.default_rng(42)
+    archive_turns = np.array(seeds, dtype=int)
+    archive_obj = np.array([design_objectives(problem, turns) for turns in archive_turns])
+    max_mse = max_mse if max_mse is not None else PARETO_MSE_FACTOR * archive_obj[:, 0].min()
+    keep = pareto_mask(archive_obj)
+    archive_turns, archive_obj = archive_turns[keep], archive_obj[keep]
+    explored = np.zeros(len(archive_turns), dtype=bool)
+    seen = {turns.tobytes() for turns in archive_turns}
+
+    for iteration in range(iterations):
+        if explored.all():
+            break
+        pick = rng.choice(np.flatnonzero(~explored))
+        explored[pick] = True
+        candidates, candidate_obj = neighbourhood(problem, archive_turns[pick], archive_obj[pick])
+
+        fresh = np.array([turns.tobytes() not in seen for turns in candidates], dtype=bool)
+        fresh &= candidate_obj[:, 0] <= max_mse
+        candidates, candidate_obj = candidates[fresh], candidate_obj[fresh]
+        if len(candidates) == 0:
+            continue
+        seen.update(turns.tobytes() for turns in candidates)
+
+        all_obj = np.vstack([archive_obj, candidate_obj])
+        keep = pareto_mask(all_obj)
+        archive_turns = np.vstack([archive_turns, candidates])[keep]
+        archive_obj = all_obj[keep]
+        explored = np.concatenate([explored, np.zeros(len(candidates), dtype=bool)])[keep]
+
+        if verbose and (iteration + 1) % 25 == 0:
+            print(f"Iteration {iteration + 1}: {len(archive_turns)} designs on the front, {np.sum(~explored)} unexplored")
+
+    return archive_turns, archive_obj
+
+def resonant_capacitance_nF(inductance_uH, freq_kHz):
+    """Tank capacitance that resonates with the coil at freq_kHz."""
+    return 1e9 / ((2 * np.pi * freq_kHz * 1e3)**2 * inductance_uH * 1e-6)
+
+def main():
+    parser = argparse.ArgumentParser(description="Pareto front of coil designs: shape error vs inductance vs copper.")
+    parser.add_argument('-z', '--z_height', type=float, required=True, help='Vertical distance from pad to drone receiver (cm).')
+    parser.add_argument('-a', '--angle', type=float, required=True, help='Mounting angle of the drone receiver coils (degrees).')
+    parser.add_argument('--rmin', type=float, default=3.0, help='Inner winding radius (cm).')
+    parser.add_argument('--rmax', type=float, default=30.0, help='Outer winding radius (cm).')
+    parser.add_argument('--wire_diameter', type=float, default=0.3, help='Wire diameter (cm).')
+    parser.add_argument('--max_turns', type=int, default=5, help='Max vertical stack depth.')
+    parser.add_argument('--eval_limit', type=float, default=20.0, help='Max distance for shape evaluation (cm).')
+    parser.add_argument('--bucking_buffer', type=float, default=1.0,
+                        help='Distance inside x_hover where bucking coils must stop (cm).')
+    parser.add_argument('--well_params', nargs=4, type=float, required=True, metavar=('V_MIN', 'X_HOVER', 'W_WALL', 'N'),
+                        help='Target well: V_min x_hover w_wall n')
+    parser.add_argument('--init-from', type=str, nargs='+', default=[],
+                        help='Extra seed designs (well_design_*.json / tuned_coil_*.json).')
+    parser.add_argument('-i', '--iterations', type=int, default=PARETO_ITERATIONS, help='Neighbourhoods to explore.')
+    parser.add_argument('--max_mse', type=float, default=None,
+                        help=f'Largest shape error kept on the front (default: {PARETO_MSE_FACTOR:g}x the best seed).')
+    parser.add_argument('--capacitance_nF', type=float, default=None,
+                        help=f'Tank capacitance; keeps only designs resonating within {RESONANT_BAND_KHZ[0]:g}-{RESONANT_BAND_KHZ[1]:g} kHz.')
+    parser.add_argument('-n', '--max_designs', type=int, default=MAX_DESIGNS, help='Most front members written as JSON.')
+    parser.add_argument('-o', '--output', type=str, default=None, help='Output directory (default: output/pareto_<timestamp>).')
+    args = parser.parse_args()
+
+    hardware_params = {
+        "z_height_cm": args.z_height,
+        "angle_deg": args.angle,
+        "r_min_cm": args.rmin,
+        "r_max_cm": args.rmax,
+        "wire_diameter_cm": args.wire_diameter,
+        "max_turns": args.max_turns,
+        "eval_limit_cm": args.eval_limit,
+        "bucking_buffer_cm": args.bucking_buffer
+    }
+    target_params = tuple(args.well_params)
+
+    problem = setup_problem(hardware_params, target_params)
+
+    # Seeds: the gradient design for the shape alone, plus any given designs
+    print("Finding a seed design with the gradient optimizer...")
+    seed, _, _ = relax_turns(np.zeros(len(problem["radii"]), dtype=int), problem["bounds"], problem["Bx_eval"],
+                             problem["Bz_eval"], problem["max_turns"], problem["angle_deg"], problem["V_target_eval"],
+                             verbose=False)
+    lower = np.array([b[0] for b in problem["bounds"]])
+    upper = np.array([b[1] for b in problem["bounds"]])
+    seeds = [seed] + [np.clip(load_seed_turns(f, problem["radii"]), lower, upper) for f in args.init_from]
+
+    start_time = time.time()
+    front_turns, front_obj = pareto_search(problem, seeds, args.iterations, args.max_mse)
+    print(f"Pareto search finished in {time.time() - start_time:.1f} seconds: {len(front_turns)} non-dominated designs.")
+
+    order = np.argsort(front_obj[:, 0])
+    front_turns, front_obj = front_turns[order], front_obj[order]
+    if args.capacitance_nF is not None:
+        f_res_kHz = 1e-3 / (2 * np.pi * np.sqrt(front_obj[:, 1] * 1e-6 * args.capacitance_nF * 1e-9))
+        in_band = (f_res_kHz >= RESONANT_BAND_KHZ[0]) & (f_res_kHz <= RESONANT_BAND_KHZ[1])
+        print(f"{in_band.sum()} designs resonate within {RESONANT_BAND_KHZ[0]:g}-{RESONANT_BAND_KHZ[1]:g} kHz "
+              f"with {args.capacitance_nF:g} nF.")
+        front_turns, front_obj = front_turns[in_band], front_obj[in_band]
+    if len(front_turns) == 0:
+        return
+
+    # Thin the front evenly along the shape error
+    picks = np.unique(np.linspace(0, len(front_turns) - 1, min(args.max_designs, len(front_turns))).round().astype(int))
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    out_dir = args.output or os.path.join("output", f"pareto_{timestamp}")
+    os.makedirs(out_dir, exist_ok=True)
+
+    rows = []
+    for design, idx in enumerate(picks):
+        turns, objectives = front_turns[idx], front_obj[idx]
+        final_cost = objectives[0] + JUMP_PENALTY * np.sum(np.abs(np.diff(turns)))
+        results = {"radii": problem["radii"], "best_turns": turns, "final_cost": final_cost}
+        estimated_L_uH = estimate_inductance(problem["radii"], turns, hardware_params["wire_diameter_cm"])
+
+        payload = build_payload(hardware_params, target_params, results, estimated_L_uH, timestamp, "pareto_local_search")
+        payload["pareto"] = {name: float(value) for name, value in zip(OBJECTIVES, objectives)}
+        filename = os.path.join(out_dir, f"pareto_{design:03d}.json")
+        with open(filename, 'w') as f:
+            json.dump(payload, f, indent=4)
+
+        row = {"design": design, **payload["pareto"],
+               f"C_{RESONANT_BAND_KHZ[0]:g}kHz_nF": round(resonant_capacitance_nF(objectives[1], RESONANT_BAND_KHZ[0]), 2),
+               f"C_{RESONANT_BAND_KHZ[1]:g}kHz_nF": round(resonant_capacitance_nF(objectives[1], RESONANT_BAND_KHZ[1]), 2),
+               "file": os.path.basename(filename)}
+        rows.append(row)
+
+    summary_file = os.path.join(out_dir, "summary.csv")
+    with open(summary_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"\n{'Design':<8} {'Shape MSE':<11} {'L (uH)':<10} {'Wire (m)':<10} {'Turns':<7} {'C @ 115-123 kHz (nF)':<20}")
+    print("-" * 70)
+    for row in rows:
+        capacitance = f"{row[f'C_{RESONANT_BAND_KHZ[1]:g}kHz_nF']:.1f}-{row[f'C_{RESONANT_BAND_KHZ[0]:g}kHz_nF']:.1f}"
+        print(f"{row['design']:<8} {row['shape_mse']:<11.5f} {row['inductance_uH']:<10.1f} {row['wire_length_m']:<10.2f} "
+              f"{row['total_turns']:<7.0f} {capacitance:<20}")
+    print(f"\n{len(rows)} designs and summary table saved to: {out_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import numpy as np
+
+def build_payload(hardware_params, target_params, results, estimated_L_uH, timestamp, optimizer="differential_evolution"):
+    """
+    Assembles the JSON payload written for every optimized coil (well_design_*.json).
+    target_params is the (V_min, x_hover, w_wall, n) tuple and results the dictionary from run_optimization.
+    MILP runs also record their linearized bound and that the design is not certified optimal.
+    """
+    metadata = {
+        "timestamp": timestamp,
+        "final_cost_score": float(results["final_cost"]),
+        "optimizer": optimizer
+    }
+    if "milp_certificate" in results:
+        metadata["milp_certificate"] = results["milp_certificate"]
+    return {
+        "metadata": metadata,
+        "hardware": hardware_params,
+        "target_well": {
+            "V_min": target_params[0],
+            "x_hover": target_params[1],
+            "w_wall": target_params[2],
+            "n_shape": target_params[3]
+        },
+        "electrical_properties": {
+            "estimated_inductance_uH": round(estimated_L_uH, 2)
+        },
+        "optimized_coil": {
+            "radii_cm": np.round(results["radii"], 3).tolist(),
+            "turns": results["best_turns"].tolist()
+        }
+    }
@@ -1,11 +1,28 @@
+import os
+import hashlib
 import numpy as np
 from scipy.special import ellipk, ellipe
 
-def get_B_components(x, z, R):
+# The shared physics core: every tool (optimizer, tuner, visualizer, static sims) goes through the
+# kernel and stack builders below, so any speed-up here benefits all of them.
+
+PHYSICS_CACHE_DIR = "physics_cache"
+ADAPTIVE_TOL = 3e-3     # Largest linear-interpolation miss of a single loop's field, relative to its peak
+ADAPTIVE_LEVELS = 4     # How many times refine_grid may halve an interval
+RX_RINGS = 3            # Radial Gauss-Legendre nodes of the receiver disk quadrature
+RX_SPOKES = 8           # Equally spaced angles per radial node
+
+def get_B_components(x, z, R, wire_radius=0.0):
     """
     Calculates the normalized Bx and Bz magnetic field components 
     for a single circular current loop of radius R.
+    x, z and R broadcast against each other, so one call can cover many loops
+    (e.g. x of shape (1, points) with R of shape (slots, 1)). Scalars in give scalars out.
+    With a wire_radius the loop is a finite round conductor rather than a filament: inside the wire
+    the field falls linearly to zero at its centre instead of diverging. Outside it nothing changes.
     """
+    x = np.asarray(x, dtype=float)
+    
     # Safe handling for x=0 to prevent division by zero errors in the math
     x_safe = np.where(x == 0, 1e-10, x)
     
@@ -22,43 +39,223 @@ def get_B_components(x, z, R):
     Bz = (1 / root_term) * (K + ((R**2 - x_safe**2 - z**2) / alpha_squared) * E)
     
     # Explicitly force Bx to 0 where x is exactly 0 (axis of symmetry)
-    if isinstance(x, np.ndarray):
-        Bx[x == 0] = 0.0
-    elif x == 0:
-        Bx = 0.0
+    Bx = np.where(x == 0, 0.0, Bx)
+    
+    # Near the conductor the filament field goes as 1/d; inside a round wire it goes as d/wire_radius^2
+    if wire_radius > 0:
+        d_squared = (R - np.abs(x))**2 + z**2
+        inside = np.minimum(1.0, d_squared / wire_radius**2)
+        Bx = Bx * inside
+        Bz = Bz * inside
         
+    return Bx[()], Bz[()]
+
+def get_B_on_grid(x_array, z, R, wire_radius=0.0):
+    """
+    get_B_components over a 1D x grid (z and R may broadcast against it, e.g. R of shape (slots, 1)).
+    A loop's field is mirror symmetric about its axis (Bx odd, Bz even), so on a grid symmetric about x=0,
+    like every linspace(-b, b, n) in the project, only the non-negative half is evaluated and mirrored.
+    """
+    x_array = np.asarray(x_array, dtype=float)
+    half = len(x_array) // 2
+    tolerance = 1e-12 * np.max(np.abs(x_array), initial=0.0)
+    if half == 0 or not np.allclose(x_array, -x_array[::-1], rtol=0, atol=tolerance):
+        return get_B_components(x_array, z, R, wire_radius)
+    
+    # The non-negative half holds the centre point of an odd-length grid; everything left of it is mirrored
+    Bx_half, Bz_half = get_B_components(x_array[half:], z, R, wire_radius)
+    Bx = np.concatenate([-Bx_half[..., -half:][..., ::-1], Bx_half], axis=-1)
+    Bz = np.concatenate([Bz_half[..., -half:][..., ::-1], Bz_half], axis=-1)
     return Bx, Bz
 
-def calculate_simulated_well(x_array, radii, turns_array, z_height, angle_deg, wire_diameter):
+def refine_grid(x_array, radii, z_height, wire_diameter, rel_tol=ADAPTIVE_TOL, max_levels=ADAPTIVE_LEVELS):
     """
-    Calculates the conjoined V_sim profile for the left and right drone motors,
-    accounting for accurate downward 3D wire stacking and bucking coils.
+    Adaptive grid: adds points to x_array only where the field of some winding is poorly resolved.
+    Each interval is checked at its midpoint: if straight-line interpolation between its ends misses one
+    slot's Bx or Bz (top layer, the closest to the receiver) by more than rel_tol of that slot's peak,
+    the midpoint is added. This repeats up to max_levels times. At low z it resolves the sharp, steep peaks
+    above the windings without raising the resolution everywhere.
+    Returns the sorted refined grid, which keeps every original point (and the symmetry about x=0).
     """
+    x_array = np.asarray(x_array, dtype=float)
+    radii = np.asarray(radii, dtype=float)[:, np.newaxis]
+    wire_radius = wire_diameter / 2
+    
+    for level in range(max_levels):
+        Bx, Bz = get_B_on_grid(x_array, z_height, radii, wire_radius)
+        midpoints = (x_array[:-1] + x_array[1:]) / 2
+        Bx_mid, Bz_mid = get_B_on_grid(midpoints, z_height, radii, wire_radius)
+        
+        peak = np.maximum(np.max(np.abs(Bx), axis=1), np.max(np.abs(Bz), axis=1))[:, np.newaxis]
+        miss_x = np.abs(Bx_mid - (Bx[:, :-1] + Bx[:, 1:]) / 2)
+        miss_z = np.abs(Bz_mid - (Bz[:, :-1] + Bz[:, 1:]) / 2)
+        too_coarse = np.any(np.maximum(miss_x, miss_z) > rel_tol * peak, axis=0)
+        
+        if not np.any(too_coarse):
+            break
+        x_array = np.sort(np.concatenate([x_array, midpoints[too_coarse]]))
+        
+    return x_array
+
+def grid_weights(x_array):
+    """
+    Trapezoid-rule weights of a (possibly non-uniform) grid, normalized to sum to 1.
+    Averages with these weights integrate over x, so refined regions don't count extra in the cost.
+    """
+    widths = np.diff(x_array)
+    weights = np.zeros_like(x_array)
+    weights[:-1] += widths / 2
+    weights[1:] += widths / 2
+    return weights / np.sum(weights)
+
+def build_stack_fields(x_array, radii, z_height, max_turns, wire_diameter, cancelled=None):
+    """
+    Field of every (slot, turn count) pair, as two arrays of shape [Slot_Index, Turn_Value_Index, X_Spatial_Index].
+    Turn counts [-max_turns to +max_turns] map onto indices [0 to 2*max_turns]; negative counts are bucking stacks.
+    Wires stack downward, so layer i sits at z_height + i * wire_diameter. Each layer is evaluated once for
+    all slots and a stack of N turns is the running sum of its first N layers. The wires are finite conductors,
+    so grid points that fall inside one stay finite.
+    cancelled() is checked before each layer; if it returns True the build stops and returns None.
+    """
+    x_array = np.asarray(x_array, dtype=float)
+    radii = np.asarray(radii, dtype=float)
+    
+    Bx_matrix = np.zeros((len(radii), 2 * max_turns + 1, len(x_array)))
+    Bz_matrix = np.zeros((len(radii), 2 * max_turns + 1, len(x_array)))
+    stack_x = np.zeros((len(radii), len(x_array)))
+    stack_z = np.zeros((len(radii), len(x_array)))
+    
+    for i in range(max_turns):
+        if cancelled is not None and cancelled():
+            return None
+        z_i = z_height + (i * wire_diameter)
+        Bx, Bz = get_B_on_grid(x_array, z_i, radii[:, np.newaxis], wire_diameter / 2)
+        stack_x += Bx
+        stack_z += Bz
+        Bx_matrix[:, max_turns + i + 1] = stack_x
+        Bz_matrix[:, max_turns + i + 1] = stack_z
+        Bx_matrix[:, max_turns - i - 1] = -stack_x
+        Bz_matrix[:, max_turns - i - 1] = -stack_z
+        
+    return Bx_matrix, Bz_matrix
+
+def build_or_load_physics_matrix(x_array, radii, hardware_params):
+    """
+    Checks the disk for a pre-computed magnetic field matrix based on the hardware limits.
+    If it doesn't exist, it calculates it once with build_stack_fields and saves it for future runs.
+    With a finite receiver (rx_diameter_cm > 0) the rows come from build_receiver_fields instead,
+    which also depend on the mounting angle.
+    """
+    rx_radius = hardware_params.get('rx_diameter_cm', 0.0) / 2
+    
+    # Create a unique hash based on the physical hardware limits
+    hash_str = f"{hardware_params['z_height_cm']}_{hardware_params['r_min_cm']}_{hardware_params['r_max_cm']}_{hardware_params['wire_diameter_cm']}_{hardware_params['max_turns']}_{len(x_array)}_{x_array[0]}_{x_array[-1]}"
+    if rx_radius > 0:
+        hash_str += f"_rx{hardware_params['rx_diameter_cm']}_{hardware_params['angle_deg']}"
+    hash_id = hashlib.md5(hash_str.encode()).hexdigest()[:8]
+    
+    os.makedirs(PHYSICS_CACHE_DIR, exist_ok=True)
+    cache_file = os.path.join(PHYSICS_CACHE_DIR, f"matrix_{hash_id}.npz")
+    
+    # Check if we already did the math
+    if os.path.exists(cache_file):
+        print(f"Loading pre-computed physics matrix from cache ({hash_id})...")
+        data = np.load(cache_file)
+        return data['Bx'], data['Bz']
+        
+    print("Pre-computing Biot-Savart physics matrix. This will take a few seconds...")
+    if rx_radius > 0:
+        Bx_matrix, Bz_matrix = build_receiver_fields(
+            x_array, radii, hardware_params['z_height_cm'], hardware_params['max_turns'], hardware_params['wire_diameter_cm'],
+            hardware_params['angle_deg'], rx_radius
+        )
+    else:
+        Bx_matrix, Bz_matrix = build_stack_fields(
+            x_array, radii, hardware_params['z_height_cm'], hardware_params['max_turns'], hardware_params['wire_diameter_cm']
+        )
+                
+    # Save to disk
+    np.savez_compressed(cache_file, Bx=Bx_matrix, Bz=Bz_matrix)
+    print("Physics matrix cached successfully!")
+    
+    return Bx_matrix, Bz_matrix
+
+def build_or_load_scenario_matrices(x_array, radii, hardware_params, z_heights):
+    """
+    Physics matrices for several receiver heights, stacked along a scenario axis as (slots, turns, scenarios, x).
+    Slots and turns stay the leading axes so the same [slot, turn] gathers that serve a single matrix
+    pick every scenario's row at once. Each distinct height is built (or loaded) once.
+    """
+    matrices = {}
+    for z in dict.fromkeys(z_heights):
+        matrices[z] = build_or_load_physics_matrix(x_array, radii, {**hardware_params, 'z_height_cm': z})
+    
+    Bx_stack = np.stack([matrices[z][0] for z in z_heights], axis=2)
+    Bz_stack = np.stack([matrices[z][1] for z in z_heights], axis=2)
+    return Bx_stack, Bz_stack
+
+def calculate_coil_fields(x_array, radii, turns_array, z_height, wire_diameter):
+    """
+    Total Bx and Bz of one winding profile, accounting for accurate downward 3D wire stacking
+    and bucking coils. Only the active slots are evaluated, one layer of the stacks at a time.
+    """
+    x_array = np.asarray(x_array, dtype=float)
+    radii = np.asarray(radii, dtype=float)
+    turns_array = np.asarray(turns_array)
+    
     Btot_x = np.zeros_like(x_array, dtype=float)
     Btot_z = np.zeros_like(x_array, dtype=float)
     
-    # Iterate over each radial slot and its assigned number of turns
-    for R, N in zip(radii, turns_array):
-        if N == 0:
-            continue
-            
-        # Determine current direction (positive or negative bucking coil)
-        direction = np.sign(N)
-        num_turns = int(abs(N))
+    # Layer i exists in every slot with more than i turns; the sign sets the current direction
+    num_layers = int(np.max(np.abs(turns_array), initial=0))
+    for i in range(num_layers):
+        in_layer = np.abs(turns_array) > i
+        z_i = z_height + (i * wire_diameter)
+        Bx, Bz = get_B_on_grid(x_array, z_i, radii[in_layer, np.newaxis], wire_diameter / 2)
+        direction = np.sign(turns_array[in_layer])[:, np.newaxis]
         
-        # Calculate the stack: wires are pushed DOWNWARD into the base pad
-        for i in range(num_turns):
-            z_i = z_height + (i * wire_diameter)
-            Bx, Bz = get_B_components(x_array, z_i, R)
-            
-            Btot_x += direction * Bx
-            Btot_z += direction * Bz
-            
-    # Calculate the normalized flux passing through the tilted drone coils
+        Btot_x += np.sum(direction * Bx, axis=0)
+        Btot_z += np.sum(direction * Bz, axis=0)
+        
+    return Btot_x, Btot_z
+
+def project_flux(Btot_x, Btot_z, angle_deg):
+    """
+    Flux magnitude through the left and right drone coils, tilted by -angle and +angle.
+    Returns (V_left, V_right).
+    """
     theta = np.radians(angle_deg)
-    
     V_right = np.abs(Btot_x * np.sin(theta) + Btot_z * np.cos(theta))
     V_left = np.abs(Btot_x * np.sin(-theta) + Btot_z * np.cos(-theta))
+    return V_left, V_right
+
+def normalized_well(Btot_x, Btot_z, angle_deg):
+    """project_flux scaled so the larger of the two curves peaks at 1 (as drawn by the tuner and visualizer)."""
+    V_left, V_right = project_flux(Btot_x, Btot_z, angle_deg)
+    
+    max_val = max(np.max(V_right), np.max(V_left))
+    if max_val > 0:
+        V_right = V_right / max_val
+        V_left = V_left / max_val
+    return V_left, V_right
+
+def calculate_simulated_well(x_array, radii, turns_array, z_height, angle_deg, wire_diameter, rx_radius=0.0):
+    """
+    Calculates the conjoined V_sim profile for the left and right drone motors,
+    accounting for accurate downward 3D wire stacking and bucking coils.
+    rx_radius > 0 averages the flux over receiver disks of that radius instead of sampling B at their centres.
+    """
+    if rx_radius > 0:
+        x_array = np.asarray(x_array, dtype=float)
+        centers = np.stack([x_array, np.zeros_like(x_array), np.full_like(x_array, z_height)], axis=-1)
+        flux = receiver_flux(centers[:, np.newaxis, :], coil_normal(np.array([-angle_deg, angle_deg])),
+                             rx_radius, radii, turns_array, wire_diameter)
+        V_left, V_right = np.abs(flux[:, 0]), np.abs(flux[:, 1])
+    else:
+        Btot_x, Btot_z = calculate_coil_fields(x_array, radii, turns_array, z_height, wire_diameter)
+        
+        # Calculate the normalized flux passing through the tilted drone coils
+        V_left, V_right = project_flux(Btot_x, Btot_z, angle_deg)
     
     # Stitch them together at the origin (x=0) to form the conjoined well
     V_sim = np.where(x_array >= 0, V_right, V_left)
@@ -66,6 +263,175 @@ def calculate_simulated_well(x_array, radii, turns_array, z_height, angle_deg, w
     # Returning all three allows the GUI to plot the individual red/blue curves
     return V_sim, V_left, V_right
 
+# --- 3D field engine ---
+# The pad is the z=0 plane and every loop is coaxial with the z axis, so any point reduces to the
+# cylindrical (rho, z) that get_B_components already handles.
+
+def get_B_3d(points, depth, radii, wire_radius=0.0):
+    """
+    Bx, By and Bz at 3D points (an array of shape (points, 3), in cm) of unit loops with the given radii,
+    each depth cm below the pad. Returns three arrays of shape (loops, points).
+    """
+    x, y, z = points.T
+    rho = np.hypot(x, y)
+    B_rho, Bz = get_B_components(rho[np.newaxis, :], z + depth, radii[:, np.newaxis], wire_radius)
+    
+    # Split the radial component back into x and y (it is zero on the axis)
+    cos_phi = np.divide(x, rho, out=np.zeros_like(rho), where=rho > 0)
+    sin_phi = np.divide(y, rho, out=np.zeros_like(rho), where=rho > 0)
+    return B_rho * cos_phi, B_rho * sin_phi, Bz
+
+def calculate_coil_fields_3d(points, radii, turns_array, wire_diameter):
+    """
+    Bx, By and Bz of one winding profile at arbitrary 3D points (an array of shape (..., 3), in cm).
+    Layer i of the stacks sits i * wire_diameter below the pad, as in calculate_coil_fields.
+    All points are evaluated in bulk: one kernel call per layer covers every active loop and point.
+    """
+    points = np.asarray(points, dtype=float)
+    radii = np.asarray(radii, dtype=float)
+    turns_array = np.asarray(turns_array)
+    
+    shape = points.shape[:-1]
+    flat = points.reshape(-1, 3)
+    Btot = np.zeros((3, len(flat)))
+    
+    num_layers = int(np.max(np.abs(turns_array), initial=0))
+    for i in range(num_layers):
+        in_layer = np.abs(turns_array) > i
+        B = get_B_3d(flat, i * wire_diameter, radii[in_layer], wire_diameter / 2)
+        direction = np.sign(turns_array[in_layer])[:, np.newaxis]
+        Btot += np.sum(direction * np.array(B), axis=1)
+    
+    return tuple(component.reshape(shape) for component in Btot)
+
+def receiver_quadrature(num_rings=RX_RINGS, num_spokes=RX_SPOKES):
+    """
+    Quadrature nodes on the unit disk: Gauss-Legendre in r^2 (which makes the area element uniform)
+    times equally spaced angles. Returns (u, v, weights) with the weights summing to 1, so
+    sum(weights * f(u, v)) is the average of f over the disk.
+    """
+    nodes, node_weights = np.polynomial.legendre.leggauss(num_rings)
+    r = np.sqrt((nodes + 1) / 2)
+    phi = 2 * np.pi * (np.arange(num_spokes) + 0.5) / num_spokes
+    
+    u = (r[:, np.newaxis] * np.cos(phi)).ravel()
+    v = (r[:, np.newaxis] * np.sin(phi)).ravel()
+    weights = np.repeat(node_weights / 2 / num_spokes, num_spokes)
+    return u, v, weights
+
+def coil_normal(tilt_deg, azimuth_deg=0.0):
+    """
+    Unit normal of a receiver coil tilted tilt_deg from vertical towards azimuth_deg (0 = the +x direction).
+    With azimuth 0 this is the right coil of project_flux for +angle and the left coil for -angle.
+    """
+    tilt = np.radians(tilt_deg)
+    azimuth = np.radians(azimuth_deg)
+    return np.stack(np.broadcast_arrays(np.sin(tilt) * np.cos(azimuth), np.sin(tilt) * np.sin(azimuth), np.cos(tilt)), axis=-1)
+
+def receiver_nodes(centers, normals, rx_radius, quadrature=None):
+    """
+    Quadrature points on receiver disks of radius rx_radius: returns the nodes, shape (..., nodes, 3),
+    the unit normals broadcast to (..., 3) and the node weights. centers and normals broadcast together.
+    """
+    centers, normals = np.broadcast_arrays(np.asarray(centers, dtype=float), np.asarray(normals, dtype=float))
+    normals = normals / np.linalg.norm(normals, axis=-1, keepdims=True)
+    u, v, weights = quadrature if quadrature is not None else receiver_quadrature()
+    
+    # Two in-plane axes per coil, built from whichever world axis is further from the normal
+    helper = np.where(np.abs(normals[..., 2:]) < 0.9, [0.0, 0.0, 1.0], [1.0, 0.0, 0.0])
+    e1 = np.cross(normals, helper)
+    e1 /= np.linalg.norm(e1, axis=-1, keepdims=True)
+    e2 = np.cross(normals, e1)
+    
+    nodes = (centers[..., np.newaxis, :]
+             + rx_radius * (u[:, np.newaxis] * e1[..., np.newaxis, :] + v[:, np.newaxis] * e2[..., np.newaxis, :]))
+    return nodes, normals, weights
+
+def receiver_flux(centers, normals, rx_radius, radii, turns_array, wire_diameter, quadrature=None):
+    """
+    Field through finite receiver coils: the normal component of B averaged over each coil's disk
+    (flux / coil area, so it compares directly with the point model's B . n). Signed; take abs() for amplitude.
+    centers and normals are (..., 3) arrays and broadcast against each other. The quadrature nodes of
+    every coil are evaluated in one calculate_coil_fields_3d call. rx_radius=0 gives the point model.
+    """
+    nodes, normals, weights = receiver_nodes(centers, normals, rx_radius, quadrature)
+    Bx, By, Bz = calculate_coil_fields_3d(nodes, radii, turns_array, wire_diameter)
+    
+    B_normal = Bx * normals[..., np.newaxis, 0] + By * normals[..., np.newaxis, 1] + Bz * normals[..., np.newaxis, 2]
+    return B_normal @ weights
+
+def build_receiver_fields(x_array, radii, z_height, max_turns, wire_diameter, angle_deg, rx_radius, quadrature=None):
+    """
+    build_stack_fields for finite receivers. Each slot/turn row holds the field averaged over the left (-angle)
+    and right (+angle) receiver disks centred on (x, 0, z_height), folded into an effective (Bx, Bz) pair so that
+    project_flux(Bx, Bz, angle_deg) returns exactly each coil's average flux. Anything built on the point matrices
+    (cost function, refiner, tuner) therefore works unchanged and at the same cost per evaluation.
+    """
+    x_array = np.asarray(x_array, dtype=float)
+    radii = np.asarray(radii, dtype=float)
+    
+    centers = np.stack([x_array, np.zeros_like(x_array), np.full_like(x_array, z_height)], axis=-1)
+    nodes, normals, weights = receiver_nodes(centers[:, np.newaxis, :], coil_normal(np.array([-angle_deg, angle_deg])),
+                                             rx_radius, quadrature)
+    node_normals = np.broadcast_to(normals[:, :, np.newaxis, :], nodes.shape).reshape(-1, 3)
+    
+    # Flux = Bx sin(angle) + Bz cos(angle) for the right coil and -Bx sin(angle) + Bz cos(angle) for the left
+    theta = np.radians(angle_deg)
+    sin_theta = np.sin(theta) if not np.isclose(np.sin(theta), 0) else np.inf
+    cos_theta = np.cos(theta) if not np.isclose(np.cos(theta), 0) else np.inf
+    
+    Bx_matrix = np.zeros((len(radii), 2 * max_turns + 1, len(x_array)))
+    Bz_matrix = np.zeros((len(radii), 2 * max_turns + 1, len(x_array)))
+    stack = np.zeros((len(radii), len(x_array), 2))
+    
+    for i in range(max_turns):
+        Bx, By, Bz = get_B_3d(nodes.reshape(-1, 3), i * wire_diameter, radii, wire_diameter / 2)
+        B_normal = Bx * node_normals[:, 0] + By * node_normals[:, 1] + Bz * node_normals[:, 2]
+        stack += B_normal.reshape(len(radii), len(x_array), 2, -1) @ weights
+        
+        flux_left, flux_right = stack[..., 0], stack[..., 1]
+        Bx_matrix[:, max_turns + i + 1] = (flux_right - flux_left) / (2 * sin_theta)
+        Bz_matrix[:, max_turns + i + 1] = (flux_right + flux_left) / (2 * cos_theta)
+        Bx_matrix[:, max_turns - i - 1] = -Bx_matrix[:, max_turns + i + 1]
+        Bz_matrix[:, max_turns - i - 1] = -Bz_matrix[:, max_turns + i + 1]
+        
+    return Bx_matrix, Bz_matrix
+
+def loop_vector(turns_array, max_turns):
+    """
+    Flattens winding profiles (..., slots) into signed loop indicators (..., slots * max_turns):
+    entry slot * max_turns + layer is sign(turns) if that layer of the slot's stack is wound, else 0.
+    """
+    turns_array = np.asarray(turns_array)
+    wound = np.arange(max_turns) < np.abs(turns_array)[..., np.newaxis]
+    loops = np.sign(turns_array)[..., np.newaxis] * wound
+    return loops.reshape(*turns_array.shape[:-1], -1)
+
+def build_inductance_matrix(radii_cm, max_turns, wire_diameter_cm):
+    """
+    Inductance (µH) between every pair of possible loops, indexed like loop_vector (layer i of a slot sits
+    i * wire_diameter below the pad). The diagonal holds the self-inductances. The inductance of a winding
+    profile is then the quadratic form a @ M @ a of its loop vector a, which also gives cheap incremental
+    updates when only a few slots change.
+    """
+    mu_0 = 4 * np.pi * 1e-7
+    wire_radius_m = wire_diameter_cm * 0.01 / 2.0
+    R = np.repeat(np.asarray(radii_cm, dtype=float), max_turns) * 0.01
+    z = np.tile(np.arange(max_turns), len(radii_cm)) * wire_diameter_cm * 0.01
+    
+    # Maxwell's formula for mutual inductance of coaxial circular filaments
+    R1, R2 = R[:, np.newaxis], R[np.newaxis, :]
+    k_squared = (4 * R1 * R2) / ((R1 + R2)**2 + (z[:, np.newaxis] - z[np.newaxis, :])**2)
+    overlap = k_squared >= 1.0
+    k_squared = np.where(overlap, 0.5, k_squared)
+    k = np.sqrt(k_squared)
+    M = mu_0 * np.sqrt(R1 * R2) * ((2/k - k) * ellipk(k_squared) - (2/k) * ellipe(k_squared))
+    M[overlap] = 0.0
+    
+    # Standard approximation for a thin circular wire loop
+    M[np.diag_indices_from(M)] = mu_0 * R * (np.log(8 * R / wire_radius_m) - 2)
+    return M * 1e6
+
 def estimate_inductance(radii_cm, turns_array, wire_diameter_cm):
     """
     Estimates the total equivalent inductance of the multi-zoned, 3D stacked coil.
@@ -73,67 +439,13 @@ def estimate_inductance(radii_cm, turns_array, wire_diameter_cm):
     between every possible pair of loops (including the negative bucking effect).
     Returns the value in microhenries (µH).
     """
-    # 1. Convert everything to standard SI units (Meters)
-    radii_m = np.array(radii_cm) * 0.01
-    wire_dia_m = wire_diameter_cm * 0.01
-    wire_radius_m = wire_dia_m / 2.0
-    mu_0 = 4 * np.pi * 1e-7
-    
-    # 2. Flatten the coil cross-section into a 1D list of individual physical loops
-    # Each loop gets a tuple: (Radius, Z-depth, Current Direction)
-    loops = []
-    for R_m, N in zip(radii_m, turns_array):
-        if N == 0:
-            continue
-            
-        direction = np.sign(N)
-        num_turns = int(abs(N))
-        
-        for i in range(num_turns):
-            z_m = i * wire_dia_m # Downward stack depth
-            loops.append((R_m, z_m, direction))
-            
-    num_loops = len(loops)
-    if num_loops == 0:
+    turns_array = np.asarray(turns_array)
+    active = turns_array != 0
+    if not np.any(active):
         return 0.0
-        
-    total_inductance_H = 0.0
     
-    # 3. Calculate Self-Inductance for every individual loop
-    for R_m, _, _ in loops:
-        # Standard approximation for a thin circular wire loop
-        L_self = mu_0 * R_m * (np.log(8 * R_m / wire_radius_m) - 2)
-        total_inductance_H += L_self
-        
-    # 4. Calculate Mutual Inductance between EVERY pair of loops
-    for i in range(num_loops):
-        for j in range(num_loops):
-            if i == j:
-                continue # Skip self (already calculated above)
-                
-            R1, z1, dir1 = loops[i]
-            R2, z2, dir2 = loops[j]
-            
-            # Physical vertical distance between the two loops
-            d = abs(z1 - z2)
-            
-            # Elliptic integral geometric factor
-            k_squared = (4 * R1 * R2) / ((R1 + R2)**2 + d**2)
-            
-            # Safety catch: if loops perfectly overlap (they shouldn't), skip to avoid divide-by-zero
-            if k_squared >= 1.0:
-                continue 
-                
-            k = np.sqrt(k_squared)
-            K = ellipk(k_squared)
-            E = ellipe(k_squared)
-            
-            # Maxwell's formula for mutual inductance of coaxial circular filaments
-            M = mu_0 * np.sqrt(R1 * R2) * ((2/k - k) * K - (2/k) * E)
-            
-            # If one loop is positive (outer) and one is negative (bucking), 
-            # their mutual inductance physically subtracts from the total!
-            total_inductance_H += dir1 * dir2 * M
-            
-    # Convert Henries to Microhenries for easier reading
-    return total_inductance_H * 1e6
\ No newline at end of file
+    # Only the wound slots enter the quadratic form
+    max_turns = int(np.max(np.abs(turns_array)))
+    loops = loop_vector(turns_array[active], max_turns)
+    M = build_inductance_matrix(np.asarray(radii_cm)[active], max_turns, wire_diameter_cm)
+    return float(loops @ M @ loops)
\ No newline at end of file
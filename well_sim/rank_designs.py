@@ -0,0 +1,178 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+import numpy as np
+
+from optimizer import build_slot_grid, score_candidates, shape_error
+from physics import build_or_load_physics_matrix, build_stack_fields, estimate_inductance
+from target import generate_target_well
+from batch import HARDWARE_DEFAULTS
+
+# Hardware fields that decide the slots, the grid and the physics; designs sharing them share matrices
+GROUP_KEYS = ["z_height_cm", "angle_deg", "r_min_cm", "r_max_cm", "wire_diameter_cm", "eval_limit_cm", "rx_diameter_cm"]
+COLUMNS = ["file", "optimizer", "z_height_cm", "angle_deg", "saved_cost", "cost", "shape_mse", "robust_mean", "robust_worst",
+           "V_center", "x_peak_cm", "inductance_uH", "wire_length_m", "total_turns", "active_slots"]
+
+def find_payloads(paths):
+    """Every design JSON under the given files and directories (recursively), in a stable order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "**", "*.json"), recursive=True))
+        else:
+            files.append(path)
+    return sorted(set(files))
+
+def load_designs(files):
+    """Reads the payloads that hold an optimized coil, filling hardware fields older files lack with the defaults."""
+    designs = []
+    for filename in files:
+        with open(filename, 'r') as f:
+            data = json.load(f)
+        if "optimized_coil" not in data:
+            continue
+        designs.append({
+            "file": filename,
+            "hardware": {**HARDWARE_DEFAULTS, "rx_diameter_cm": 0.0, **data["hardware"]},
+            "target": tuple(data["target_well"][key] for key in ["V_min", "x_hover", "w_wall", "n_shape"]),
+            "radii": np.array(data["optimized_coil"]["radii_cm"]),
+            "turns": np.array(data["optimized_coil"]["turns"], dtype=int),
+            "optimizer": data.get("metadata", {}).get("optimizer", ""),
+            "saved_cost": data.get("metadata", {}).get("final_cost_score", np.nan)
+        })
+    return designs
+
+def group_matrices(hardware_params, radii, max_turns, z_heights):
+    """
+    Stacked physics matrices (slots, turns, heights, x) for one hardware group. Slots laid out by build_slot_grid
+    go through the disk cache (under the group's max_turns); any other radii are computed directly.
+    """
+    x_array, slot_radii = build_slot_grid(hardware_params)
+    cached = len(slot_radii) == len(radii) and np.allclose(slot_radii, radii, atol=1e-3)
+
+    Bx_stack, Bz_stack = [], []
+    for z in z_heights:
+        hw = {**hardware_params, "z_height_cm": z, "max_turns": max_turns}
+        if cached:
+            Bx, Bz = build_or_load_physics_matrix(x_array, slot_radii, hw)
+        else:
+            Bx, Bz = build_stack_fields(x_array, radii, z, max_turns, hardware_params["wire_diameter_cm"])
+        Bx_stack.append(Bx)
+        Bz_stack.append(Bz)
+    return x_array, np.stack(Bx_stack, axis=2), np.stack(Bz_stack, axis=2)
+
+def evaluate_group(designs, dz, roll):
+    """
+    Scores every design of one hardware group in a single batch. Scenario 0 is the nominal (z, angle);
+    the others span z +- dz and rolls +- roll, and give the robust mean and worst costs.
+    Returns one summary row per design.
+    """
+    hw = designs[0]["hardware"]
+    radii = designs[0]["radii"]
+    turns = np.array([d["turns"] for d in designs])
+    max_turns = max(hw["max_turns"], int(np.abs(turns).max()))
+
+    # Finite receiver matrices are folded for the nominal angle, so their designs are only bobbed in z
+    z_offsets = np.array([0.0, -dz, dz]) if dz > 0 else np.array([0.0])
+    rolls = np.array([0.0, -roll, roll]) if roll > 0 and hw["rx_diameter_cm"] <= 0 else np.array([0.0])
+    z_heights = list(dict.fromkeys(hw["z_height_cm"] + z_offsets))
+    x_array, Bx_stack, Bz_stack = group_matrices(hw, radii, max_turns, z_heights)
+
+    eval_mask = np.abs(x_array) <= hw["eval_limit_cm"]
+    x_eval = x_array[eval_mask]
+    V_target_eval = np.array([generate_target_well(x_eval, *d["target"]) for d in designs])
+
+    # Summed fields of every design at every height: (designs, heights, x)
+    slots = np.arange(len(radii))
+    Btot_x = np.sum(Bx_stack[slots, turns + max_turns][..., eval_mask], axis=1)
+    Btot_z = np.sum(Bz_stack[slots, turns + max_turns][..., eval_mask], axis=1)
+
+    angle = hw["angle_deg"]
+    cost = score_candidates(Btot_x[:, 0], Btot_z[:, 0], turns, angle, V_target_eval)
+    mse = shape_error(Btot_x[:, 0], Btot_z[:, 0], angle, V_target_eval)
+
+    scenario_z = np.repeat(np.arange(len(z_heights)), len(rolls))
+    scenario_roll = np.tile(rolls, len(z_heights))
+    robust_args = (Btot_x[:, scenario_z], Btot_z[:, scenario_z], turns, angle, V_target_eval[:, np.newaxis, :], None, scenario_roll)
+    robust_mean = score_candidates(*robust_args)
+    robust_worst = score_candidates(*robust_args, worst_case=True)
+
+    # Nominal well: normalized depth at the centre and where its peak sits
+    theta = np.radians(angle)
+    V_sim = np.maximum(np.abs(Btot_x[:, 0] * np.sin(theta) + Btot_z[:, 0] * np.cos(theta)),
+                       np.abs(-Btot_x[:, 0] * np.sin(theta) + Btot_z[:, 0] * np.cos(theta)))
+    peak = np.max(V_sim, axis=-1)
+    center = np.argmin(np.abs(x_eval))
+
+    rows = []
+    for i, design in enumerate(designs):
+        rows.append({
+            "file": design["file"],
+            "optimizer": design["optimizer"],
+            "z_height_cm": hw["z_height_cm"],
+            "angle_deg": angle,
+            "saved_cost": design["saved_cost"],
+            "cost": float(cost[i]),
+            "shape_mse": float(mse[i]),
+            "robust_mean": float(robust_mean[i]),
+            "robust_worst": float(robust_worst[i]),
+            "V_center": float(V_sim[i, center] / peak[i]) if peak[i] > 0 else np.nan,
+            "x_peak_cm": float(abs(x_eval[np.argmax(V_sim[i])])),
+            "inductance_uH": round(estimate_inductance(radii, design["turns"], hw["wire_diameter_cm"]), 2),
+            "wire_length_m": float(np.abs(design["turns"]) @ (2 * np.pi * radii * 0.01)),
+            "total_turns": int(np.abs(design["turns"]).sum()),
+            "active_slots": int(np.count_nonzero(design["turns"]))
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-evaluate and rank every saved coil design in one go.")
+    parser.add_argument('paths', type=str, nargs='*', default=["output", "tuned"],
+                        help='Design JSON files or directories, searched recursively (default: output tuned).')
+    parser.add_argument('-s', '--sort', type=str, default="cost", choices=COLUMNS[4:], help='Column to rank by (default: cost).')
+    parser.add_argument('--descending', action='store_true', help='Largest values first.')
+    parser.add_argument('--dz', type=float, default=0.5, help='Height bob for the robustness metrics (cm, default: 0.5).')
+    parser.add_argument('--roll', type=float, default=5.0, help='Roll for the robustness metrics (degrees, default: 5).')
+    parser.add_argument('-o', '--output', type=str, default=None, help='Also save the table as CSV.')
+    args = parser.parse_args()
+
+    start_time = time.time()
+    designs = load_designs(find_payloads(args.paths))
+    if not designs:
+        print("No design payloads found.")
+        return
+
+    # Designs on identical hardware and slots share their field matrices
+    groups = {}
+    for design in designs:
+        key = (tuple(design["hardware"][k] for k in GROUP_KEYS), tuple(np.round(design["radii"], 3)))
+        groups.setdefault(key, []).append(design)
+
+    rows = []
+    for group in groups.values():
+        rows.extend(evaluate_group(group, args.dz, args.roll))
+
+    rows.sort(key=lambda row: (np.isnan(row[args.sort]), -row[args.sort] if args.descending else row[args.sort]))
+    print(f"\nEvaluated {len(rows)} designs in {len(groups)} hardware groups in {time.time() - start_time:.1f} seconds "
+          f"(robustness: z +-{args.dz:g} cm, roll +-{args.roll:g} deg).\n")
+
+    print(f"{'File':<42} {'z':<5} {'Angle':<6} {'Cost':<9} {'Robust':<9} {'Worst':<9} {'V(0)':<6} {'x_peak':<7} "
+          f"{'L (uH)':<9} {'Wire (m)':<9} {'Turns':<6}")
+    print("-" * 125)
+    for row in rows:
+        print(f"{os.path.relpath(row['file'])[-42:]:<42} {row['z_height_cm']:<5g} {row['angle_deg']:<6g} {row['cost']:<9.5f} "
+              f"{row['robust_mean']:<9.5f} {row['robust_worst']:<9.5f} {row['V_center']:<6.2f} {row['x_peak_cm']:<7.1f} "
+              f"{row['inductance_uH']:<9.1f} {row['wire_length_m']:<9.2f} {row['total_turns']:<6}")
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"\nSummary table saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
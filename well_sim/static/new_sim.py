@@ -1,35 +1,18 @@
 import argparse
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Slider
-from scipy.special import ellipk, ellipe
-
-def get_B_components(x, z, R):
-    """Calculates the exact Bx and Bz components for a single circular loop."""
-    x_safe = np.where(x == 0, 1e-10, x)
-    k_squared = (4 * R * x_safe) / ((R + x_safe)**2 + z**2)
-    K = ellipk(k_squared)
-    E = ellipe(k_squared)
-    
-    root_term = np.sqrt((R + x_safe)**2 + z**2)
-    alpha_squared = (R - x_safe)**2 + z**2
-    
-    Bx = (z / (x_safe * root_term)) * (-K + ((R**2 + x_safe**2 + z**2) / alpha_squared) * E)
-    Bz = (1 / root_term) * (K + ((R**2 - x_safe**2 - z**2) / alpha_squared) * E)
-    
-    Bx[x == 0] = 0.0
-    return Bx, Bz
+
+# The field math is shared with the main tools in well_sim/physics.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from physics import get_B_components, calculate_coil_fields
 
 def compute_B_fields(x, z, num_rings, show_single=False):
     """Calculates the B-field for a specific coil at a specific Z height."""
     Rs_multi = np.arange(10, 10 + num_rings, 1)
-    Btot_x_multi = np.zeros_like(x)
-    Btot_z_multi = np.zeros_like(x)
-
-    for R_val in Rs_multi:
-        Bx, Bz = get_B_components(x, z, R_val)
-        Btot_x_multi += Bx
-        Btot_z_multi += Bz
+    Btot_x_multi, Btot_z_multi = calculate_coil_fields(x, Rs_multi, np.ones(num_rings, dtype=int), z, 0.0)
 
     if show_single:
         Btot_x_single, Btot_z_single = get_B_components(x, z, 10.0)
@@ -1,59 +1,30 @@
 import argparse
 import json
 import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Slider, Button
-from scipy.special import ellipk, ellipe
+from physics import build_stack_fields, calculate_coil_fields, normalized_well
 
-# --- 1. Physics Engine ---
-def get_B_components(x, z, R):
-    x_safe = np.where(x == 0, 1e-10, x)
-    k_squared = (4 * R * x_safe) / ((R + x_safe)**2 + z**2)
-    K = ellipk(k_squared)
-    E = ellipe(k_squared)
-    
-    root_term = np.sqrt((R + x_safe)**2 + z**2)
-    alpha_squared = (R - x_safe)**2 + z**2
-    
-    Bx = (z / (x_safe * root_term)) * (-K + ((R**2 + x_safe**2 + z**2) / alpha_squared) * E)
-    Bz = (1 / root_term) * (K + ((R**2 - x_safe**2 - z**2) / alpha_squared) * E)
-    Bx[x == 0] = 0.0
-    return Bx, Bz
-
-def build_z_cache(x_array, radii, z_height, turns_limit, wire_dia):
-    num_slots = len(radii)
-    Bx_cache = np.zeros((num_slots, 2 * turns_limit + 1, len(x_array)))
-    Bz_cache = np.zeros((num_slots, 2 * turns_limit + 1, len(x_array)))
-    
-    for slot_idx, R in enumerate(radii):
-        for N in range(-turns_limit, turns_limit + 1):
-            if N == 0: continue
-            direction = np.sign(N)
-            turn_idx = N + turns_limit 
-            for i in range(int(abs(N))):
-                z_i = z_height + (i * wire_dia)
-                Bx, Bz = get_B_components(x_array, z_i, R)
-                Bx_cache[slot_idx, turn_idx, :] += direction * Bx
-                Bz_cache[slot_idx, turn_idx, :] += direction * Bz
-    return Bx_cache, Bz_cache
+Z_CACHE_SIZE = 32       # Physics caches kept in memory, one per visited Z height
+POLL_INTERVAL_MS = 50   # How often the GUI checks for a finished background cache
 
-def compute_instant_well(turns_array, Bx_cache, Bz_cache, theta_deg, turns_limit):
+# --- 1. Physics Engine ---
+# Kernel and stack builders live in physics.py; the tuner only adds the cache lookup
+def sum_slot_fields(turns_array, Bx_cache, Bz_cache, turns_limit):
+    """Total Bx/Bz of a winding profile: one cached row per slot, summed."""
     num_slots = len(turns_array)
     indices = turns_array + turns_limit
     Btot_x = np.sum(Bx_cache[np.arange(num_slots), indices, :], axis=0)
     Btot_z = np.sum(Bz_cache[np.arange(num_slots), indices, :], axis=0)
-    
-    theta = np.radians(theta_deg)
-    V_right = np.abs(Btot_x * np.sin(theta) + Btot_z * np.cos(theta))
-    V_left = np.abs(Btot_x * np.sin(-theta) + Btot_z * np.cos(-theta))
-    
-    max_val = max(np.max(V_right), np.max(V_left))
-    if max_val > 0:
-        V_right /= max_val
-        V_left /= max_val
-    return V_left, V_right
+    return Btot_x, Btot_z
+
+def compute_instant_well(turns_array, Bx_cache, Bz_cache, theta_deg, turns_limit):
+    Btot_x, Btot_z = sum_slot_fields(turns_array, Bx_cache, Bz_cache, turns_limit)
+    return normalized_well(Btot_x, Btot_z, theta_deg)
 
 # --- 2. Main Tuner App ---
 def main():
@@ -94,7 +65,7 @@ def main():
     x_array = np.linspace(-35, 35, 300)
 
     print("Building initial physics cache. Takes ~1 second...")
-    Bx_cache, Bz_cache = build_z_cache(x_array, radii, initial_z, args.turns_limit, wire_dia)
+    Bx_cache, Bz_cache = build_stack_fields(x_array, radii, initial_z, args.turns_limit, wire_dia)
     
     # --- 3. Figure Setup ---
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 9), gridspec_kw={'height_ratios': [2, 1]})
@@ -151,14 +122,94 @@ def main():
     btn_export = Button(ax_export, 'Export JSON', hovercolor='0.975')
 
     # --- 5. Event Handling ---
-    state = {'z': initial_z, 'Bx': Bx_cache, 'Bz': Bz_cache}
+    # Running field totals: a click only adds the difference of one slot's cached rows
+    Btot_x, Btot_z = sum_slot_fields(turns, Bx_cache, Bz_cache, args.turns_limit)
+    state = {'z': round(initial_z, 3), 'cache_z': round(initial_z, 3), 'Bx': Bx_cache, 'Bz': Bz_cache, 'Btot_x': Btot_x, 'Btot_z': Btot_z}
+
+    # Blitting: everything that moves is drawn on top of a saved background instead of redrawing the whole figure.
+    # The background is re-captured on every full draw (resize, slider redraw).
+    animated = [line_left, line_right, drone_line, drop_left, drop_right, *bars]
+    for artist in animated:
+        artist.set_animated(True)
+    blit = {'background': None}
+
+    def draw_animated():
+        for artist in animated:
+            fig.draw_artist(artist)
+
+    def on_draw(event):
+        blit['background'] = fig.canvas.copy_from_bbox(fig.bbox)
+        draw_animated()
+
+    fig.canvas.mpl_connect('draw_event', on_draw)
+
+    def redraw():
+        if blit['background'] is None or not fig.canvas.supports_blit:
+            fig.canvas.draw_idle()
+            return
+        fig.canvas.restore_region(blit['background'])
+        draw_animated()
+        fig.canvas.blit(fig.bbox)
+        fig.canvas.flush_events()
 
     def update_plot():
-        V_l, V_r = compute_instant_well(turns, state['Bx'], state['Bz'], slider_angle.val, args.turns_limit)
+        V_l, V_r = normalized_well(state['Btot_x'], state['Btot_z'], slider_angle.val)
         line_left.set_ydata(V_l)
         line_right.set_ydata(V_r)
-        ax1.set_title(f"Interactive Tuner | Z = {slider_z.val:.1f} cm | Angle = {slider_angle.val:.0f}°")
-        fig.canvas.draw_idle()
+        redraw()
+
+    def update_title():
+        building = " (building cache...)" if state['cache_z'] != state['z'] else ""
+        ax1.set_title(f"Interactive Tuner | Z = {slider_z.val:.1f} cm | Angle = {slider_angle.val:.0f}°{building}")
+
+    # Z caches are built on a worker thread and memoized per height, so dragging the Z slider never blocks
+    # and returning to a visited height is instant. Until the cache for the current height is ready,
+    # the well is previewed by summing the active loops directly.
+    z_caches = OrderedDict({state['z']: (Bx_cache, Bz_cache)})
+    pending = {}
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    def use_z_cache(z):
+        state['Bx'], state['Bz'] = z_caches[z]
+        state['cache_z'] = z
+        state['Btot_x'], state['Btot_z'] = sum_slot_fields(turns, state['Bx'], state['Bz'], args.turns_limit)
+
+    def request_z_cache(z):
+        if z in z_caches:
+            z_caches.move_to_end(z)
+            use_z_cache(z)
+            return
+
+        # Stale heights: queued builds are dropped, a running one stops at its next layer
+        for other_z, future in pending.items():
+            if other_z != z:
+                future.cancel()
+        if z not in pending:
+            pending[z] = executor.submit(build_stack_fields, x_array, radii, z, args.turns_limit, wire_dia,
+                                         lambda: state['z'] != z)
+        state['Btot_x'], state['Btot_z'] = calculate_coil_fields(x_array, radii, turns, z, wire_dia)
+
+    def poll_z_caches():
+        for z, future in list(pending.items()):
+            if not future.done():
+                continue
+            del pending[z]
+            if future.cancelled() or future.result() is None:
+                continue
+
+            z_caches[z] = future.result()
+            while len(z_caches) > Z_CACHE_SIZE:
+                z_caches.popitem(last=False)
+
+            if z == state['z']:
+                use_z_cache(z)
+                update_title()
+                update_plot()
+                fig.canvas.draw_idle()
+
+    timer = fig.canvas.new_timer(interval=POLL_INTERVAL_MS)
+    timer.add_callback(poll_z_caches)
+    timer.start()
 
     def on_slider_change(val):
         cx = slider_x.val
@@ -166,10 +217,13 @@ def main():
         drop_left.set_xdata([cx - args.width/2, cx - args.width/2])
         drop_right.set_xdata([cx + args.width/2, cx + args.width/2])
         
-        if slider_z.val != state['z']:
-            state['z'] = slider_z.val
-            state['Bx'], state['Bz'] = build_z_cache(x_array, radii, state['z'], args.turns_limit, wire_dia)
-            
+        z = round(slider_z.val, 3)
+        if z != state['z']:
+            state['z'] = z
+            request_z_cache(z)
+        
+        # The sliders redraw the whole figure anyway, which picks up the new title
+        update_title()
         update_plot()
 
     slider_x.on_changed(on_slider_change)
@@ -182,11 +236,21 @@ def main():
         if abs(event.ydata) < 0.2: return 
         
         slot_idx = np.argmin(np.abs(radii - event.xdata))
+        old_idx = turns[slot_idx] + args.turns_limit
         
         if event.ydata > 0 and turns[slot_idx] < args.turns_limit:
             turns[slot_idx] += 1
         elif event.ydata < 0 and turns[slot_idx] > -args.turns_limit:
             turns[slot_idx] -= 1
+        else:
+            return
+        
+        if state['cache_z'] == state['z']:
+            new_idx = turns[slot_idx] + args.turns_limit
+            state['Btot_x'] += state['Bx'][slot_idx, new_idx] - state['Bx'][slot_idx, old_idx]
+            state['Btot_z'] += state['Bz'][slot_idx, new_idx] - state['Bz'][slot_idx, old_idx]
+        else:
+            state['Btot_x'], state['Btot_z'] = calculate_coil_fields(x_array, radii, turns, state['z'], wire_dia)
             
         bars[slot_idx].set_height(turns[slot_idx])
         bars[slot_idx].set_color('mediumseagreen' if turns[slot_idx] >= 0 else 'coral')
@@ -241,5 +305,10 @@ def main():
 
     plt.show()
 
+    # Window closed: stop any cache still building
+    timer.stop()
+    state['z'] = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,59 +3,29 @@ import json
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Slider
-from scipy.special import ellipk, ellipe
 
 # Import your target generator
 from target import generate_target_well
-
-def get_B_components(x, z, R):
-    """Calculates the exact Bx and Bz components for a single circular loop."""
-    x_safe = np.where(x == 0, 1e-10, x)
-    k_squared = (4 * R * x_safe) / ((R + x_safe)**2 + z**2)
-    K = ellipk(k_squared)
-    E = ellipe(k_squared)
-    
-    root_term = np.sqrt((R + x_safe)**2 + z**2)
-    alpha_squared = (R - x_safe)**2 + z**2
-    
-    Bx = (z / (x_safe * root_term)) * (-K + ((R**2 + x_safe**2 + z**2) / alpha_squared) * E)
-    Bz = (1 / root_term) * (K + ((R**2 - x_safe**2 - z**2) / alpha_squared) * E)
+from physics import calculate_coil_fields, normalized_well, receiver_flux, coil_normal
+
+def compute_well_profiles(x, z_height, theta_deg, radii, turns_array, wire_diameter, rx_radius=0.0):
+    """
+    Computes the conjoined well profile using the accurate 3D downward stacking math.
+    With an rx_radius the receivers are finite coils and the field is averaged over their area.
+    """
+    if rx_radius <= 0:
+        Btot_x, Btot_z = calculate_coil_fields(x, radii, turns_array, z_height, wire_diameter)
+        return normalized_well(Btot_x, Btot_z, theta_deg)
     
-    Bx[x == 0] = 0.0
-    return Bx, Bz
-
-def compute_well_profiles(x, z_height, theta_deg, radii, turns_array, wire_diameter):
-    """Computes the conjoined well profile using the accurate 3D downward stacking math."""
-    Btot_x = np.zeros_like(x, dtype=float)
-    Btot_z = np.zeros_like(x, dtype=float)
-    
-    for R, N in zip(radii, turns_array):
-        if N == 0:
-            continue
-            
-        direction = np.sign(N)
-        num_turns = int(abs(N))
-        
-        for i in range(num_turns):
-            z_i = z_height + (i * wire_diameter)
-            Bx, Bz = get_B_components(x, z_i, R)
-            
-            Btot_x += direction * Bx
-            Btot_z += direction * Bz
-            
-    theta = np.radians(theta_deg)
+    centers = np.stack([x, np.zeros_like(x), np.full_like(x, z_height)], axis=-1)[:, np.newaxis, :]
+    normals = coil_normal(np.array([-theta_deg, theta_deg]))
+    flux = np.abs(receiver_flux(centers, normals, rx_radius, radii, turns_array, wire_diameter))
     
-    Flux_right = Btot_x * np.sin(theta) + Btot_z * np.cos(theta)
-    V_right = np.abs(Flux_right)
-    
-    Flux_left = Btot_x * np.sin(-theta) + Btot_z * np.cos(-theta)
-    V_left = np.abs(Flux_left)
-    
-    max_val = max(np.max(V_right), np.max(V_left))
+    V_left, V_right = flux[:, 0], flux[:, 1]
+    max_val = np.max(flux)
     if max_val > 0:
-        V_right = V_right / max_val
         V_left = V_left / max_val
-        
+        V_right = V_right / max_val
     return V_left, V_right
 
 def main():
@@ -63,6 +33,9 @@ def main():
     parser = argparse.ArgumentParser(description="Visualize an optimized magnetic well from a JSON payload.")
     parser.add_argument('file', type=str, help='Path to the JSON output file')
     parser.add_argument('-w', '--width', type=float, default=8.2, help='Width of the drone in cm (default: 8.2)')
+    parser.add_argument('--rx_diameter', type=float, default=None,
+                        help='Receiver coil diameter in cm; averages the field over the coil instead of a point '
+                             '(default: the rx_diameter_cm the design was optimized for, else 0)')
     args = parser.parse_args()
 
     # 2. Load the JSON Data
@@ -88,11 +61,15 @@ def main():
     turns = np.array(coil["turns"])
     
     drone_width = args.width
+    rx_diameter = args.rx_diameter if args.rx_diameter is not None else hw.get("rx_diameter_cm", 0.0)
+    rx_radius = rx_diameter / 2
     initial_drone_x = 0.0
     x_array = np.linspace(-35, 35, 400)
 
     print(f"Loaded {args.file}...")
     print(f"Visualizing with drone width = {drone_width} cm.")
+    if rx_radius > 0:
+        print(f"Averaging the field over {rx_diameter} cm receiver coils.")
 
     # 3. Setup the Figure and Subplots
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 9), gridspec_kw={'height_ratios': [2, 1]})
@@ -104,7 +81,7 @@ def main():
     ax1.plot(x_array, V_target, color='black', linewidth=3, linestyle=':', label="Target Well", zorder=1)
 
     # Compute and plot the simulated curves
-    V_left, V_right = compute_well_profiles(x_array, initial_z, theta_deg, radii, turns, wire_dia)
+    V_left, V_right = compute_well_profiles(x_array, initial_z, theta_deg, radii, turns, wire_dia, rx_radius)
     line_left, = ax1.plot(x_array, V_left, label=f'Left Motor V_sim (-{theta_deg}°)', color='red', linewidth=2.5, zorder=2)
     line_right, = ax1.plot(x_array, V_right, label=f'Right Motor V_sim (+{theta_deg}°)', color='blue', linewidth=2.5, zorder=2)
     
@@ -171,7 +148,7 @@ def main():
         drop_right.set_xdata([current_x + drone_width/2, current_x + drone_width/2])
         
         # Recalculate physics based on new Z height
-        new_v_left, new_v_right = compute_well_profiles(x_array, current_z, theta_deg, radii, turns, wire_dia)
+        new_v_left, new_v_right = compute_well_profiles(x_array, current_z, theta_deg, radii, turns, wire_dia, rx_radius)
         
         line_left.set_ydata(new_v_left)
         line_right.set_ydata(new_v_right)